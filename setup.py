@@ -22,13 +22,14 @@ import network_backup_offsite
 
 PLATFORM_NAME = str(sys.platform).lower()
 
-tests_require = ["pytest", "mock"]
+tests_require = ["pytest", "pytest-xdist", "mock"]
 
 # when distributing to linux
 # requires = ["enum34", "gnupg", "psutil", "dill", "requests==2.20.0"]
 
 # when distributing to solaris
-requires = ["enum34", "python-gnupg", "psutil", "dill", "requests==2.20.0"]
+requires = ["enum34", "python-gnupg", "psutil", "dill", "requests==2.20.0",
+            "scandir; python_version < '3.5'", "subprocess32; python_version < '3'"]
 
 with io.open('README.md', 'r+', encoding="utf-8") as readme:
     long_description = readme.read()
@@ -21,6 +21,15 @@ azcopy_func_args = "copy"
 azcopy_output_type_args = "--output-type"
 SEP = " "
 azcopy_output_type = "text"
+azcopy_from_to_args = "--from-to"
+azcopy_pipe_blob = "PipeBlob"
+azcopy_block_size_args = "--block-size-mb"
+azcopy_cap_mbps_args = "--cap-mbps"
+AZCOPY_PIPE_SOURCE = "stdin"
+AZCOPY_CONCURRENCY_ENV = "AZCOPY_CONCURRENCY_VALUE"
+
+DEFAULT_BLOCK_SIZE_MB = 100
+DEFAULT_CONCURRENCY = "AUTO"
 
 
 
@@ -51,18 +60,54 @@ class AzCopyManager:
     """
     Class used to encapsulate AzCopy commands to transfer processed files over to Azure Storage
     """
-    def __init__(self, source_path, destination_path, retry=NUMBER_TRIES):
+    def __init__(self, source_path, destination_path, retry=NUMBER_TRIES, block_size_mb=None,
+                 cap_mbps=None, concurrency=None):
         """
         Initialize Rsync Manager class.
 
         :param source_path: path of the source file to be transferred.
         :param destination_path: destination location to send the file.
         :param retry: number of tries in case of failure.
+        :param block_size_mb: size of each uploaded block in MB, azcopy default if None.
+        :param cap_mbps: transfer rate limit in megabits per second, no limit if None.
+        :param concurrency: number of concurrent requests, azcopy default if None.
         """
         self.source_path = str(source_path)
         self.destination_path = str(destination_path)
         self.retry = retry
+        self.block_size_mb = block_size_mb
+        self.cap_mbps = cap_mbps
+        self.concurrency = concurrency
+
+    def get_tuning_args(self):
+        """
+        Get the azcopy command line arguments for block size and transfer rate cap.
+
+        :return: list of arguments, empty if no tuning is set.
+        """
+        tuning_args = []
+
+        if self.block_size_mb:
+            tuning_args.extend([azcopy_block_size_args, str(self.block_size_mb)])
+
+        if self.cap_mbps:
+            tuning_args.extend([azcopy_cap_mbps_args, str(self.cap_mbps)])
+
+        return tuning_args
+
+    def get_environment(self):
+        """
+        Get the environment for the azcopy process, with the concurrency value if it is set.
+
+        :return: environment dictionary, or None to inherit the current environment.
+        """
+        if not self.concurrency:
+            return None
 
+        azcopy_env = dict(os.environ)
+        azcopy_env[AZCOPY_CONCURRENCY_ENV] = str(self.concurrency)
+
+        return azcopy_env
 
     @staticmethod
     def check_if_url(path):
@@ -95,8 +140,9 @@ class AzCopyManager:
         try:
 
             command = [AZCOPY_CMD, azcopy_func_args, self.source_path, self.destination_path, azcopy_output_type_args,
-                       azcopy_output_type]
-            process = Popen(command, shell=False, stdout=PIPE, stderr=PIPE)
+                       azcopy_output_type] + self.get_tuning_args()
+            process = Popen(command, shell=False, stdout=PIPE, stderr=PIPE,
+                            env=self.get_environment())
             output, std_error = process.communicate()
             azcopy_output = self.parse_azcopy_output(output)
 
@@ -108,10 +154,36 @@ class AzCopyManager:
         except (TypeError, ValueError) as error:
             raise AzCopyException(parameters=error.__str__())
 
+    def transfer_from_pipe(self, input_stream):
+        """
+        Upload the data read from input_stream to the destination_path blob.
+
+        :param input_stream: readable pipe, e.g. the stdout of a previous process.
+
+        :return: AzCopyOutput object with the output information of the command.
+        """
+        try:
+            command = [AZCOPY_CMD, azcopy_func_args, self.destination_path, azcopy_from_to_args,
+                       azcopy_pipe_blob, azcopy_output_type_args, azcopy_output_type] + \
+                self.get_tuning_args()
+            process = Popen(command, shell=False, stdin=input_stream, stdout=PIPE, stderr=PIPE,
+                            env=self.get_environment())
+            output, std_error = process.communicate()
+            azcopy_output = self.parse_azcopy_output(output)
+
+            if process.returncode != 0:
+                raise AzCopyException(ExceptionCodes.AzCopyCommandFailed,
+                                      azcopy_output.error_msg or std_error.strip())
+
+            return azcopy_output
+        except (TypeError, ValueError) as error:
+            raise AzCopyException(parameters=error.__str__())
+
 
 
     @staticmethod
-    def transfer_file(source_path, destination_path):
+    def transfer_file(source_path, destination_path, block_size_mb=DEFAULT_BLOCK_SIZE_MB,
+                      cap_mbps=None, concurrency=DEFAULT_CONCURRENCY):
         sastoken = os.environ.get('SAS_TOKEN')
 
         target_file_name = os.path.basename(source_path)
@@ -126,7 +198,33 @@ class AzCopyManager:
         else:
             raise AzCopyException(parameters="Source and destination path not Azure URL")
 
-        azcopy_output = AzCopyManager(target_source_path, target_destination_path, NUMBER_TRIES).transfer()
+        azcopy_output = AzCopyManager(target_source_path, target_destination_path, NUMBER_TRIES,
+                                      block_size_mb, cap_mbps, concurrency).transfer()
 
         return azcopy_output
 
+    @staticmethod
+    def transfer_stream(input_stream, destination_path, target_file_name,
+                        block_size_mb=DEFAULT_BLOCK_SIZE_MB, cap_mbps=None,
+                        concurrency=DEFAULT_CONCURRENCY):
+        """
+        Upload a stream to Azure Storage as target_file_name, under destination_path.
+
+        :param input_stream: readable pipe with the content to be uploaded.
+        :param destination_path: Azure URL of the destination folder.
+        :param target_file_name: name of the blob to be created.
+        :param block_size_mb: size of each uploaded block in MB.
+        :param cap_mbps: transfer rate limit in megabits per second, no limit if None.
+        :param concurrency: number of concurrent requests.
+
+        :return: AzCopyOutput object with the output information of the command.
+        """
+        sastoken = os.environ.get('SAS_TOKEN')
+
+        if not AzCopyManager.check_if_url(destination_path):
+            raise AzCopyException(parameters="Destination path not Azure URL")
+
+        target_destination_path = os.path.join(destination_path, target_file_name) + sastoken
+
+        return AzCopyManager(AZCOPY_PIPE_SOURCE, target_destination_path, NUMBER_TRIES,
+                             block_size_mb, cap_mbps, concurrency).transfer_from_pipe(input_stream)
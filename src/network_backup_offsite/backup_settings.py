@@ -19,9 +19,10 @@ from ConfigParser import ConfigParser, MissingSectionHeaderError, NoOptionError,
     ParsingError
 import os
 
+from network_backup_offsite.azcopy_manager import DEFAULT_BLOCK_SIZE_MB, DEFAULT_CONCURRENCY
 from network_backup_offsite.exceptions import BackupSettingsErrorCodes, BackupSettingsException, \
     ExceptionCodes
-from network_backup_offsite.gnupg_manager import GnupgManager
+from network_backup_offsite.gnupg_manager import DEFAULT_COMPRESS_ALGO, GnupgManager
 from network_backup_offsite.logger import CustomLogger
 from network_backup_offsite.notification_handler import NotificationHandler
 from network_backup_offsite.utils import get_home_dir, to_seconds
@@ -57,7 +58,9 @@ class SupportInfo(object):
 class OffsiteConfig(object):
     """Class used to hold parsed information from config.cfg about offsite."""
 
-    def __init__(self, ip, user, path, folder, temp_path, storage_account, container_name, offsite_retention, name="AZURE"):
+    def __init__(self, ip, user, path, folder, temp_path, storage_account, container_name, offsite_retention, name="AZURE",
+                 azcopy_block_size_mb=DEFAULT_BLOCK_SIZE_MB, azcopy_cap_mbps=None,
+                 azcopy_concurrency=DEFAULT_CONCURRENCY):
         """
         Initialize Offsite Config object.
 
@@ -68,6 +71,10 @@ class OffsiteConfig(object):
         :param temp_path: temporary folder to store files during the backup process.
         :param offsite_retention: value for offsite retention policy, how many bkps to keep offsite.
         :param name: name of offsite location.
+        :param azcopy_block_size_mb: size in MB of each block uploaded by azcopy.
+        :param azcopy_cap_mbps: azcopy transfer rate limit in megabits per second,
+        None for no limit.
+        :param azcopy_concurrency: number of concurrent azcopy requests.
         """
         self.name = name
         self.ip = ip
@@ -81,6 +88,9 @@ class OffsiteConfig(object):
         self.storage_account = storage_account
         self.container_name = container_name
         self.full_container_path = os.path.join(storage_account, container_name)
+        self.azcopy_block_size_mb = azcopy_block_size_mb
+        self.azcopy_cap_mbps = azcopy_cap_mbps
+        self.azcopy_concurrency = azcopy_concurrency
 
     def __str__(self):
         """Represent Offsite Config object as string."""
@@ -237,15 +247,21 @@ class ScriptSettings(object):
         If one of these information is missing in the configuration file,
         an INVALID_INPUT error is raised.
 
+        The gpg compression algorithm can be set with the optional COMPRESS_ALGO option.
+
         Configure the GnupgManager according to the provided settings and platform.
         If an error occurs, an Exception is raised with the details of the problem.
 
         :return an object with the gnupg information.
         """
         try:
+            compress_algo = DEFAULT_COMPRESS_ALGO
+            if self.config.has_option('GNUPG', 'COMPRESS_ALGO'):
+                compress_algo = str(self.config.get('GNUPG', 'COMPRESS_ALGO'))
+
             gpg_manager = GnupgManager(str(self.config.get('GNUPG', 'GPG_USER_NAME')),
                                        str(self.config.get('GNUPG', 'GPG_USER_EMAIL')),
-                                       self.logger)
+                                       self.logger, compress_algo=compress_algo)
         except (NoSectionError, NoOptionError) as exception:
             raise BackupSettingsException("Error reading the configuration file '{}': {}"
                                           .format(self.config_file_name, exception.message),
@@ -264,6 +280,9 @@ class ScriptSettings(object):
         3. BKP_PATH: main path where the backup content will be placed.
         4. BKP_DIR: folder where the deployment's backup will be transferred.
 
+        The azcopy tuning options AZCOPY_BLOCK_SIZE_MB, AZCOPY_CAP_MBPS and AZCOPY_CONCURRENCY
+        are optional.
+
         If an error occurs, an Exception is raised with the details of the problem.
 
         :return an object with the offsite information.
@@ -278,6 +297,18 @@ class ScriptSettings(object):
                                            self.config.get('OFFSITE_CONN', 'CONTAINER_NAME'),
                                            int(self.config.get('OFFSITE_CONN',
                                                                'OFFSITE_RETENTION')))
+
+            if self.config.has_option('OFFSITE_CONN', 'AZCOPY_BLOCK_SIZE_MB'):
+                offsite_config.azcopy_block_size_mb = int(
+                    self.config.get('OFFSITE_CONN', 'AZCOPY_BLOCK_SIZE_MB'))
+
+            if self.config.has_option('OFFSITE_CONN', 'AZCOPY_CAP_MBPS'):
+                offsite_config.azcopy_cap_mbps = int(
+                    self.config.get('OFFSITE_CONN', 'AZCOPY_CAP_MBPS'))
+
+            if self.config.has_option('OFFSITE_CONN', 'AZCOPY_CONCURRENCY'):
+                offsite_config.azcopy_concurrency = self.config.get('OFFSITE_CONN',
+                                                                    'AZCOPY_CONCURRENCY')
         except (NoSectionError, NoOptionError, KeyError, ValueError) as exception:
             raise BackupSettingsException("Error reading the configuration file '{}': {}"
                                           .format(self.config_file_name, exception.message),
@@ -330,7 +330,7 @@ def validate_offsite_backup_server(offsite_config, config_file_name, logger,
     1. Check if the provided parameters are not empty.
     2. Check if the provided IP is valid;
     3. Check if the provided IP is working;
-    4. Verifies if the provided path exists, otherwise tries to create it.
+    4. Creates the provided path, in case it does not exist yet.
 
     In case of validation error, the message is appended to the validation error list.
 
@@ -371,18 +371,11 @@ def validate_offsite_backup_server(offsite_config, config_file_name, logger,
                                      .format(offsite_config.path))
         return False
 
-    if not check_remote_path_exists(offsite_config.host, offsite_config.full_path):
-        logger.warning("Remote backup path '{}' does not exist yet. Trying to create it."
-                       .format(offsite_config.full_path))
-
-        if not create_remote_dir(offsite_config.host, offsite_config.full_path):
-            validation_error_list.append("Remote directory could not be created '{}'"
-                                         .format(offsite_config.full_path))
-        else:
-            logger.info("New remote path '{}' created successfully."
-                        .format(offsite_config.full_path))
+    if not create_remote_dir(offsite_config.host, offsite_config.full_path):
+        validation_error_list.append("Remote directory could not be created '{}'"
+                                     .format(offsite_config.full_path))
     else:
-        logger.info("Remote directory '{}' already exists".format(offsite_config.full_path))
+        logger.info("Remote directory '{}' is available.".format(offsite_config.full_path))
 
     return True
 
@@ -22,11 +22,18 @@ GPG_KEY_PATH = os.path.join(get_home_dir(), ".gnupg")
 
 SCRIPT_FILE = os.path.basename(__file__).split('.')[0]
 
+# AES256 runs on the AES-NI instructions. Batch mode keeps gpg from ever waiting on a prompt.
+GPG_ENCRYPT_ARGS = ["--batch", "--yes", "--cipher-algo", "AES256"]
+
+# the backup is archived without compression, so this is the only compression step when enabled.
+DEFAULT_COMPRESS_ALGO = "none"
+
 
 class GnupgManager:
     """Class to encapsulate the components related to backup encruption/decryption features."""
 
-    def __init__(self, gpg_user_name, gpg_user_email, logger, gpg_key_path=GPG_KEY_PATH):
+    def __init__(self, gpg_user_name, gpg_user_email, logger, gpg_key_path=GPG_KEY_PATH,
+                 compress_algo=DEFAULT_COMPRESS_ALGO):
         """
         Initialize GPG Manager class.
 
@@ -39,10 +46,12 @@ class GnupgManager:
         :param gpg_user_email: gpg configured email.
         :param logger:  logger object.
         :param gpg_key_path: gpg key path, usually is ~/.gnupg.
+        :param compress_algo: gpg compression algorithm applied while encrypting, e.g. none, zlib.
         """
         self.gpg_user_name = gpg_user_name
         self.gpg_user_email = gpg_user_email
         self.gpg_key_path = gpg_key_path
+        self.compress_algo = compress_algo
         self.gpg_file_extension = ".{}".format(GPG_SUFFIX)
 
         self.logger = CustomLogger(SCRIPT_FILE, logger.log_root_path, logger.log_file_name,
@@ -121,14 +130,32 @@ class GnupgManager:
         with open(os.devnull, "w") as devnull:
             output = "{}{}".format(os.path.join(output_path, os.path.basename(file_path)),
                                    self.gpg_file_extension)
-            ret_code = Popen([self.gpg_cmd, "--output", output, "-r", self.gpg_user_email,
-                              "--cipher-algo", "AES256", "--compress-algo", "none",
-                              "--encrypt", file_path], stdout=devnull, stderr=devnull).wait()
+            ret_code = Popen([self.gpg_cmd, "--output", output, "-r", self.gpg_user_email] +
+                             self.get_encrypt_args() + ["--encrypt", file_path],
+                             stdout=devnull, stderr=devnull).wait()
             if ret_code != 0:
                 raise Exception("Encryption of file {} could not be completed."
                                 .format(file_path))
         return output
 
+    def get_encrypt_args(self):
+        """
+        Build the gpg options used for encryption.
+
+        :return: list of gpg options.
+        """
+        return GPG_ENCRYPT_ARGS + ["--compress-algo", self.compress_algo]
+
+    def get_encrypt_stream_command(self):
+        """
+        Build the gpg command to encrypt the standard input into the standard output.
+
+        It uses the same settings as encrypt_file, so the output can be decrypted by decrypt_file.
+
+        :return: command list to be used with Popen.
+        """
+        return [self.gpg_cmd, "-r", self.gpg_user_email] + self.get_encrypt_args() + ["--encrypt"]
+
     @timeit
     def decrypt_file(self, encrypted_file_path, remove_encrypted=False, **kwargs):
         """
@@ -160,8 +187,9 @@ class GnupgManager:
             encrypted_file_path[0:len(encrypted_file_path) - len(self.gpg_file_extension)]
 
         with open(os.devnull, "w") as devnull:
-            ret_code = Popen([self.gpg_cmd, "--output", dec_filename, "--decrypt",
-                              encrypted_file_path], stdout=devnull, stderr=devnull).wait()
+            ret_code = Popen([self.gpg_cmd, "--batch", "--yes", "--output", dec_filename,
+                              "--decrypt", encrypted_file_path],
+                             stdout=devnull, stderr=devnull).wait()
             if ret_code != 0:
                 raise Exception("Decryption of file '{}' could not be completed."
                                 .format(encrypted_file_path))
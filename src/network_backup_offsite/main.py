@@ -44,6 +44,8 @@ BACKUP_TAG_HELP = "Provide the backup tag to be restored."
 BACKUP_DESTINATION_HELP = "Provide the destination of the restored backup."
 RSYNC_SSH_HELP = "Whether to use rsync over ssh. Defaults to False, which means it will use " \
                  "rsync daemon."
+STREAM_UPLOAD_HELP = "Whether to pipe tar, gpg and azcopy together when uploading, without " \
+                     "writing intermediate files to the temporary folder. Defaults to False."
 USAGE_HELP = "Display detailed help."
 NTWK_BKP_VERSION_HELP = "Show currently installed ntwk_bkp version."
 
@@ -187,7 +189,7 @@ def execute_backup_upload(deployment_config_dict, offsite_config, gpg_manager,
                 continue
 
             onsite_handler = OnsiteHandler(offsite_config, deployment_config, gpg_manager,
-                                           logger, args.rsync_ssh)
+                                           logger, args.rsync_ssh, args.stream_upload)
 
             upload_time = []
 
@@ -533,6 +535,7 @@ def parse_arguments():
     parser.add_argument("--backup_tag", help=BACKUP_TAG_HELP)
     parser.add_argument("--backup_destination", nargs='?', help=BACKUP_DESTINATION_HELP)
     parser.add_argument("--rsync_ssh", default=False, help=RSYNC_SSH_HELP)
+    parser.add_argument("--stream_upload", default=False, help=STREAM_UPLOAD_HELP)
     parser.add_argument("--usage", action="store_true", help=USAGE_HELP)
     parser.add_argument("--version", action="store_true", help=NTWK_BKP_VERSION_HELP)
 
@@ -543,6 +546,7 @@ def parse_arguments():
     args.do_cleanup = validate_boolean_input(args.do_cleanup)
     args.do_onsite_cleanup = validate_boolean_input(args.do_onsite_cleanup)
     args.rsync_ssh = validate_boolean_input(args.rsync_ssh)
+    args.stream_upload = validate_boolean_input(args.stream_upload)
 
     return args
 
@@ -14,12 +14,11 @@
 # pylint: disable=C0103
 
 import os
-import time
 
 from network_backup_offsite.logger import CustomLogger
 from network_backup_offsite.azcopy_manager import AzCopyManager
-from network_backup_offsite.utils import create_path, decompress_file, popen_communicate, \
-    PROCESSED_BACKUP_ENDS_WITH, remove_remote_dir, TIMEOUT
+from network_backup_offsite.utils import create_path, decompress_file, monotonic, \
+    popen_communicate, PROCESSED_BACKUP_ENDS_WITH, remove_remote_dir, TIMEOUT
 
 SCRIPT_FILE = os.path.basename(__file__).split('.')[0]
 
@@ -221,7 +220,7 @@ class OffsiteHandler:
 
         :return: tuple (backup tag, backup output, total time)
         """
-        time_start = time.time()
+        time_start = monotonic()
 
 
         self.download_backup_from_offsite(backup_tag, self.remote_root_container_path,
@@ -231,7 +230,7 @@ class OffsiteHandler:
 
         self.process_downloaded_backup(backup_tag, full_backup_path)
 
-        time_end = time.time()
+        time_end = monotonic()
 
         # it is not possible collect the performance data with timeit in this case.
         total_backup_download_time = time_end - time_start
@@ -259,7 +258,10 @@ class OffsiteHandler:
             self.logger.info("Downloading backup {} from {} to {}"
                              .format(backup_tag, full_path, backup_destination_path))
 
-            AzCopyManager.transfer_file(full_path, backup_destination_path)
+            AzCopyManager.transfer_file(full_path, backup_destination_path,
+                                        self.offsite_config.azcopy_block_size_mb,
+                                        self.offsite_config.azcopy_cap_mbps,
+                                        self.offsite_config.azcopy_concurrency)
 
         except Exception as transfer_exp:
             error_message = "Error while downloading backup {} from offsite path '{}' to '{}' due to {}." \
@@ -13,24 +13,39 @@
 # For the snake_case comments (invalid names)
 # pylint: disable=C0103
 
-import multiprocessing as mp
+import heapq
+import json
+from multiprocessing import cpu_count
+from multiprocessing.pool import ThreadPool
 import os
+from subprocess import PIPE, Popen
 
 
 from network_backup_offsite.logger import CustomLogger
 from network_backup_offsite.azcopy_manager import AzCopyManager
-from network_backup_offsite.utils import check_remote_path_exists, compress_file, create_path, \
-    create_remote_dir, get_values_from_dict, PROCESSED_BACKUP_ENDS_WITH, remove_path, timeit, \
-    timer_delay
+from network_backup_offsite.utils import advise_sequential_read, check_remote_path_exists, \
+    compress_file, create_and_list_remote_dir, create_path, create_remote_dir, \
+    get_tar_stream_command, has_min_number_of_entries, PROCESSED_BACKUP_ENDS_WITH, remove_path, \
+    scandir, start_ssh_master_connection, stop_ssh_master_connection, timeit, timer_delay
 
 SCRIPT_FILE = os.path.basename(__file__).split('.')[0]
 
+MAX_REMOVAL_WORKERS = 8
+
+MAX_ARCHIVE_WORKERS = 20
+
+MIN_BACKUP_FILES = 3
+
+UPLOADED_BACKUPS_MANIFEST_SUFFIX = "_uploaded_backups.json"
+
+RETRY_FOLDER_SUFFIX = "_retry"
+
 
 class OnsiteHandler:
     """Class to encapsulate the components related to backup upload feature."""
 
     def __init__(self, offsite_config, onsite_deployment_config, gpg_manager, logger,
-                 rsync_ssh=True):
+                 rsync_ssh=True, stream_upload=False):
         """
         Initialize Local Backup Handler object.
 
@@ -40,6 +55,8 @@ class OnsiteHandler:
         :param logger: logger object.
         :param rsync_ssh: boolean to determine whether to use rsync over ssh or rsync daemon,
         default value is true, which means use rsync ssh by default.
+        :param stream_upload: boolean to determine whether to pipe tar, gpg and azcopy together,
+        without writing intermediate files to the temporary folder, default value is false.
         """
         self.onsite_deployment_config = onsite_deployment_config
         self.offsite_config = offsite_config
@@ -55,7 +72,16 @@ class OnsiteHandler:
 
         self.rsync_ssh = rsync_ssh
 
-        self.backup_output_dict = None
+        self.stream_upload = stream_upload
+
+        self.offsite_backups_set = None
+
+        # kept beside the temporary folder, since the folder itself is deleted after each run.
+        self.uploaded_backups_manifest_path = None
+        self.uploaded_backups_set = set()
+
+        # encrypted backups waiting to be transferred, kept between runs to skip re-processing.
+        self.retry_folder = None
 
         self.processed_backup_path = None
 
@@ -68,13 +94,13 @@ class OnsiteHandler:
         backups_path = self.onsite_deployment_config.backup_path
 
         if not os.path.exists(backups_path):
-            self.logger.error("Invalid backup source path '{}'.".format(backups_path))
+            self.logger.error("Invalid backup source path '%s'.", backups_path)
             return None
 
-        self.logger.info("Getting the list of valid backups from '{}'.".format(backups_path))
+        self.logger.info("Getting the list of valid backups from '%s'.", backups_path)
 
-        path, backup_dirs, files = next(os.walk(backups_path))
-        if len(backup_dirs) <= 0:
+        backup_dir_entries = [entry for entry in scandir(backups_path) if entry.is_dir()]
+        if not backup_dir_entries:
             error_msg = "No backup directories were found for the provided path: '{}'."\
                 .format(backups_path)
 
@@ -82,27 +108,24 @@ class OnsiteHandler:
             raise Exception(error_msg)
 
         valid_dir_list = []
-        for backup_dir in backup_dirs:
-            full_backup_path = os.path.join(backups_path, backup_dir)
-
-            files = next(os.walk(full_backup_path))
-            # TODO should be more configurable than hardcoded "3".
-            if len(files) < 3:
-                self.logger.warning("Skipped the backup '{}', it has less than 3 files."
-                                    .format(full_backup_path))
+        for backup_dir_entry in backup_dir_entries:
+            full_backup_path = backup_dir_entry.path
+
+            if not has_min_number_of_entries(full_backup_path, MIN_BACKUP_FILES):
+                self.logger.warning("Skipped the backup '%s', it has less than %s files.",
+                                    full_backup_path, MIN_BACKUP_FILES)
                 continue
 
-            valid_dir_list.append(backup_dir)
-            self.logger.info("Added the backup '{}' to list of valid backups."
-                             .format(full_backup_path))
+            # the mtime is read once per entry, instead of once per sort comparison.
+            valid_dir_list.append((backup_dir_entry.name, backup_dir_entry.stat().st_mtime))
+            self.logger.info("Added the backup '%s' to list of valid backups.", full_backup_path)
 
-        valid_dir_list.sort(key=lambda x: os.path.getmtime(os.path.join(backups_path, x)),
-                            reverse=True)
+        valid_dir_list.sort(key=lambda backup_dir: backup_dir[1], reverse=True)
 
         # refer to [NMAAS-1404] when uploading more than one backup
         valid_dir_list.reverse()
 
-        return valid_dir_list
+        return [backup_dir_name for backup_dir_name, _ in valid_dir_list]
 
     @timer_delay
     @timeit
@@ -118,62 +141,317 @@ class OnsiteHandler:
 
         :return tuple true, successfully_uploaded_backups if backup list was processed successfully.
         """
-        successfully_uploaded_backups = []
-
         onsite_backups_list = self.get_onsite_backups_list()
 
         if onsite_backups_list is None or not onsite_backups_list:
             raise Exception("No valid network device backups found.")
 
+        # all remote calls of this run share a single ssh connection to offsite.
+        if not start_ssh_master_connection(self.offsite_config.host):
+            self.logger.warning("Could not open a shared ssh connection to '%s'.",
+                                self.offsite_config.host)
+
+        try:
+            return self.upload_backup_list(onsite_backups_list)
+        finally:
+            stop_ssh_master_connection(self.offsite_config.host)
+
+    def upload_backup_list(self, onsite_backups_list):
+        """
+        Upload the backups from the list which are not on offsite yet.
+
+        A detailed exception will be raised as a list, in case of error(s).
+
+        :param onsite_backups_list: list of valid onsite backup names.
+
+        :return tuple true, successfully_uploaded_backups if backup list was processed successfully.
+        """
+        successfully_uploaded_backups = []
+
         self.prepare_offsite_onsite_main_paths()
 
+        self.uploaded_backups_set = self.load_uploaded_backups_manifest()
+
         # upload only one backup, the most recent one.
         # onsite_backups_list = [onsite_backups_list[-1]]
 
         self.logger.log_info("Doing backup of: {}".format(onsite_backups_list))
 
         backup_error_list = []
+
+        failed_retry_backups = []
         try:
-            for current_backup_folder_name in onsite_backups_list:
+            transferred_retry_backups, failed_retry_backups = \
+                self.transfer_retry_backups(onsite_backups_list, backup_error_list)
 
+            successfully_uploaded_backups.extend(transferred_retry_backups)
+        except Exception as backup_exception:
+            backup_error_list.append(str(backup_exception))
+
+        pending_backups_list = []
+        for current_backup_folder_name in onsite_backups_list:
+            # a failed retry is already reported and stays staged, so it is not processed again.
+            if current_backup_folder_name in failed_retry_backups:
+                continue
+
+            try:
                 if not self.backup_already_on_offsite(current_backup_folder_name,
                                                       self.remote_root_path,
                                                       self.offsite_config.host):
+                    pending_backups_list.append(current_backup_folder_name)
+            except Exception as backup_exception:
+                backup_error_list.append(str(backup_exception))
+
+        archived_backups_dict = {}
+        if pending_backups_list and not self.stream_upload:
+            try:
+                self.create_onsite_offsite_backup_paths(self.remote_root_path,
+                                                        self.bkp_temp_folder)
+
+                archived_backups_dict = self.archive_backup_list(pending_backups_list,
+                                                                 self.bkp_temp_folder)
+            except Exception as backup_exception:
+                backup_error_list.append(str(backup_exception))
+                pending_backups_list = []
+
+        # a failing backup is reported at the end, without stopping the upload of the others.
+        for current_backup_folder_name in pending_backups_list:
+            try:
+                if self.stream_upload:
+                    self.process_and_transfer_stream(current_backup_folder_name,
+                                                     self.remote_root_container_path)
+
+                    successfully_uploaded_backups.append(current_backup_folder_name)
+                    self.add_to_uploaded_backups_manifest(current_backup_folder_name)
+                    continue
+
+                self.process_backup(current_backup_folder_name,
+                                    self.bkp_temp_folder,
+                                    archived_backups_dict.get(current_backup_folder_name))
+
+                staged_backup_path = self.stage_backup_for_retry(self.processed_backup_path)
+
+                if self.transfer_backup_to_offsite(current_backup_folder_name,
+                                                   staged_backup_path,
+                                                   self.remote_root_container_path):
+
+                    remove_path(staged_backup_path)
+                    successfully_uploaded_backups.append(current_backup_folder_name)
+                    self.add_to_uploaded_backups_manifest(current_backup_folder_name)
+                else:
+                    self.logger.warning("The backup '%s' will be transferred again on the next "
+                                        "run.", staged_backup_path)
 
-                    self.create_onsite_offsite_backup_paths(self.remote_root_path,
-                                                            self.bkp_temp_folder)
-
-                    self.process_backup(current_backup_folder_name,
-                                        self.bkp_temp_folder)
-
-                    if self.transfer_backup_to_offsite(current_backup_folder_name,
-                                                       self.processed_backup_path,
-                                                       self.remote_root_container_path):
-
-                        successfully_uploaded_backups.append(current_backup_folder_name)
+            except Exception as backup_exception:
+                backup_error_list.append(str(backup_exception))
 
+        try:
             self.delete_tmp_bkp_folder()
-
         except Exception as backup_exception:
-            backup_error_list.append(backup_exception.message)
+            backup_error_list.append(str(backup_exception))
 
         if backup_error_list:
             raise Exception(backup_error_list)
 
         return True, successfully_uploaded_backups
 
+    def get_uploaded_backups_manifest_path(self):
+        """
+        Get the path of the manifest with the backups already uploaded to offsite.
+
+        :return: manifest file path, beside the temporary backup folder.
+        """
+        if self.uploaded_backups_manifest_path is None:
+            self.uploaded_backups_manifest_path = self.bkp_temp_folder.rstrip(os.sep) + \
+                UPLOADED_BACKUPS_MANIFEST_SUFFIX
+
+        return self.uploaded_backups_manifest_path
+
+    def get_retry_folder_path(self):
+        """
+        Get the path of the folder with encrypted backups whose transfer failed.
+
+        The folder is named after the deployment, so deployments sharing the temporary folder do
+        not transfer each other's backups.
+
+        :return: retry folder path, beside the temporary backup folder.
+        """
+        if self.retry_folder is None:
+            self.retry_folder = "{}_{}{}".format(self.bkp_temp_folder.rstrip(os.sep),
+                                                 self.onsite_deployment_config.name,
+                                                 RETRY_FOLDER_SUFFIX)
+
+        return self.retry_folder
+
+    def stage_backup_for_retry(self, encrypted_backup_path):
+        """
+        Move an encrypted backup to the retry folder before it is transferred.
+
+        If the transfer fails, the backup stays there and is transferred on the next run without
+        being archived and encrypted again.
+
+        An exception will be raised in case of an error.
+
+        :param encrypted_backup_path: path of the encrypted backup in the temporary folder.
+
+        :return: path of the encrypted backup in the retry folder.
+        """
+        retry_folder = self.get_retry_folder_path()
+
+        if not create_path(retry_folder):
+            raise Exception("Retry folder '{}' could not be created.".format(retry_folder))
+
+        staged_backup_path = os.path.join(retry_folder, os.path.basename(encrypted_backup_path))
+
+        os.rename(encrypted_backup_path, staged_backup_path)
+
+        return staged_backup_path
+
+    def transfer_retry_backups(self, onsite_backups_list, backup_error_list):
+        """
+        Transfer the encrypted backups left in the retry folder by previous runs.
+
+        Backups already recorded as uploaded, or no longer available onsite, are just removed from
+        the folder.
+
+        :param onsite_backups_list: list of backup names currently available onsite.
+        :param backup_error_list: list where the backups that failed again are reported.
+
+        :return: pair: list with the backup names transferred successfully;
+                 list with the backup names whose transfer failed again.
+        """
+        retry_folder = self.get_retry_folder_path()
+
+        if not os.path.exists(retry_folder):
+            return [], []
+
+        transferred_backups = []
+        failed_backups = []
+        for retry_entry in scandir(retry_folder):
+            if not retry_entry.name.endswith(PROCESSED_BACKUP_ENDS_WITH):
+                continue
+
+            backup_tag = retry_entry.name[:-len(PROCESSED_BACKUP_ENDS_WITH)]
+
+            if backup_tag in self.uploaded_backups_set:
+                remove_path(retry_entry.path)
+                continue
+
+            if backup_tag not in onsite_backups_list:
+                self.logger.info("Removing the backup '%s' left by a previous run, it is no longer "
+                                 "available onsite.", backup_tag)
+                remove_path(retry_entry.path)
+                continue
+
+            self.logger.info("Transferring the backup '%s' left by a previous run.", backup_tag)
+
+            if self.transfer_backup_to_offsite(backup_tag, retry_entry.path,
+                                               self.remote_root_container_path):
+                remove_path(retry_entry.path)
+                transferred_backups.append(backup_tag)
+                self.add_to_uploaded_backups_manifest(backup_tag)
+            else:
+                failed_backups.append(backup_tag)
+                backup_error_list.append("Backup '{}' left by a previous run could not be "
+                                         "transferred to offsite.".format(backup_tag))
+
+        return transferred_backups, failed_backups
+
+    def load_uploaded_backups_manifest(self):
+        """
+        Load the set of backups already uploaded to offsite from the local manifest.
+
+        An unreadable manifest is ignored, so the remote check is used for every backup.
+
+        :return: set of uploaded backup names, empty if the manifest does not exist.
+        """
+        manifest_path = self.get_uploaded_backups_manifest_path()
+
+        if not os.path.exists(manifest_path):
+            return set()
+
+        try:
+            with open(manifest_path) as manifest_file:
+                return set(json.load(manifest_file))
+        except (IOError, ValueError, TypeError) as manifest_exp:
+            self.logger.warning("Ignoring the uploaded backups manifest '%s' due to: %s",
+                                manifest_path, manifest_exp)
+            return set()
+
+    def save_uploaded_backups_manifest(self):
+        """
+        Write the set of uploaded backups to the local manifest.
+
+        The file is synced and renamed into place, so a crash never leaves a partial manifest.
+
+        :return: true, if the manifest was written, false otherwise.
+        """
+        manifest_path = self.get_uploaded_backups_manifest_path()
+        temp_manifest_path = "{}.tmp".format(manifest_path)
+
+        try:
+            with open(temp_manifest_path, 'w') as manifest_file:
+                json.dump(sorted(self.uploaded_backups_set), manifest_file)
+                manifest_file.flush()
+                os.fsync(manifest_file.fileno())
+
+            os.rename(temp_manifest_path, manifest_path)
+        except (IOError, OSError) as manifest_exp:
+            self.logger.warning("Could not update the uploaded backups manifest '%s' due to: %s",
+                                manifest_path, manifest_exp)
+            return False
+
+        return True
+
+    def add_to_uploaded_backups_manifest(self, backup_tag):
+        """
+        Record a backup as uploaded to offsite in the local manifest.
+
+        :param backup_tag: name of the uploaded backup.
+
+        :return: true, if the manifest was written, false otherwise.
+        """
+        self.uploaded_backups_set.add(backup_tag)
+
+        return self.save_uploaded_backups_manifest()
+
+    def remove_from_uploaded_backups_manifest(self, backup_tag_list):
+        """
+        Drop backups from the local manifest of uploaded backups.
+
+        :param backup_tag_list: names of the backups to be dropped.
+
+        :return: true, if the manifest was written or nothing changed, false otherwise.
+        """
+        self.uploaded_backups_set = self.load_uploaded_backups_manifest()
+
+        if self.uploaded_backups_set.isdisjoint(backup_tag_list):
+            return True
+
+        self.uploaded_backups_set.difference_update(backup_tag_list)
+
+        return self.save_uploaded_backups_manifest()
+
     def prepare_offsite_onsite_main_paths(self):
         """
         Prepare the main directories on onsite & offsite for backup processing.
 
+        The offsite root path is created and its content listed in a single remote call. The
+        listing is cached, so the check of each backup against offsite does not need a remote call.
+
         An exception will be raised in case of an error.
 
         :return: true, if completed successfully.
         """
-        if not check_remote_path_exists(self.offsite_config.host, self.remote_root_path):
-            if not create_remote_dir(self.offsite_config.host, self.remote_root_path):
-                raise Exception("Remote directory '{}' could not be created for customer {}."
-                                .format(self.remote_root_path, self.onsite_deployment_config.name))
+        remote_dir_created, offsite_backups_list = create_and_list_remote_dir(
+            self.offsite_config.host, self.remote_root_path)
+
+        if not remote_dir_created:
+            raise Exception("Remote directory '{}' could not be created for customer {}."
+                            .format(self.remote_root_path, self.onsite_deployment_config.name))
+
+        if offsite_backups_list is not None:
+            self.offsite_backups_set = set(offsite_backups_list)
 
         if not create_path(self.offsite_config.temp_path):
             raise Exception("Local temporary root path '{}' could not be created."
@@ -189,6 +467,10 @@ class OnsiteHandler:
         """
         Check a backup with a given tag if it exists with on offsite.
 
+        Backups recorded in the local manifest of uploaded backups are not checked remotely.
+        Otherwise, uses the cached offsite listing when it is available, or checks the remote
+        path.
+
         Raise exception if an error happens during the process.
 
         :param backup_tag: the backup tag used to do checks on offsite.
@@ -197,21 +479,23 @@ class OnsiteHandler:
 
         :return: True if the backup already exists on offsite, otherwise False.
         """
-        try:
-            processed_backup_name = backup_tag + PROCESSED_BACKUP_ENDS_WITH
-            full_bkp_path_offsite = os.path.join(backup_path_on_offsite, processed_backup_name)
+        processed_backup_name = backup_tag + PROCESSED_BACKUP_ENDS_WITH
 
-            if check_remote_path_exists(offsite_host, full_bkp_path_offsite):
-                warning_message = "Offsite has a backup with the same name. The backup {} will " \
-                                  "not be uploaded."\
-                    .format(backup_tag)
+        if backup_tag in self.uploaded_backups_set:
+            backup_exists = True
+        elif self.offsite_backups_set is not None \
+                and backup_path_on_offsite == self.remote_root_path:
+            backup_exists = processed_backup_name in self.offsite_backups_set
+        else:
+            full_bkp_path_offsite = os.path.join(backup_path_on_offsite, processed_backup_name)
+            backup_exists = check_remote_path_exists(offsite_host, full_bkp_path_offsite)
 
-                self.logger.warning(warning_message)
-                return True
-            else:
-                return False
-        except Exception as chk_bkp_on_offsite:
-            raise chk_bkp_on_offsite.message
+        if backup_exists:
+            self.logger.warning("Offsite has a backup with the same name. The backup %s will "
+                                "not be uploaded.", backup_tag)
+            return True
+        else:
+            return False
 
     def create_onsite_offsite_backup_paths(self, backup_path_on_offsite, tmp_backup_path_on_onsite):
         """
@@ -238,7 +522,64 @@ class OnsiteHandler:
 
         return True
 
-    def process_backup(self, backup_folder_name, temp_backup_path_onsite):
+    def archive_backup_list(self, backup_folder_names, temp_backup_path_onsite):
+        """
+        Archive a list of backups in parallel.
+
+        Each archive is produced by a separate tar process, so a thread pool is enough to keep
+        one tar running per core.
+
+        A backup that fails to be archived is logged and left out of the result.
+
+        :param backup_folder_names: list of backup directory names.
+        :param temp_backup_path_onsite: backup temporary directory path, config:BKP_TEMP_FOLDER.
+
+        :return: dictionary with the archived backup path of each successfully archived backup
+                 directory name.
+        """
+        original_backup_paths = [os.path.join(self.onsite_deployment_config.backup_path,
+                                              backup_folder_name)
+                                 for backup_folder_name in backup_folder_names]
+
+        self.logger.info("Archiving backup directories %s.", original_backup_paths)
+
+        archive_pool = ThreadPool(min(cpu_count(), len(backup_folder_names),
+                                      MAX_ARCHIVE_WORKERS))
+        try:
+            archived_backup_paths = archive_pool.map(
+                lambda backup_path: self.archive_backup(backup_path, temp_backup_path_onsite),
+                original_backup_paths)
+        finally:
+            archive_pool.close()
+            archive_pool.join()
+
+        archived_backups_dict = dict((backup_folder_name, archived_backup_path)
+                                     for backup_folder_name, archived_backup_path
+                                     in zip(backup_folder_names, archived_backup_paths)
+                                     if archived_backup_path is not None)
+
+        self.logger.info("The backups %s archived successfully.", archived_backups_dict.values())
+
+        return archived_backups_dict
+
+    def archive_backup(self, backup_path, temp_backup_path_onsite):
+        """
+        Archive a single backup directory, logging the error if it fails.
+
+        :param backup_path: full path of the backup directory.
+        :param temp_backup_path_onsite: backup temporary directory path, config:BKP_TEMP_FOLDER.
+
+        :return: archived backup path, None if the backup could not be archived.
+        """
+        try:
+            return compress_file(backup_path, temp_backup_path_onsite, "w")
+        except Exception as archive_exception:
+            self.logger.error("Error while archiving backup '%s': %s", backup_path,
+                              archive_exception)
+            return None
+
+    def process_backup(self, backup_folder_name, temp_backup_path_onsite,
+                       archived_backup_path=None):
         """
         Tar and encrypt the backup.
 
@@ -246,37 +587,87 @@ class OnsiteHandler:
 
         :param backup_folder_name: backup directory name.
         :param temp_backup_path_onsite: backup temporary directory path, config:BKP_TEMP_FOLDER.
+        :param archived_backup_path: path of the backup archive, if it was already archived.
 
-        :return: backup id, backup output dictionary. Used by annotated method.
+        :return: path of the encrypted backup.
         """
-        self.backup_output_dict = mp.Manager().dict()
+        if archived_backup_path is None:
+            orignial_backup_path = os.path.join(self.onsite_deployment_config.backup_path,
+                                                backup_folder_name)
 
-        orignial_backup_path = os.path.join(self.onsite_deployment_config.backup_path,
-                                            backup_folder_name)
+            self.logger.info("Archiving backup directory '%s'.", orignial_backup_path)
 
-        try:
+            archived_backup_path = compress_file(orignial_backup_path,
+                                                 temp_backup_path_onsite, "w")
 
-            self.logger.info("Archiving backup directory '{}'.".format(orignial_backup_path))
+            self.logger.info("The backup '%s' archived successfully.", archived_backup_path)
 
-            archived_backup_path = compress_file(orignial_backup_path, temp_backup_path_onsite, "w")
+        self.logger.info("Encrypting the backup '%s'.", archived_backup_path)
 
-            self.logger.info("The backup '{}' archived successfully.".format(archived_backup_path))
+        encryption_output_path = os.path.dirname(archived_backup_path)
 
-            self.logger.info("Encrypting the backup '{}'.".format(archived_backup_path))
+        encrypted_backup_path = self.gpg_manager.encrypt_file(archived_backup_path,
+                                                              encryption_output_path)
 
-            encryption_output_path = os.path.dirname(archived_backup_path)
+        self.processed_backup_path = encrypted_backup_path
 
-            encrypted_backup_path = self.gpg_manager.encrypt_file(archived_backup_path,
-                                                                  encryption_output_path)
+        self.logger.info("Backup '%s' encrypted successfully.", encrypted_backup_path)
 
-            self.processed_backup_path = encrypted_backup_path
+        return encrypted_backup_path
 
-            self.logger.info("Backup '{}' encrypted successfully.".format(encrypted_backup_path))
+    def process_and_transfer_stream(self, backup_folder_name, destination_on_offsite):
+        """
+        Tar, encrypt and upload the backup to offsite in a single pipeline.
 
-        except Exception as processing_exception:
-            raise processing_exception.message
+        The data flows through tar | gpg | azcopy, so neither the archive nor the encrypted file
+        is written to the temporary folder.
 
-        return encrypted_backup_path
+        A detailed exception will be raised in case of an error.
+
+        :param backup_folder_name: backup directory name.
+        :param destination_on_offsite: where the processed backup will be transferred to.
+
+        :return: true, if completed successfully.
+        """
+        orignial_backup_path = os.path.join(self.onsite_deployment_config.backup_path,
+                                            backup_folder_name)
+
+        processed_backup_name = backup_folder_name + PROCESSED_BACKUP_ENDS_WITH
+
+        self.logger.info("Streaming backup directory '%s' to '%s'.", orignial_backup_path,
+                         destination_on_offsite)
+
+        tar_process = Popen(get_tar_stream_command(orignial_backup_path), stdout=PIPE)
+
+        gpg_process = Popen(self.gpg_manager.get_encrypt_stream_command(),
+                            stdin=tar_process.stdout, stdout=PIPE)
+
+        # only gpg holds the read end now, so tar gets SIGPIPE if gpg exits early.
+        tar_process.stdout.close()
+
+        try:
+            AzCopyManager.transfer_stream(gpg_process.stdout, destination_on_offsite,
+                                          processed_backup_name,
+                                          self.offsite_config.azcopy_block_size_mb,
+                                          self.offsite_config.azcopy_cap_mbps,
+                                          self.offsite_config.azcopy_concurrency)
+        finally:
+            gpg_process.stdout.close()
+            gpg_ret_code = gpg_process.wait()
+            tar_ret_code = tar_process.wait()
+
+        if tar_ret_code != 0:
+            raise Exception("Tar command returned error code {} while streaming backup '{}'."
+                            .format(tar_ret_code, orignial_backup_path))
+
+        if gpg_ret_code != 0:
+            raise Exception("Encryption of backup '{}' could not be completed."
+                            .format(orignial_backup_path))
+
+        self.logger.info("The backup '%s' was successfully streamed to offsite.",
+                         orignial_backup_path)
+
+        return True
 
     def transfer_backup_to_offsite(self, backup_name, tmp_backup_path_on_onsite,
                                    destination_on_offsite):
@@ -292,24 +683,23 @@ class OnsiteHandler:
         :return: true, if success; false otherwise.
         """
         try:
+            self.logger.info("Transferring backup '%s' to '%s'", tmp_backup_path_on_onsite,
+                             destination_on_offsite)
 
+            # the kernel starts reading the file ahead while azcopy sets up the transfer.
+            advise_sequential_read(tmp_backup_path_on_onsite)
 
-            self.logger.info("Transferring backup '{}' to '{}'"
-                             .format(tmp_backup_path_on_onsite, destination_on_offsite))
-
-            transfer_time = []
-            AzCopyManager.transfer_file(tmp_backup_path_on_onsite, destination_on_offsite)
-
-            if transfer_time:
-                self.logger.log_time("Elapsed time to transfer backup '{}' to offsite: "
-                                     .format(tmp_backup_path_on_onsite), transfer_time[0])
+            AzCopyManager.transfer_file(tmp_backup_path_on_onsite, destination_on_offsite,
+                                        self.offsite_config.azcopy_block_size_mb,
+                                        self.offsite_config.azcopy_cap_mbps,
+                                        self.offsite_config.azcopy_concurrency)
 
-            self.logger.info("The backup '{}' was successfully transferred to offsite."
-                             .format(tmp_backup_path_on_onsite))
+            self.logger.info("The backup '%s' was successfully transferred to offsite.",
+                             tmp_backup_path_on_onsite)
 
         except Exception as transfer_exception:
-            self.logger.error("Error while transferring backup {} to offsite, Cause: {}"
-                              .format(backup_name, transfer_exception.message))
+            self.logger.error("Error while transferring backup %s to offsite, Cause: %s",
+                              backup_name, transfer_exception)
 
             return False
 
@@ -323,17 +713,14 @@ class OnsiteHandler:
         """
         self.logger.log_info("Deleting the temporary folder: '{}'.".format(self.bkp_temp_folder))
 
-        try:
-            if not remove_path(self.bkp_temp_folder):
-                err_message = "Error while deleting the temporary backup processing folder '{}'."\
-                    .format(self.bkp_temp_folder)
-                self.logger.error(err_message)
-                raise Exception(err_message)
-            else:
-                self.logger.log_info("Temporary folder: '{}' deleted successfully."
-                                     .format(self.bkp_temp_folder))
-        except Exception as bkp_temp_folder_del_exp:
-            raise Exception(bkp_temp_folder_del_exp.message)
+        if not remove_path(self.bkp_temp_folder):
+            err_message = "Error while deleting the temporary backup processing folder '{}'."\
+                .format(self.bkp_temp_folder)
+            self.logger.error(err_message)
+            raise Exception(err_message)
+        else:
+            self.logger.log_info("Temporary folder: '{}' deleted successfully."
+                                 .format(self.bkp_temp_folder))
 
     def perform_onsite_retention(self, number_retention, backups_path):
         """
@@ -359,23 +746,36 @@ class OnsiteHandler:
         validated_removed_list = []
 
         try:
-            for bkp_name_to_remove in onsite_bkp_dirs_to_remove_list:
-                fullpath_to_rmv = os.path.join(backups_path, bkp_name_to_remove)
-
-                if not remove_path(fullpath_to_rmv):
+            fullpaths_to_rmv = [os.path.join(backups_path, bkp_name_to_remove)
+                                for bkp_name_to_remove in onsite_bkp_dirs_to_remove_list]
+
+            # removal is bound by unlink calls, so the backup directories are removed in parallel.
+            removal_pool = ThreadPool(min(MAX_REMOVAL_WORKERS, len(fullpaths_to_rmv)))
+            try:
+                removal_results = removal_pool.map(remove_path, fullpaths_to_rmv)
+            finally:
+                removal_pool.close()
+                removal_pool.join()
+
+            for bkp_name_to_remove, removed in zip(onsite_bkp_dirs_to_remove_list,
+                                                   removal_results):
+                if not removed:
                     not_removed_list.append(bkp_name_to_remove)
                 else:
                     validated_removed_list.append(bkp_name_to_remove)
 
+            if validated_removed_list:
+                self.remove_from_uploaded_backups_manifest(validated_removed_list)
+
             if not_removed_list:
                 log_message = "Following backups were not removed: {}".format(not_removed_list)
                 raise Exception(log_message)
 
         except Exception as cleanup_exp:
             if validated_removed_list:
-                return False, cleanup_exp.message, validated_removed_list
+                return False, str(cleanup_exp), validated_removed_list
             else:
-                return False, cleanup_exp.message, []
+                return False, str(cleanup_exp), []
 
         succees_msg = "Onsite backups clean up finished successfully, removed backups: "
         return True, succees_msg, validated_removed_list
@@ -390,12 +790,10 @@ class OnsiteHandler:
         """
         onsite_dirs_to_remove_list = []
 
-        self.logger.info("Checking the path '{}' to prepare onsite cleanup."
-                         .format(backups_path))
+        self.logger.info("Checking the path '%s' to prepare onsite cleanup.", backups_path)
 
-        path, onsite_backups_list, files = next(os.walk(backups_path))
-        onsite_backups_list.sort(key=lambda s: os.path.getmtime(os.path.join(backups_path, s)),
-                                 reverse=True)
+        onsite_backups_list = [(entry.name, entry.stat().st_mtime)
+                               for entry in scandir(backups_path) if entry.is_dir()]
 
         onsite_backups_list_size = len(onsite_backups_list)
 
@@ -403,13 +801,16 @@ class OnsiteHandler:
             .format(onsite_backups_list_size, onsite_retention)
 
         if onsite_backups_list_size > onsite_retention:
-            onsite_dirs_to_remove_list.extend(onsite_backups_list[onsite_retention:])
+            number_to_remove = onsite_backups_list_size - onsite_retention
+
+            # only the oldest backups need ordering, oldest first.
+            onsite_dirs_to_remove_list.extend(
+                backup_dir_name for backup_dir_name, _ in heapq.nsmallest(
+                    number_to_remove, onsite_backups_list, key=lambda backup_dir: backup_dir[1]))
 
-            self.logger.info("{} {} backups should be removed."
-                             .format(log_message, onsite_backups_list_size - onsite_retention))
+            self.logger.info("%s %s backups should be removed.", log_message, number_to_remove)
         else:
-            self.logger.warning("{} Nothing to do.".format(log_message))
+            self.logger.warning("%s Nothing to do.", log_message)
 
-        onsite_dirs_to_remove_list.reverse()
         return onsite_dirs_to_remove_list
 
@@ -11,22 +11,81 @@
 """Module to handle backup transfer and related sub-procedures."""
 
 from enum import Enum
+import math
+from multiprocessing import cpu_count
+from multiprocessing.pool import ThreadPool
 import os
-import subprocess
+import random
+import re
+import tempfile
+from threading import Thread
+import time
+
+try:
+    import subprocess32 as subprocess
+except ImportError:
+    import subprocess
 
 
-from network_backup_offsite.utils import check_remote_path_exists, timeit
+from network_backup_offsite.utils import scandir, SSH_CONTROL_MASTER_NO, SSH_CONTROL_PATH, timeit
 
 NUMBER_TRIES = 3
+RETRY_BACKOFF_SECONDS = 2
+RSYNC_TRANSIENT_ERROR_CODES = (24, 30, 35)
+PARTITION_CHUNK_BYTES = 10 * 1024 ** 3
+MAX_SEND_WORKERS = max(1, int(math.sqrt(cpu_count())))
+HUMAN_NUMBER_SUFFIXES = {'k': 1e3, 'm': 1e6, 'g': 1e9, 't': 1e12}
 RSYNC_MODULE = "rsync://"
 RSYNC_CMD = "rsync"
 RSYNC_DAEMON_DESTINATION = "/rsyncd"
-RSYNC_SSH_ARGS = "-ahce ssh"
-RSYNC_DAEMON_ARGS = "-ahc"
+RSYNC_SSH_CMD = "ssh -o {} -o {}".format(SSH_CONTROL_MASTER_NO, SSH_CONTROL_PATH)
+# concurrent partition sends do not share the control socket, so each one gets its own TCP flow.
+RSYNC_SSH_OWN_CONNECTION_CMD = "ssh -o ControlPath=none"
+RSYNC_SSH_ARGS = ["-a", "-h", "-e", RSYNC_SSH_CMD]
+RSYNC_SSH_OWN_CONNECTION_ARGS = ["-a", "-h", "-e", RSYNC_SSH_OWN_CONNECTION_CMD]
+RSYNC_DAEMON_ARGS = ["-a", "-h"]
+RSYNC_CHECKSUM_ARG = "-c"
+RSYNC_STATS_ARGS = ["--stats", "--info=stats2,name0"]
+RSYNC_WHOLE_FILE_ARG = "-W"
+RSYNC_INPLACE_ARGS = ["--inplace", "--partial"]
+RSYNC_COMPRESS_ARGS = ["--compress", "--compress-choice={}"]
+RSYNC_NO_SUCH_FILE_ERROR = "No such file or directory"
+REMOTE_PATH_RE = re.compile(r'^[^/@\s]+@[^:/]+:')
 
 RsyncOutputSummaryItem = Enum('RsyncOutputSummaryItem',
                               'total_files, created, deleted, transferred, rate, speedup')
 
+TOTAL_FILES_KEY = RsyncOutputSummaryItem.total_files.name
+CREATED_KEY = RsyncOutputSummaryItem.created.name
+DELETED_KEY = RsyncOutputSummaryItem.deleted.name
+TRANSFERRED_KEY = RsyncOutputSummaryItem.transferred.name
+RATE_KEY = RsyncOutputSummaryItem.rate.name
+SPEEDUP_KEY = RsyncOutputSummaryItem.speedup.name
+
+RSYNC_SUMMARY_RE = re.compile(
+    r'number of files:\s*(?P<total_files>[\d,]+)'
+    r'|number of created files:\s*(?P<created>[\d,]+)'
+    r'|number of deleted files:\s*(?P<deleted>[\d,]+)'
+    r'|number of (?:regular )?files transferred:\s*(?P<transferred>[\d,]+)'
+    r'|(?P<rate>[\d,.]+[kmgt]?) bytes/sec'
+    r'|speedup is\s*(?P<speedup>[\d,.]+)', re.I)
+
+
+def parse_human_number(value):
+    """
+    Convert a number printed by rsync, possibly with thousand separators or a -h suffix, to float.
+
+    :param value: number as printed by rsync, e.g. '1,024' or '1.50M'.
+
+    :return: the float value of the number.
+    """
+    value = str(value).replace(',', '').strip().lower()
+
+    if value and value[-1] in HUMAN_NUMBER_SUFFIXES:
+        return float(value[:-1]) * HUMAN_NUMBER_SUFFIXES[value[-1]]
+
+    return float(value)
+
 
 class RsyncOutput:
     """Class used to store relevant output information of rsync commands."""
@@ -37,12 +96,12 @@ class RsyncOutput:
 
         :param summary_dic: dictionary with data parsed from the rsync output.
         """
-        self.n_files = summary_dic[RsyncOutputSummaryItem.total_files.name]
-        self.n_created_files = summary_dic[RsyncOutputSummaryItem.created.name]
-        self.n_deleted_files = summary_dic[RsyncOutputSummaryItem.deleted.name]
-        self.n_transferred_files = summary_dic[RsyncOutputSummaryItem.transferred.name]
-        self.speedup = summary_dic[RsyncOutputSummaryItem.speedup.name]
-        self.rate = summary_dic[RsyncOutputSummaryItem.rate.name]
+        self.n_files = summary_dic[TOTAL_FILES_KEY]
+        self.n_created_files = summary_dic[CREATED_KEY]
+        self.n_deleted_files = summary_dic[DELETED_KEY]
+        self.n_transferred_files = summary_dic[TRANSFERRED_KEY]
+        self.speedup = summary_dic[SPEEDUP_KEY]
+        self.rate = summary_dic[RATE_KEY]
 
     def __str__(self):
         """Representation of stored data in object."""
@@ -56,6 +115,31 @@ class RsyncOutput:
                                             self.n_deleted_files, self.n_transferred_files,
                                             self.speedup, self.rate)
 
+    @staticmethod
+    def merge(rsync_output_list):
+        """
+        Merge the outputs of rsync commands that ran concurrently into a single RsyncOutput.
+
+        File counters and transfer rates are added up, while the speedup is averaged.
+
+        :param rsync_output_list: list of RsyncOutput objects.
+
+        :return: RsyncOutput object with the merged information.
+        """
+        def sum_of(attribute):
+            return sum(parse_human_number(getattr(rsync_output, attribute))
+                       for rsync_output in rsync_output_list)
+
+        summary_dic = {
+            TOTAL_FILES_KEY: str(int(sum_of('n_files'))),
+            CREATED_KEY: str(int(sum_of('n_created_files'))),
+            DELETED_KEY: str(int(sum_of('n_deleted_files'))),
+            TRANSFERRED_KEY: str(int(sum_of('n_transferred_files'))),
+            RATE_KEY: "{:.2f}".format(sum_of('rate')),
+            SPEEDUP_KEY: "{:.2f}".format(sum_of('speedup') / len(rsync_output_list))}
+
+        return RsyncOutput(summary_dic)
+
 
 class RsyncManager:
     """
@@ -63,10 +147,12 @@ class RsyncManager:
 
     It basically sends/receives data from one location to another.
     When sending files from local to remote, it keeps track of whether the file was successfully
-    transferred or not after a given number of tries. In addition, it performs md5 checksum.
+    transferred or not after a given number of tries. Files are compared by size and modification
+    time, unless the checksum comparison is turned on with the checksum argument.
     """
 
-    def __init__(self, source_path, destination_path, retry=NUMBER_TRIES, rsync_ssh=True):
+    def __init__(self, source_path, destination_path, retry=NUMBER_TRIES, rsync_ssh=True,
+                 whole_file=False, compression=None, inplace=True, checksum=False):
         """
         Initialize Rsync Manager class.
 
@@ -75,11 +161,95 @@ class RsyncManager:
         :param retry: number of tries in case of failure.
         :param rsync_ssh: boolean to determine whether to use rsync over ssh or rsync daemon
         default value is true, which means use rsync ssh by default.
+        :param whole_file: boolean to disable the rsync delta-transfer algorithm, which only pays
+        off on slow links. rsync already does so when both paths are local.
+        :param compression: rsync compression algorithm, e.g. zstd or lz4, requires rsync 3.2 or
+        newer. Default value is None, which means no compression.
+        :param inplace: boolean to update the remote files in place when sending, instead of
+        writing a temporary copy and renaming it, keeping partial files between tries.
+        :param checksum: boolean to compare every file by checksum, instead of size and
+        modification time, to decide what to send. Either way rsync verifies each transferred
+        file with a checksum computed while it is sent.
         """
         self.source_path = source_path
         self.destination_path = destination_path
         self.retry = retry
         self.rsync_ssh = rsync_ssh
+        self.whole_file = whole_file
+        self.compression = compression
+        self.inplace = inplace
+        self.checksum = checksum
+
+    def get_rsync_args(self, shared_connection=True):
+        """
+        Get the rsync arguments according to the transport, delta-transfer and compression settings.
+
+        rsync only prints its summary, not a line for every file, as that is all parse_output uses.
+
+        :param shared_connection: whether ssh may reuse the master connection of the host.
+
+        :return: list with the rsync arguments.
+        """
+        if not self.rsync_ssh:
+            rsync_args = list(RSYNC_DAEMON_ARGS)
+        elif shared_connection:
+            rsync_args = list(RSYNC_SSH_ARGS)
+        else:
+            rsync_args = list(RSYNC_SSH_OWN_CONNECTION_ARGS)
+
+        rsync_args.extend(RSYNC_STATS_ARGS)
+
+        if self.checksum:
+            rsync_args.append(RSYNC_CHECKSUM_ARG)
+
+        if self.whole_file:
+            rsync_args.append(RSYNC_WHOLE_FILE_ARG)
+
+        if self.compression:
+            rsync_args.extend(arg.format(self.compression) for arg in RSYNC_COMPRESS_ARGS)
+
+        return rsync_args
+
+    def get_rsync_path(self, remote_path):
+        """
+        Get a remote path as expected by rsync, pointing to the daemon module without rsync_ssh.
+
+        :param remote_path: remote path in the host:path format.
+
+        :return: path to be passed to rsync.
+        """
+        if self.rsync_ssh:
+            return remote_path
+
+        return "{}{}".format(RSYNC_MODULE, remote_path.replace(":", RSYNC_DAEMON_DESTINATION))
+
+    def get_rsync_command(self, source_paths, destination_path, send=True, extra_args=(),
+                          shared_connection=True):
+        """
+        Build the rsync command used by every transfer of this object.
+
+        When sending, the destination is the remote path, otherwise the sources are.
+
+        :param source_paths: list of paths to be transferred.
+        :param destination_path: path to transfer them to.
+        :param send: boolean to determine whether the files are sent or received.
+        :param extra_args: additional rsync arguments, placed before the paths.
+        :param shared_connection: whether ssh may reuse the master connection of the host.
+
+        :return: list with the rsync command and its arguments.
+        """
+        rsync_args = self.get_rsync_args(shared_connection)
+
+        if send:
+            if self.inplace:
+                rsync_args.extend(RSYNC_INPLACE_ARGS)
+
+            destination_path = self.get_rsync_path(destination_path)
+        else:
+            source_paths = [self.get_rsync_path(source_path) for source_path in source_paths]
+
+        return [RSYNC_CMD] + rsync_args + list(extra_args) + list(source_paths) + \
+            [destination_path]
 
     def get_number_of_files_to_send(self):
         """
@@ -89,18 +259,16 @@ class RsyncManager:
         files or folders inside.
 
         If source_path refers to a single file, returns 1, otherwise go through the folder's
-        content and count the number of files.
+        content and count the number of files. Links to folders are counted as files.
 
         :return: number of files to be transferred.
         """
         if not os.path.exists(self.source_path):
             raise Exception("Specified path '{}' does not exist.".format(self.source_path))
 
-        n_files = 0
         if os.path.isdir(self.source_path):
-            for file_name in os.listdir(self.source_path):
-                if not os.path.isdir(os.path.join(self.source_path, file_name)):
-                    n_files += 1
+            n_files = sum(1 for entry in scandir(self.source_path)
+                          if not entry.is_dir(follow_symlinks=False))
         else:
             n_files = 1
 
@@ -110,96 +278,231 @@ class RsyncManager:
 
         return n_files
 
-    @staticmethod
-    def parse_number_of_file_key_value(rsync_output_line):
+    def is_source_larger_than(self, max_bytes):
         """
-        Parse rsync output.
+        Check if the files under source_path add up to more than max_bytes.
+
+        Links are not followed and the walk stops as soon as max_bytes is exceeded.
 
-        Given a line from the rsync output, this function gets the number of file measurement as
-        well as the text field it is being referred.
+        :param max_bytes: size in bytes to compare with.
+
+        :return: true, if the files under source_path are larger than max_bytes,
+                 false, otherwise.
+        """
+        total_bytes = 0
 
-        Raise an exception is something gets wrong.
+        for root, _, file_names in os.walk(self.source_path):
+            for file_name in file_names:
+                total_bytes += os.lstat(os.path.join(root, file_name)).st_size
+
+                if total_bytes > max_bytes:
+                    return True
+
+        return False
+
+    def get_file_partitions(self, chunk_bytes=PARTITION_CHUNK_BYTES):
+        """
+        Split the entries under source_path into partitions of roughly chunk_bytes each.
 
-        :param rsync_output_line: rsync output line with the 'number of' measurement.
+        Only a directory larger than chunk_bytes is split, as a smaller one is sent with a single
+        rsync command anyway.
 
-        :return: key, value pair (measurement string, number of files).
+        Entry paths are relative to the parent of source_path, so that sending them with
+        --files-from keeps the same layout as sending source_path itself. Links, including links
+        to folders, are sent as links, and empty folders are listed so they are created as well.
+
+        :param chunk_bytes: approximate size in bytes of each partition.
+
+        :return: list of partitions, each one a list of relative entry paths,
+                 empty list if source_path is not a directory larger than chunk_bytes.
+        """
+        if not os.path.isdir(self.source_path) or not self.is_source_larger_than(chunk_bytes):
+            return []
+
+        base_path = os.path.dirname(os.path.normpath(self.source_path)) or os.curdir
+
+        file_partitions = []
+        current_partition = []
+        current_partition_bytes = 0
+
+        for root, dir_names, file_names in os.walk(self.source_path):
+            if not dir_names and not file_names:
+                current_partition.append(os.path.relpath(root, base_path))
+
+            link_names = [dir_name for dir_name in dir_names
+                          if os.path.islink(os.path.join(root, dir_name))]
+
+            for file_name in file_names + link_names:
+                file_path = os.path.join(root, file_name)
+
+                current_partition.append(os.path.relpath(file_path, base_path))
+                current_partition_bytes += os.lstat(file_path).st_size
+
+                if current_partition_bytes >= chunk_bytes:
+                    file_partitions.append(current_partition)
+                    current_partition = []
+                    current_partition_bytes = 0
+
+        if current_partition:
+            file_partitions.append(current_partition)
+
+        return file_partitions
+
+    def send_partition(self, file_partition):
+        """
+        Send a partition of the source files with a single rsync command.
+
+        The command opens its own ssh connection instead of sharing the master connection.
+
+        :param file_partition: list of file paths relative to the parent of source_path.
+
+        :return: RsyncOutput object with the output information of the command.
         """
-        if "number of" not in rsync_output_line:
-            raise Exception("Line '{}' does not contain a number of measurement.".format(
-                rsync_output_line))
+        base_path = os.path.dirname(os.path.normpath(self.source_path)) or os.curdir
 
-        par = rsync_output_line.find('(')
-        if par != -1:
-            rsync_output_line = rsync_output_line[0:par - 1]
+        with tempfile.NamedTemporaryFile() as files_from:
+            files_from.write("\n".join(file_partition))
+            files_from.flush()
 
-        if rsync_output_line.find(":") == -1:
-            raise Exception("Could not parse rsync output line: {}.".format(rsync_output_line))
+            return self.run_rsync(self.get_rsync_command(
+                [base_path], self.destination_path, extra_args=['--files-from', files_from.name],
+                shared_connection=False))
 
-        number_of_files = rsync_output_line.split(':')[1].strip()
+    def send_partitions(self, file_partitions):
+        """
+        Send the partitions of the source files with concurrent rsync commands.
 
-        key = RsyncOutputSummaryItem.total_files.name
+        Each rsync command uses its own connection, so the transfer is not limited by a single
+        TCP flow.
 
-        if RsyncOutputSummaryItem.transferred.name in rsync_output_line:
-            key = RsyncOutputSummaryItem.transferred.name
-        elif RsyncOutputSummaryItem.deleted.name in rsync_output_line:
-            key = RsyncOutputSummaryItem.deleted.name
-        elif RsyncOutputSummaryItem.created.name in rsync_output_line:
-            key = RsyncOutputSummaryItem.created.name
+        :param file_partitions: list of partitions from get_file_partitions.
 
-        return key, number_of_files
+        :return: RsyncOutput object with the merged output information of the commands.
+        """
+        send_pool = ThreadPool(min(len(file_partitions), MAX_SEND_WORKERS))
+        try:
+            rsync_output_list = send_pool.map(self.send_partition, file_partitions)
+        finally:
+            send_pool.close()
+            send_pool.join()
+
+        return RsyncOutput.merge(rsync_output_list)
 
     @staticmethod
     def parse_output(output):
         """
         Parse the output of a rsync execution.
 
-        Collect relevant information to be stored in a RsyncOutput object.
+        Collect relevant information to be stored in a RsyncOutput object, scanning the whole
+        output once with RSYNC_SUMMARY_RE, which is case insensitive, so no lowercase or split
+        copies of the output are made.
 
         :param output: output after a rsync execution.
 
         :return: false, if it was not possible to parse the output,
                  RsyncOutput object with the retrieved information.
         """
-        if output is None or not str(output).strip():
+        if not output or output.isspace():
             raise Exception("Empty output.")
 
-        lines = str(output).lower().split('\n')
+        summary_dic = RsyncManager.create_summary_dic()
+
+        RsyncManager.update_summary_dic(summary_dic, output)
 
+        return RsyncManager.get_rsync_output(summary_dic)
+
+    @staticmethod
+    def create_summary_dic():
+        """
+        Create the dictionary that holds the summary items parsed from a rsync output.
+
+        :return: dictionary with every summary item set to None.
+        """
         summary_dic = {}
         for summary_item in RsyncOutputSummaryItem:
             summary_dic[summary_item.name] = None
 
-        for line in lines:
-            if "number of" in line:
+        return summary_dic
 
-                key, number_of_files = RsyncManager.parse_number_of_file_key_value(line)
-
-                summary_dic[key] = number_of_files
+    @staticmethod
+    def update_summary_dic(summary_dic, output):
+        """
+        Update the summary dictionary with the summary items found in a piece of rsync output.
 
-            elif "bytes/sec" in line:
-                line_split = line.split(" ")
+        :param summary_dic: dictionary created by create_summary_dic.
+        :param output: rsync output, either complete or a single line.
+        """
+        for summary_match in RSYNC_SUMMARY_RE.finditer(output):
+            for key, value in summary_match.groupdict().items():
+                if value is not None:
+                    summary_dic[key] = value
 
-                item_index = 0
-                for item in line_split:
-                    if "bytes/sec" in item.strip():
-                        break
-                    item_index += 1
+    @staticmethod
+    def parse_output_stream(output_stream, summary_dic):
+        """
+        Read a rsync output stream until it is closed, updating the summary dictionary per line.
 
-                summary_dic[RsyncOutputSummaryItem.rate.name] = line_split[item_index - 1]
+        :param output_stream: file object with the rsync output.
+        :param summary_dic: dictionary created by create_summary_dic.
+        """
+        for line in iter(output_stream.readline, ''):
+            RsyncManager.update_summary_dic(summary_dic, line)
 
-            elif RsyncOutputSummaryItem.speedup.name in line:
+    @staticmethod
+    def get_rsync_output(summary_dic):
+        """
+        Create a RsyncOutput object from a summary dictionary.
 
-                speedup_value = line[line.find(RsyncOutputSummaryItem.speedup.name) + len(
-                    RsyncOutputSummaryItem.speedup.name) + len(" is "):]
+        Raise an exception if some summary item was not found in the output.
 
-                summary_dic[RsyncOutputSummaryItem.speedup.name] = speedup_value
+        :param summary_dic: dictionary updated by update_summary_dic.
 
+        :return: RsyncOutput object with the retrieved information.
+        """
         for item in summary_dic:
             if summary_dic[item] is None:
                 raise Exception("Parsing did not find valid tags in the output.")
 
         return RsyncOutput(summary_dic)
 
+    @staticmethod
+    def run_rsync(rsync_command):
+        """
+        Run a rsync command, parsing its output line by line while it is emitted.
+
+        The output is parsed by a separate thread, while this one drains the error output and waits
+        for rsync, so neither pipe fills up and the RsyncOutput is ready when rsync exits.
+
+        subprocess32 is used when available, as it spawns the process from C code, which is
+        faster and safe to call from the concurrent send threads.
+
+        A CalledProcessError is raised if rsync exits with an error, with the error output of the
+        command as its output.
+
+        :param rsync_command: list with the rsync command and its arguments.
+
+        :return: RsyncOutput object with the output information of the command.
+        """
+        rsync_process = subprocess.Popen(rsync_command, stdout=subprocess.PIPE,
+                                         stderr=subprocess.PIPE, bufsize=1, close_fds=True)
+
+        summary_dic = RsyncManager.create_summary_dic()
+
+        parse_thread = Thread(target=RsyncManager.parse_output_stream,
+                              args=(rsync_process.stdout, summary_dic))
+        parse_thread.start()
+
+        error_output = rsync_process.stderr.read()
+
+        rsync_process.wait()
+        parse_thread.join()
+
+        if rsync_process.returncode != 0:
+            raise subprocess.CalledProcessError(rsync_process.returncode, rsync_command,
+                                                error_output)
+
+        return RsyncManager.get_rsync_output(summary_dic)
+
     def receive(self):
         """
         Try to receive files from a remote location.
@@ -207,42 +510,34 @@ class RsyncManager:
         Remote location is specified by the source_path.
         Destination location is specified by the destination_path.
 
+        The remote file is not checked beforehand, rsync reports it if it does not exist.
+
         An exception is raised if some problem happens during the process.
 
         :return: RsyncOutput object with the output information of the command.
         """
         try:
-            if self.rsync_ssh:
-                rsync_args = RSYNC_SSH_ARGS
-                source_path = self.source_path
-            else:
-                rsync_args = RSYNC_DAEMON_ARGS
-                source_path = "{}{}".format(RSYNC_MODULE,
-                                            self.source_path.replace(":",
-                                                                     RSYNC_DAEMON_DESTINATION))
             source_path_split = self.source_path.split(':')
 
             if len(source_path_split) != 2:
                 raise Exception("Invalid source path '{}'.".format(self.source_path))
 
-            host = source_path_split[0]
             remote_path = source_path_split[1]
 
-            if not check_remote_path_exists(host, remote_path):
-                raise Exception("Remote file '{}' does not exist.".format(remote_path))
-
-            output = subprocess.check_output([RSYNC_CMD, rsync_args, '--stats', source_path,
-                                              self.destination_path], stderr=subprocess.PIPE)
-
-            return self.parse_output(output)
+            return self.run_rsync(self.get_rsync_command([self.source_path],
+                                                         self.destination_path, send=False))
 
         except subprocess.CalledProcessError as proc_exp:
+            if RSYNC_NO_SUCH_FILE_ERROR in (proc_exp.output or ""):
+                raise Exception("Error while receiving file '{}'. Remote file '{}' does not "
+                                "exist.".format(self.source_path, remote_path))
+
             raise Exception("Error while receiving file '{}'. Error code {}.".format(
                 self.source_path, proc_exp.returncode))
 
         except Exception as receive_exp:
             raise Exception("Error while receiving file '{}'. {}".format(self.source_path,
-                                                                         receive_exp.message))
+                                                                         str(receive_exp)))
 
     def send(self):
         """
@@ -250,44 +545,45 @@ class RsyncManager:
 
         It will try to send the file as many times as specified by the retry variable.
 
+        rsync errors are only retried when they are transient, e.g. a timeout, waiting longer
+        before each new try. Other errors are raised right away.
+
+        A rsync run that exits successfully is a success, whatever the number of transferred files,
+        as rsync only transfers files that changed and counts the files of nested folders too.
+
+        When source_path is a directory bigger than PARTITION_CHUNK_BYTES, its files are split
+        into partitions sent by concurrent rsync commands.
+
         An exception will be raised if the maximum number of tries is reached without success.
 
         :return: RsyncOutput object with the output information of the command.
         """
         try:
-            n_files = self.get_number_of_files_to_send()
+            self.get_number_of_files_to_send()
 
-            if self.rsync_ssh:
-                rsync_args = RSYNC_SSH_ARGS
-                destination_path = self.destination_path
-            else:
-                rsync_args = RSYNC_DAEMON_ARGS
-                destination_path = \
-                    "{}{}".format(RSYNC_MODULE,
-                                  self.destination_path.replace(":", RSYNC_DAEMON_DESTINATION))
+            rsync_command = self.get_rsync_command([self.source_path], self.destination_path)
+
+            file_partitions = self.get_file_partitions()
 
             for current_try in range(1, self.retry + 1):
-                output = subprocess.check_output([RSYNC_CMD,
-                                                  rsync_args,
-                                                  '--stats',
-                                                  self.source_path,
-                                                  destination_path],
-                                                 stderr=subprocess.PIPE)
+                try:
+                    if len(file_partitions) > 1:
+                        rsync_output = self.send_partitions(file_partitions)
+                    else:
+                        rsync_output = self.run_rsync(rsync_command)
+
+                except subprocess.CalledProcessError as proc_exp:
+                    if proc_exp.returncode not in RSYNC_TRANSIENT_ERROR_CODES or \
+                            current_try == self.retry:
+                        raise
 
-                rsync_output = self.parse_output(output)
+                    time.sleep(RETRY_BACKOFF_SECONDS ** current_try + random.random())
+                    continue
 
                 if not isinstance(rsync_output, RsyncOutput):
                     raise Exception("Can't parse the output from rsync command.")
 
-                if int(rsync_output.n_transferred_files) == int(n_files):
-                    return rsync_output
-
-                if current_try == self.retry:
-                    raise Exception("Can't transfer file(s) to remote server:\n"
-                                    "Number of tries: {}\n"
-                                    "Number of files to be transferred: {}\n"
-                                    "Number of transferred files: {}\n"
-                                    .format(self.retry, n_files, rsync_output.n_transferred_files))
+                return rsync_output
 
         except subprocess.CalledProcessError as proc_exp:
             raise Exception("Error while sending file '{}'. Error code {}.".format(
@@ -295,11 +591,12 @@ class RsyncManager:
 
         except Exception as send_exp:
             raise Exception("Error while sending file '{}'. {}".format(self.source_path,
-                                                                       send_exp.message))
+                                                                       str(send_exp)))
 
     @staticmethod
     @timeit
-    def transfer_file(source_path, target_path, rsync_ssh=True, **kwargs):
+    def transfer_file(source_path, target_path, rsync_ssh=True, whole_file=False,
+                      compression=None, **kwargs):
         """
         Transfer a file from the source to a target location by using RsyncManager.
 
@@ -315,6 +612,8 @@ class RsyncManager:
         :param target_path: remote location.
         :param rsync_ssh: boolean to determine whether to use rsync over ssh or rsync daemon,
                default value is true, which means use rsync ssh by default.
+        :param whole_file: boolean to send whole files instead of deltas, for fast links.
+        :param compression: rsync compression algorithm, e.g. zstd, or None for no compression.
 
         :return true, when the function executed without errors,
                 raise an exception otherwise.
@@ -322,13 +621,66 @@ class RsyncManager:
         if not source_path.strip() or not target_path.strip():
             raise Exception("Empty input was provided.")
 
-        if '@' in source_path:
-            rsync_output = RsyncManager(source_path, target_path, NUMBER_TRIES, rsync_ssh).receive()
+        if REMOTE_PATH_RE.match(source_path):
+            rsync_output = RsyncManager(source_path, target_path, NUMBER_TRIES, rsync_ssh,
+                                        whole_file, compression).receive()
         else:
-            rsync_output = RsyncManager(source_path, target_path, NUMBER_TRIES, rsync_ssh).send()
+            rsync_output = RsyncManager(source_path, target_path, NUMBER_TRIES, rsync_ssh,
+                                        whole_file, compression).send()
 
         return rsync_output
 
+    def send_paths(self, source_paths):
+        """
+        Send several local files or folders to the destination_path location with one rsync command.
+
+        Only one connection is opened to the remote server, instead of one per path.
+
+        An exception will be raised if some problem happens during the process.
+
+        :param source_paths: list of local paths to be sent.
+
+        :return: RsyncOutput object with the output information of the command.
+        """
+        try:
+            for source_path in source_paths:
+                if not os.path.exists(source_path):
+                    raise Exception("Specified path '{}' does not exist.".format(source_path))
+
+            return self.run_rsync(self.get_rsync_command(source_paths, self.destination_path))
+
+        except subprocess.CalledProcessError as proc_exp:
+            raise Exception("Error while sending files {}. Error code {}.".format(
+                source_paths, proc_exp.returncode))
+
+        except Exception as send_exp:
+            raise Exception("Error while sending files {}. {}".format(source_paths,
+                                                                     str(send_exp)))
+
+    @staticmethod
+    @timeit
+    def transfer_files(source_paths, target_path, rsync_ssh=True, whole_file=False,
+                       compression=None, **kwargs):
+        """
+        Transfer several local files or folders to a target location with a single rsync command.
+
+        If an error occurs, an Exception is raised with the details of the problem.
+
+        :param source_paths: list of local file or folder names to be transferred.
+        :param target_path: remote location.
+        :param rsync_ssh: boolean to determine whether to use rsync over ssh or rsync daemon,
+               default value is true, which means use rsync ssh by default.
+        :param whole_file: boolean to send whole files instead of deltas, for fast links.
+        :param compression: rsync compression algorithm, e.g. zstd, or None for no compression.
+
+        :return: RsyncOutput object with the output information of the command.
+        """
+        if not source_paths or not target_path.strip():
+            raise Exception("Empty input was provided.")
+
+        return RsyncManager(source_paths[0], target_path, NUMBER_TRIES, rsync_ssh, whole_file,
+                            compression).send_paths(source_paths)
+
 
 '''
 #Sample of usage:
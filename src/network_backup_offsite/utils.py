@@ -10,17 +10,32 @@
 
 """Module to handle helper functions."""
 
+from distutils.spawn import find_executable
 from enum import Enum
-import gzip
+import errno
+import math
+from multiprocessing import cpu_count
 import os
-import shutil
+from pipes import quote
+import re
 import socket
+import stat
 from subprocess import PIPE, Popen
 import sys
-from tarfile import TarError, TarFile
 from threading import Timer
 import time
 
+try:
+    from os import scandir
+except ImportError:
+    from scandir import scandir
+
+# Python 2 has no monotonic clock in the standard library, so elapsed times fall back to time.
+try:
+    from time import monotonic
+except ImportError:
+    from time import time as monotonic
+
 from network_backup_offsite.exceptions import ExceptionCodes, UtilsException
 
 
@@ -40,6 +55,40 @@ LOG_ROOT_PATH_CLI = "--log_root_path"
 TIMEOUT = 120
 LOG_LEVEL = "LogLevel=ERROR"
 
+# ssh calls share the master connection of their host through this socket, when one is running.
+# It is kept in the private ~/.ssh folder, so other local users cannot take its name.
+SSH_CONTROL_DIR = os.path.join(os.path.expanduser("~"), ".ssh")
+SSH_CONTROL_PATH = "ControlPath=~/.ssh/nbo-%r@%h:%p"
+SSH_CONTROL_PERSIST = "ControlPersist=600"
+# only start_ssh_master_connection starts a master, the other ssh calls just attach to it.
+SSH_CONTROL_MASTER_NO = "ControlMaster=no"
+
+SSH_PORT = 22
+HOST_PROBE_TIMEOUT = 2
+HOST_ACCESSIBLE_CACHE_TTL = 60
+
+# The ssh connection timeout follows the round trip time measured to each host, so a dead host is
+# detected quickly on a LAN while a slow WAN link still has time to connect.
+HOST_RTT_CACHE_TTL = 300
+SSH_MIN_CONNECT_TIMEOUT = 5
+SSH_CONNECT_TIMEOUT_RTT_FACTOR = 50
+REMOTE_PATH_CACHE_TTL = 30
+
+REMOTE_PATH_EXISTS = "EXISTS"
+REMOTE_PATH_MISSING = "MISSING"
+REMOTE_DIR_AVAILABLE = "DIR_IS_AVAILABLE"
+
+# Remote shell commands, formatted with the quoted path(s) they act on.
+CHECK_REMOTE_PATH_CMD = "if [ -d {0} ] || [ -f {0} ]; then echo " + REMOTE_DIR_AVAILABLE + "; fi\n"
+LIST_REMOTE_DIR_CMD = "if [ -d {0} ]; then ls -1 {0}; fi\n"
+CREATE_REMOTE_DIR_CMD = "mkdir -p {0} && [ -d {0} ] && echo " + REMOTE_DIR_AVAILABLE + "\n"
+REMOVE_REMOTE_PATH_CMD = "rm -rf -- {0}\n"
+CHECK_REMOVED_PATH_CMD = "if [ -e {0} ]; then echo " + REMOTE_PATH_EXISTS + "; else echo " + \
+                         REMOTE_PATH_MISSING + "; fi\n"
+
+# printed after each command of a batch, to split the output of a single ssh call.
+REMOTE_BATCH_SEPARATOR = "BATCH_COMMAND_DONE"
+
 BLOCK_SIZE_MB_STR = "MB"
 BLOCK_SIZE_GB_STR = "GB"
 
@@ -50,7 +99,9 @@ DEFAULT_NUM_THREADS = 5
 DEFAULT_NUM_PROCESSORS = 5
 DEFAULT_NUM_TRANSFER_PROCS = 8
 
-PLATFORM_NAME = str(sys.platform).lower()
+PLATFORM_NAME = sys.platform
+
+HOME_DIR = os.path.expanduser("~")
 
 DF_COMMAND_AVAILABLE_SPACE_INDEX = 3
 DF_COMMAND_MOUNTED_ON_INDEX = 5
@@ -58,9 +109,26 @@ DF_COMMAND_MOUNTED_ON_INDEX = 5
 PROCESSED_BACKUP_ENDS_WITH = "." + TAR_SUFFIX + "." + GPG_SUFFIX
 
 TAR_CMD = "tar"
-if 'sun' in PLATFORM_NAME:
+if PLATFORM_NAME.startswith('sunos'):
     TAR_CMD = "gtar"
 
+# pigz compresses gzip blocks on all cores and produces the same format, so prefer it when present.
+GZIP_CMD = "gzip"
+if find_executable("pigz"):
+    GZIP_CMD = "pigz -p {}".format(cpu_count())
+
+GUNZIP_CMD = "gunzip"
+if find_executable("unpigz"):
+    GUNZIP_CMD = "unpigz"
+
+GZIP_MAGIC_NUMBER = b"\x1f\x8b"
+TAR_MAGIC_NUMBER = b"ustar"
+TAR_MAGIC_NUMBER_OFFSET = 257
+TAR_HEADER_SIZE = 512
+
+DURATION_UNITS_IN_SECONDS = {"s": 1, "m": 60, "h": 3600}
+DURATION_RE = re.compile(r'^(\d+(?:\.\d+)?)([a-zA-Z])$')
+
 META_DATA_KEYS = Enum('MetadataKeys', 'objects, md5')
 
 VOLUME_OUTPUT_KEYS = Enum('VolumeOutputKeys', 'volume_path, processing_time, tar_time, output, '
@@ -68,14 +136,23 @@ VOLUME_OUTPUT_KEYS = Enum('VolumeOutputKeys', 'volume_path, processing_time, tar
 
 DECORATOR_KEYS = Enum('DECORATOR_KEYS', 'get_elapsed_time, max_delay, on_timeout, on_timeout_args')
 
+# Maps each host found accessible to the time it was probed.
+_ACCESSIBLE_HOSTS_CACHE = {}
+
+# Maps each host address to its measured round trip time and the measurement time.
+_HOST_RTT_CACHE = {}
+
+# Maps each (host, path) pair checked on a remote server to its existence and the check time.
+_REMOTE_PATH_CACHE = {}
+
 
 def get_home_dir():
     """
-    Get home directory for the current user.
+    Get home directory for the current user, as resolved when the module was loaded.
 
     :return: home directory.
     """
-    return os.path.expanduser("~")
+    return HOME_DIR
 
 
 def create_path(path):
@@ -87,13 +164,10 @@ def create_path(path):
     :return: true if path already exists or was successfully created,
              false otherwise.
     """
-    if os.path.exists(path):
-        return True
-
     try:
         os.makedirs(path)
-    except OSError:
-        return False
+    except OSError as makedirs_error:
+        return makedirs_error.errno == errno.EEXIST
 
     return True
 
@@ -107,12 +181,14 @@ def remove_path(path):
     :return: true if path does not exist or was successfully deleted,
              false otherwise.
     """
-    if not os.path.exists(path):
-        return True
+    try:
+        path_mode = os.lstat(path).st_mode
+    except OSError as lstat_error:
+        return lstat_error.errno == errno.ENOENT
 
     try:
-        if os.path.isdir(path):
-            shutil.rmtree(path)
+        if stat.S_ISDIR(path_mode):
+            remove_tree(path)
         else:
             os.remove(path)
     except OSError:
@@ -121,10 +197,85 @@ def remove_path(path):
     return True
 
 
+def remove_tree(path):
+    """
+    Delete a directory and all its content from local storage.
+
+    Entries are streamed with scandir, whose cached file type saves a stat call per entry,
+    instead of listing each whole directory up front. Symbolic links are removed, not followed.
+
+    An OSError is raised if an entry cannot be removed.
+
+    :param path: directory to be removed.
+    """
+    for entry in scandir(path):
+        if entry.is_dir(follow_symlinks=False):
+            remove_tree(entry.path)
+        else:
+            os.unlink(entry.path)
+
+    os.rmdir(path)
+
+
+def has_min_number_of_entries(path, min_entries):
+    """
+    Check if a directory has at least a given number of entries.
+
+    Stops reading the directory as soon as the minimum is reached.
+
+    :param path: directory to be checked.
+    :param min_entries: minimum number of entries expected.
+
+    :return: true, if the directory has at least min_entries entries,
+             false otherwise.
+    """
+    number_of_entries = 0
+    for _ in scandir(path):
+        number_of_entries += 1
+        if number_of_entries >= min_entries:
+            return True
+
+    return number_of_entries >= min_entries
+
+
+def advise_sequential_read(file_path):
+    """
+    Tell the kernel a file is about to be read sequentially, so it reads ahead aggressively.
+
+    This is a no-op on interpreters without os.posix_fadvise, e.g. Python 2.
+
+    :param file_path: file that is going to be read.
+
+    :return: true, if the advice was given,
+             false otherwise.
+    """
+    if not hasattr(os, 'posix_fadvise'):
+        return False
+
+    try:
+        file_descriptor = os.open(file_path, os.O_RDONLY)
+    except OSError:
+        return False
+
+    try:
+        os.posix_fadvise(file_descriptor, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        os.posix_fadvise(file_descriptor, 0, 0, os.POSIX_FADV_WILLNEED)
+    except OSError:
+        return False
+    finally:
+        os.close(file_descriptor)
+
+    return True
+
+
 def popen_communicate(host, command, timeout=TIMEOUT):
     """
     Use Popen library to communicate to a remote server by using ssh protocol.
 
+    The ssh connection is shared: the call reuses the master connection of the host without a new
+    handshake, when one was started by start_ssh_master_connection, or connects directly otherwise.
+    It never starts a master itself, as a master forked from here would keep the output pipes open.
+
     :param host: remote host to connect.
     :param command: command to execute on remote server.
     :param timeout: timeout to wait for the process to finish.
@@ -135,7 +286,10 @@ def popen_communicate(host, command, timeout=TIMEOUT):
     if host == "" or command == "":
         return "", ""
 
-    ssh = Popen(['ssh', '-o', LOG_LEVEL, host, 'bash'],
+    connect_timeout = "ConnectTimeout={}".format(get_ssh_connect_timeout(host, timeout))
+
+    ssh = Popen(['ssh', '-o', LOG_LEVEL, '-o', connect_timeout, '-o', SSH_CONTROL_MASTER_NO,
+                 '-o', SSH_CONTROL_PATH, host, 'bash'],
                 stdin=PIPE, stdout=PIPE, stderr=PIPE)
 
     timer = Timer(timeout, lambda process: process.kill(), [ssh])
@@ -151,6 +305,141 @@ def popen_communicate(host, command, timeout=TIMEOUT):
     return stdout, stderr
 
 
+def run_remote_batch(host, commands, timeout=TIMEOUT):
+    """
+    Run a list of independent commands on a remote server in a single ssh call.
+
+    The commands are sent as one script, with a separator printed after each of them, so they
+    pay for one connection instead of one per command.
+
+    :param host: remote host to connect.
+    :param commands: list of commands to execute on remote server.
+    :param timeout: timeout to wait for the whole batch to finish.
+
+    :return: pair with the list of stdout of each command, in the same order of the commands,
+             and the stderr of the batch.
+    """
+    if not commands:
+        return [], ""
+
+    batch_command = "".join("{}\necho {}\n".format(command.rstrip('\n'), REMOTE_BATCH_SEPARATOR)
+                            for command in commands)
+
+    stdout, stderr = popen_communicate(host, batch_command, timeout)
+
+    outputs = stdout.split(REMOTE_BATCH_SEPARATOR + '\n')[:len(commands)]
+    outputs.extend([""] * (len(commands) - len(outputs)))
+
+    return outputs, stderr
+
+
+def create_and_list_remote_dir(host, full_path, timeout=TIMEOUT):
+    """
+    Create a remote directory, if it does not exist, and list its content in a single ssh call.
+
+    :param host: remote host address, e.g. user@host_ip
+    :param full_path: full path to be created and listed.
+    :param timeout: timeout to wait for the process to finish.
+
+    :return: pair: true, if the directory is available, false otherwise;
+             list with the names found in the directory, None if it could not be retrieved.
+    """
+    if not host.strip() or not full_path.strip():
+        return False, None
+
+    ssh_create_dir_command = CREATE_REMOTE_DIR_CMD.format(quote(full_path))
+    ssh_list_dir_command = LIST_REMOTE_DIR_CMD.format(quote(full_path))
+
+    (create_stdout, list_stdout), stderr = run_remote_batch(
+        host, [ssh_create_dir_command, ssh_list_dir_command], timeout)
+
+    invalidate_remote_path_cache(host, [full_path])
+
+    if stderr.strip() or create_stdout.strip() != REMOTE_DIR_AVAILABLE:
+        return False, None
+
+    return True, [name.strip() for name in list_stdout.split('\n') if name.strip()]
+
+
+def start_ssh_master_connection(host, timeout=TIMEOUT):
+    """
+    Open a persistent ssh master connection to a remote host.
+
+    The following ssh calls to the same host reuse this connection instead of doing a new
+    TCP connection and key exchange. The master exits by itself after being idle for a while,
+    in case it is not stopped.
+
+    A master left running by a previous call is reused, as a second one could not bind the same
+    control socket and would stay in background as a plain session.
+
+    :param host: remote host address, e.g. user@host_ip
+    :param timeout: timeout to wait for the connection to be established.
+
+    :return: true, if the master connection is running,
+             false otherwise.
+    """
+    if not host.strip():
+        return False
+
+    if is_ssh_master_running(host):
+        return True
+
+    connect_timeout = "ConnectTimeout={}".format(get_ssh_connect_timeout(host, timeout))
+
+    if not os.path.isdir(SSH_CONTROL_DIR):
+        os.makedirs(SSH_CONTROL_DIR, 0o700)
+
+    with open(os.devnull, 'w') as devnull:
+        ssh_master = Popen(['ssh', '-o', LOG_LEVEL, '-o', connect_timeout, '-o',
+                            'ControlMaster=yes', '-o', SSH_CONTROL_PATH, '-o', SSH_CONTROL_PERSIST,
+                            '-N', '-f', host], stdin=devnull, stdout=devnull, stderr=devnull)
+
+        timer = Timer(timeout, lambda process: process.kill(), [ssh_master])
+
+        try:
+            timer.start()
+            ret = ssh_master.wait()
+        finally:
+            timer.cancel()
+
+    return ret == 0
+
+
+def is_ssh_master_running(host):
+    """
+    Check if there is a ssh master connection running for a remote host.
+
+    :param host: remote host address, e.g. user@host_ip
+
+    :return: true, if the master connection is running,
+             false otherwise.
+    """
+    with open(os.devnull, 'w') as devnull:
+        ret = Popen(['ssh', '-o', LOG_LEVEL, '-o', SSH_CONTROL_PATH, '-O', 'check', host],
+                    stdin=devnull, stdout=devnull, stderr=devnull).wait()
+
+    return ret == 0
+
+
+def stop_ssh_master_connection(host):
+    """
+    Stop the ssh master connection to a remote host, if there is one running.
+
+    :param host: remote host address, e.g. user@host_ip
+
+    :return: true, if the master connection was stopped,
+             false otherwise.
+    """
+    if not host.strip():
+        return False
+
+    with open(os.devnull, 'w') as devnull:
+        ret = Popen(['ssh', '-o', LOG_LEVEL, '-o', SSH_CONTROL_PATH, '-O', 'exit', host],
+                    stdin=devnull, stdout=devnull, stderr=devnull).wait()
+
+    return ret == 0
+
+
 def check_remote_path_exists(host, path, timeout=TIMEOUT):
     """
     Check if a remote path exists.
@@ -158,6 +447,9 @@ def check_remote_path_exists(host, path, timeout=TIMEOUT):
     First check what kind of path is being looked for, whether it is a directory or a file,
     in order to run the proper command.
 
+    The result is reused for REMOTE_PATH_CACHE_TTL seconds, unless the path is created or removed
+    in the meantime through this module.
+
     :param host: remote host address, e.g. user@host_ip
     :param path: remote path to be verified.
     :param timeout: timeout to wait for the process to finish.
@@ -168,22 +460,73 @@ def check_remote_path_exists(host, path, timeout=TIMEOUT):
     if not host.strip() or not path.strip():
         return False
 
-    ssh_check_dir_command = """
-    if [ -d {} ] || [ -f {} ]; then echo "DIR_IS_AVAILABLE"; fi\n
-    """.format(path, path)
+    cached_entry = _REMOTE_PATH_CACHE.get((host, path))
+    if cached_entry is not None and monotonic() - cached_entry[1] < REMOTE_PATH_CACHE_TTL:
+        return cached_entry[0]
 
-    stdout, _ = popen_communicate(host, ssh_check_dir_command, timeout)
+    ssh_check_dir_command = CHECK_REMOTE_PATH_CMD.format(quote(path))
 
-    if stdout.strip() != "DIR_IS_AVAILABLE":
-        return False
+    stdout, stderr = popen_communicate(host, ssh_check_dir_command, timeout)
+
+    path_exists = stdout.strip() == REMOTE_DIR_AVAILABLE
+
+    if not stderr.strip():
+        _REMOTE_PATH_CACHE[(host, path)] = path_exists, monotonic()
+
+    return path_exists
 
-    return True
+
+def invalidate_remote_path_cache(host, path_list):
+    """
+    Drop the cached existence checks of a list of remote paths, their parents and their content.
+
+    :param host: remote host address, e.g. user@host_ip
+    :param path_list: list of remote paths that were changed.
+    """
+    for host_path in list(_REMOTE_PATH_CACHE):
+        if host_path[0] != host:
+            continue
+
+        cached_path = host_path[1].rstrip('/')
+        for path in path_list:
+            path = path.strip().rstrip('/')
+            if cached_path == path or cached_path.startswith(path + '/') \
+                    or path.startswith(cached_path + '/'):
+                _REMOTE_PATH_CACHE.pop(host_path, None)
+                break
+
+
+def list_remote_dir(host, path, timeout=TIMEOUT):
+    """
+    List the content of a remote directory in a single ssh call.
+
+    :param host: remote host address, e.g. user@host_ip
+    :param path: remote directory to be listed.
+    :param timeout: timeout to wait for the process to finish.
+
+    :return: list with the names found in the directory, empty if it does not exist,
+             None if the listing could not be retrieved.
+    """
+    if not host.strip() or not path.strip():
+        return None
+
+    ssh_list_dir_command = LIST_REMOTE_DIR_CMD.format(quote(path))
+
+    stdout, stderr = popen_communicate(host, ssh_list_dir_command, timeout)
+
+    if stderr.strip():
+        return None
+
+    return [name.strip() for name in stdout.split('\n') if name.strip()]
 
 
 def create_remote_dir(host, full_path, timeout=TIMEOUT):
     """
     Try to create a remote directory with ssh commands.
 
+    Missing parent directories are created as well. It succeeds if the directory already exists,
+    so there is no need to check it beforehand.
+
     :param host:      remote host address, e.g. user@host_ip
     :param full_path: full path to be created.
     :param timeout: timeout to wait for the process to finish.
@@ -191,23 +534,16 @@ def create_remote_dir(host, full_path, timeout=TIMEOUT):
     :return: true, if directory was successfully created
              false, otherwise.
     """
-    ssh_create_dir_commands = """
-    if [ -d {} ]; then\n
-        echo "DIR_IS_AVAILABLE\n"
-    else\n
-        mkdir {}\n
-        if [ -d {} ]; then\n
-            echo "DIR_IS_AVAILABLE";\n
-        fi\n
-    fi\n
-    """.format(full_path, full_path, full_path)
+    ssh_create_dir_commands = CREATE_REMOTE_DIR_CMD.format(quote(full_path))
 
     stdout, stderr = popen_communicate(host, ssh_create_dir_commands, timeout)
 
+    invalidate_remote_path_cache(host, [full_path])
+
     if stderr.strip():
         return False
 
-    if stdout.strip() != "DIR_IS_AVAILABLE":
+    if stdout.strip() != REMOTE_DIR_AVAILABLE:
         return False
 
     return True
@@ -239,14 +575,13 @@ def remove_remote_dir(host, dir_list=None, timeout=TIMEOUT):
     if not dir_list:
         raise Exception("Empty list was provided.")
 
-    remove_dir_cmd = ""
-
-    for folder_path in dir_list:
-        folder_path = folder_path.strip()
-        remove_dir_cmd += "rm -rf {}\n".format(folder_path)
+    remove_dir_cmd = REMOVE_REMOTE_PATH_CMD.format(
+        " ".join(quote(folder_path.strip()) for folder_path in dir_list))
 
     _, stderr = popen_communicate(host, remove_dir_cmd, timeout)
 
+    invalidate_remote_path_cache(host, dir_list)
+
     if stderr.strip():
         raise Exception("Unable to perform the remove command on offsite due to: {}".format(stderr))
 
@@ -257,6 +592,9 @@ def validate_removed_dir_list(host, remove_dir_list=None):
     """
     Check the list of removed dirs, to validate if they were successfully deleted from offsite.
 
+    All the directories are checked in a single ssh call. If the check fails, none of them is
+    considered removed.
+
     :param host: remote host to do the validation.
     :param remove_dir_list: list of directories supposed to be removed.
 
@@ -265,10 +603,24 @@ def validate_removed_dir_list(host, remove_dir_list=None):
     if remove_dir_list is None:
         remove_dir_list = []
 
+    if not remove_dir_list:
+        return [], []
+
+    ssh_check_removed_command = ""
+    for removed_path in remove_dir_list:
+        ssh_check_removed_command += CHECK_REMOVED_PATH_CMD.format(quote(removed_path))
+
+    stdout, _ = popen_communicate(host, ssh_check_removed_command)
+
+    path_status_list = stdout.split()
+
+    if len(path_status_list) != len(remove_dir_list):
+        return list(remove_dir_list), []
+
     not_removed_list = []
     validated_removed_list = []
-    for removed_path in remove_dir_list:
-        if not check_remote_path_exists(host, removed_path):
+    for removed_path, path_status in zip(remove_dir_list, path_status_list):
+        if path_status == REMOTE_PATH_MISSING:
             validated_removed_list.append(removed_path)
         else:
             not_removed_list.append(removed_path)
@@ -297,14 +649,84 @@ def is_host_accessible(ip):
     """
     Validate host is accessible.
 
+    The host is probed by opening a TCP connection to its ssh port, which is the service used
+    afterwards. A host found accessible is not probed again for HOST_ACCESSIBLE_CACHE_TTL seconds.
+
     :param ip: remote host IP.
 
     :return: true, if host is accessible,
              false, otherwise.
     """
-    with open(os.devnull, "w") as devnull:
-        ret_code = Popen(["ping", "-c", "1", ip], stdout=devnull, stderr=devnull).wait()
-        return ret_code == 0
+    cached_time = _ACCESSIBLE_HOSTS_CACHE.get(ip)
+    if cached_time is not None and monotonic() - cached_time < HOST_ACCESSIBLE_CACHE_TTL:
+        return True
+
+    if measure_host_rtt(ip) is None:
+        return False
+
+    _ACCESSIBLE_HOSTS_CACHE[ip] = monotonic()
+
+    return True
+
+
+def measure_host_rtt(ip):
+    """
+    Measure the round trip time to a host by timing a TCP connection to its ssh port.
+
+    The result is kept to compute the ssh connection timeout of the host, including a failed
+    probe, so an unreachable port is not probed again on every call.
+
+    :param ip: remote host IP or name.
+
+    :return: round trip time in seconds, if the host accepted the connection,
+             None otherwise.
+    """
+    rtt = None
+
+    probe = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    probe.settimeout(HOST_PROBE_TIMEOUT)
+    try:
+        start_time = monotonic()
+        probe.connect((ip, SSH_PORT))
+        rtt = monotonic() - start_time
+    except socket.error:
+        pass
+    finally:
+        probe.close()
+
+    _HOST_RTT_CACHE[ip] = rtt, monotonic()
+
+    return rtt
+
+
+def get_ssh_connect_timeout(host, timeout=TIMEOUT):
+    """
+    Get the ssh connection timeout of a host, scaled from its round trip time.
+
+    The round trip time is measured again once it is older than HOST_RTT_CACHE_TTL seconds.
+
+    When the ssh port cannot be probed, e.g. the host is reached through a different port, a
+    proxy or a Host alias of the ssh configuration, the timeout itself is used.
+
+    :param host: remote host address, e.g. user@host_ip
+    :param timeout: upper bound of the connection timeout.
+
+    :return: connection timeout in seconds, between SSH_MIN_CONNECT_TIMEOUT and timeout,
+             timeout, if the round trip time could not be measured.
+    """
+    address = host.split('@')[-1]
+
+    cached_entry = _HOST_RTT_CACHE.get(address)
+    if cached_entry is not None and monotonic() - cached_entry[1] < HOST_RTT_CACHE_TTL:
+        rtt = cached_entry[0]
+    else:
+        rtt = measure_host_rtt(address)
+
+    if rtt is None:
+        return timeout
+
+    return int(max(SSH_MIN_CONNECT_TIMEOUT,
+                   min(timeout, math.ceil(rtt * SSH_CONNECT_TIMEOUT_RTT_FACTOR))))
 
 
 def truncate_microseconds_from_timestamp(time_stamp_value):
@@ -359,10 +781,7 @@ def get_elem_dict(dic, key):
     if not isinstance(dic, dict):
         return None
 
-    if key in dic.keys():
-        return dic[key]
-
-    return None
+    return dic.get(key)
 
 
 def get_values_from_dict(dic, key=""):
@@ -392,6 +811,9 @@ def timer_delay(method):
     """
     Execute a function after the specified timeout. Decorator function.
 
+    The timeout is watched by a daemon timer thread, so a pending timeout never keeps the process
+    alive once the decorated method and the main thread are done.
+
     :param method: decorated method.
     """
     def wrapper(*args, **kw):
@@ -412,14 +834,16 @@ def timer_delay(method):
         if on_timeout_function is None or max_delay is None:
             return method(*args, **kw)
 
+        timer = None
         try:
             timer = Timer(float(max_delay), on_timeout_function, on_timeout_function_args)
+            timer.daemon = True
             timer.start()
 
             return method(*args, **kw)
 
         finally:
-            if timer.is_alive():
+            if timer is not None and timer.is_alive():
                 timer.cancel()
 
     wrapper.__wrapped__ = method
@@ -435,9 +859,9 @@ def timeit(method):
     """
     def timed(*args, **kw):
         """Calculate the elapsed time to execute a function. Decorator function."""
-        ts = time.time()
+        ts = monotonic()
         result = method(*args, **kw)
-        te = time.time()
+        te = monotonic()
 
         if 'get_elapsed_time' in kw:
             if isinstance(kw['get_elapsed_time'], list):
@@ -487,7 +911,7 @@ def compress_file(source_path, output_path=None, mode="w:gz", **kwargs):
 
     except Exception as comp_exp:
         raise Exception("Error while compressing file '{}' to destination '{}' due to {}."
-                        .format(source_path, output_path, comp_exp.message))
+                        .format(source_path, output_path, str(comp_exp)))
 
     return compressed_file_path
 
@@ -531,7 +955,7 @@ def decompress_file(source_path, output_path, remove_compressed=False, **kwargs)
 
     except Exception as dec_exp:
         raise Exception("Error while decompressing file '{}' due to {}.".format(source_path,
-                                                                                dec_exp.message))
+                                                                                str(dec_exp)))
     return decompressed_file_path
 
 
@@ -539,25 +963,64 @@ def gzip_file(file_path, file_destination):
     """
     Compress file using gzip strategy.
 
+    A folder is archived and compressed in a single pass, by streaming tar into gzip, and the
+    output is named with the .tar.gz suffix.
+
     :param file_path: file to be compressed.
     :param file_destination: destination folder.
 
     :return: full compressed file path.
     """
     try:
+        if os.path.isdir(file_path):
+            return gzip_tar_stream(file_path, file_destination)
+
         compressed_file_name = "{}.{}".format(os.path.basename(file_path), GZ_SUFFIX)
 
         compressed_file_path = os.path.join(file_destination, compressed_file_name)
 
-        compress_command = "gzip -r -c {} > {}".format(file_path, compressed_file_path)
-
-        ret = Popen(compress_command, shell=True).wait()
+        with open(compressed_file_path, 'wb') as compressed_file:
+            ret = Popen(GZIP_CMD.split() + ["-c", file_path], stdout=compressed_file).wait()
 
-        if int(ret) != 0:
+        if ret != 0:
             raise Exception("Gzip command returned error code: {}.".format(ret))
 
     except Exception as gzip_exp:
-        raise Exception("gzip_file failed due to: {}.".format(gzip_exp.message))
+        raise Exception("gzip_file failed due to: {}.".format(str(gzip_exp)))
+
+    return compressed_file_path
+
+
+def gzip_tar_stream(source_path, file_destination):
+    """
+    Archive and compress a path by piping tar into gzip, with no intermediate tar file.
+
+    It raises an exception if an error occurs.
+
+    :param source_path: file/folder path to be archived and compressed.
+    :param file_destination: destination folder.
+
+    :return: full compressed file path.
+    """
+    compressed_file_name = "{}.{}.{}".format(os.path.basename(source_path.rstrip(os.sep)),
+                                             TAR_SUFFIX, GZ_SUFFIX)
+
+    compressed_file_path = os.path.join(file_destination, compressed_file_name)
+
+    with open(compressed_file_path, 'wb') as compressed_file:
+        tar_process = Popen(get_tar_stream_command(source_path.rstrip(os.sep)), stdout=PIPE)
+        gzip_process = Popen(GZIP_CMD.split() + ["-c"], stdin=tar_process.stdout,
+                             stdout=compressed_file)
+        tar_process.stdout.close()
+
+        gzip_ret = gzip_process.wait()
+        tar_ret = tar_process.wait()
+
+    if tar_ret != 0:
+        raise Exception("Tar command returned error code: {}.".format(tar_ret))
+
+    if gzip_ret != 0:
+        raise Exception("Gzip command returned error code: {}.".format(gzip_ret))
 
     return compressed_file_path
 
@@ -578,20 +1041,32 @@ def tar_file(file_path, file_destination):
 
         tar_file_path = os.path.join(file_destination, archived_file_name)
 
-        compress_command = "{} -cf {} -C {} {}".format(TAR_CMD, tar_file_path, os.path.dirname(
-            file_path), os.path.basename(file_path))
+        compress_command = [TAR_CMD, "-cf", tar_file_path, "-C", os.path.dirname(file_path),
+                            os.path.basename(file_path)]
 
-        ret = Popen(compress_command, shell=True).wait()
+        ret = Popen(compress_command).wait()
 
-        if int(ret) != 0:
+        if ret != 0:
             raise Exception("Tar command returned error code: {}.".format(ret))
 
     except Exception as tar_exp:
-        raise Exception("tar_file failed due to: {}.".format(tar_exp.message))
+        raise Exception("tar_file failed due to: {}.".format(str(tar_exp)))
 
     return tar_file_path
 
 
+def get_tar_stream_command(source_path):
+    """
+    Build the command to archive a path into the standard output using tar strategy.
+
+    :param source_path: file/folder path to be archived.
+
+    :return: command list to be used with Popen.
+    """
+    return [TAR_CMD, "-cf", "-", "-C", os.path.dirname(source_path),
+            os.path.basename(source_path)]
+
+
 def gunzip_file(file_path, file_destination):
     """
     Decompress file using gzip strategy.
@@ -610,16 +1085,14 @@ def gunzip_file(file_path, file_destination):
         decompressed_file_name = os.path.basename(file_path).replace(".{}".format(
             GZ_SUFFIX), "")
 
-        decompress_command = "gunzip -c {} > {}".format(file_path, os.path.join(
-            file_destination, decompressed_file_name))
+        with open(os.path.join(file_destination, decompressed_file_name), 'wb') as output_file:
+            ret = Popen(GUNZIP_CMD.split() + ["-c", file_path], stdout=output_file).wait()
 
-        ret = Popen(decompress_command, shell=True).wait()
-
-        if int(ret) != 0:
+        if ret != 0:
             raise Exception("Gunzip command returned error code: {}.".format(ret))
 
     except Exception as gunzip_exp:
-        raise Exception("gunzip_file failed due to: {}.".format(gunzip_exp.message))
+        raise Exception("gunzip_file failed due to: {}.".format(str(gunzip_exp)))
 
     return os.path.join(file_destination, decompressed_file_name)
 
@@ -639,15 +1112,15 @@ def untar_file(file_path, file_destination):
         if TAR_SUFFIX not in file_path:
             raise Exception("Invalid file path '{}'.".format(file_path))
 
-        decompress_command = "{} -C {} -xf {}".format(TAR_CMD, file_destination, file_path)
+        decompress_command = [TAR_CMD, "-C", file_destination, "-xf", file_path]
 
-        ret = Popen(decompress_command, shell=True).wait()
+        ret = Popen(decompress_command).wait()
 
-        if int(ret) != 0:
+        if ret != 0:
             raise Exception("Tar command returned error code: {}.".format(ret))
 
     except Exception as untar_exp:
-        raise Exception("untar_file failed due to: {}.".format(untar_exp.message))
+        raise Exception("untar_file failed due to: {}.".format(str(untar_exp)))
 
     decompressed_file_name = os.path.basename(file_path).replace(".{}".format(
         TAR_SUFFIX), "")
@@ -659,6 +1132,8 @@ def is_gzip_file(file_path):
     """
     Check whether the informed file path is in gzip format.
 
+    Only the magic number at the start of the file is read, not the whole file.
+
     :param file_path: file path.
 
     :return: whether the path refers to a gzip file or not.
@@ -666,19 +1141,17 @@ def is_gzip_file(file_path):
     if not file_path.strip():
         raise Exception("File path is empty.")
 
-    with gzip.open(file_path) as compressed_file:
-        try:
-            compressed_file.read()
-        except IOError:
-            return False
-
-    return True
+    with open(file_path, "rb") as compressed_file:
+        return compressed_file.read(len(GZIP_MAGIC_NUMBER)) == GZIP_MAGIC_NUMBER
 
 
 def is_tar_file(file_path):
     """
     Check whether the informed file path is in tar format.
 
+    Only the first 512 bytes header block is read, not the whole file. A file shorter than a
+    header block cannot be a tar file.
+
     :param file_path: file path.
 
     :return: whether the path refers to a tar file or not.
@@ -686,13 +1159,15 @@ def is_tar_file(file_path):
     if not file_path.strip():
         raise Exception("File path is empty.")
 
-    with open(file_path, "r") as compressed_file:
-        try:
-            TarFile(fileobj=compressed_file)
-        except TarError:
-            return False
+    with open(file_path, "rb") as compressed_file:
+        header = compressed_file.read(TAR_HEADER_SIZE)
 
-    return True
+    if len(header) < TAR_HEADER_SIZE:
+        return False
+
+    magic_number_end = TAR_MAGIC_NUMBER_OFFSET + len(TAR_MAGIC_NUMBER)
+
+    return header[TAR_MAGIC_NUMBER_OFFSET:magic_number_end] == TAR_MAGIC_NUMBER
 
 
 def get_existing_root_path(destination_path):
@@ -735,32 +1210,26 @@ def get_filtered_cli_arguments():
 
     :return a filtered list of CLI arguments, or an empty list if there was no CLI arguments passed.
     """
-    filtered_cli_args = []
-
-    if sys.argv:
-        filtered_cli_args = list(sys.argv)
-
-        for cli_argument in filtered_cli_args:
-
-            if cli_argument.endswith(".py") or "/bin/ntwk_bkp" in cli_argument:
-                filtered_cli_args.remove(cli_argument)
-
-    return filtered_cli_args
+    return [cli_argument for cli_argument in sys.argv
+            if not cli_argument.endswith(".py") and "/bin/ntwk_bkp" not in cli_argument]
 
 
 def to_seconds(duration):
     """
     Convert time string to second, where string is of form 3h, 5m, 20s etc.
 
+    The value may be fractional, e.g. 1.5h, and the result is truncated to whole seconds.
+
     :param duration: str with numeric value suffixed with h, s, or m.
     :return: seconds represented by the duration as int type.
     :raise UtilsException: if the string cannot be parsed.
     """
-    try:
-        units = {"s": 1, "m": 60, "h": 3600}
-        return int(float(duration[:-1]) * units[duration[-1]])
+    duration_match = DURATION_RE.match(duration.strip())
+    if duration_match is None:
+        raise UtilsException(ExceptionCodes.InvalidTimeFormat, duration)
 
-    except KeyError:
+    value, unit = duration_match.groups()
+    if unit not in DURATION_UNITS_IN_SECONDS:
         raise UtilsException(ExceptionCodes.InvalidTimeUnit, duration)
-    except (ValueError, NameError):
-        raise UtilsException(ExceptionCodes.InvalidTimeFormat, duration)
+
+    return int(float(value) * DURATION_UNITS_IN_SECONDS[unit])
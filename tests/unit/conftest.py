@@ -0,0 +1,23 @@
+##############################################################################
+# COPYRIGHT Ericsson AB 2018
+#
+# The copyright to the computer program(s) herein is the property of
+# Ericsson AB. The programs may be used and/or copied only with written
+# permission from Ericsson AB. or in accordance with the terms and
+# conditions stipulated in the agreement/contract under which the
+# program(s) have been supplied.
+##############################################################################
+
+"""Shared pytest fixtures for the unit tests."""
+
+import logging
+
+import pytest
+
+
+@pytest.fixture(scope="session", autouse=True)
+def disable_logging():
+    """Disable every log call while the unit tests run, restoring it at the end."""
+    logging.disable(logging.CRITICAL)
+    yield
+    logging.disable(logging.NOTSET)
@@ -14,275 +14,200 @@
 
 """Module for testing backup/gnupg_manager.py script."""
 
-import logging
-import os
-import unittest
+from collections import namedtuple
 
 from network_backup_offsite.gnupg_manager import GnupgManager
-from network_backup_offsite.utils import get_home_dir
 
 import mock
+import pytest
 
-logging.disable(logging.CRITICAL)
+MOCK_MODULE = 'network_backup_offsite.gnupg_manager'
+MOCK_PACKAGE = MOCK_MODULE + '.'
 
-MOCK_PACKAGE = 'network_backup_offsite.gnupg_manager.'
-GPG_KEY_PATH = os.path.join(get_home_dir(), ".gnupg")
-
-MOCK_SOURCE_DIR = 'mock_path'
 MOCK_EMAIL = 'mock_user_email'
 MOCK_USER_NAME = 'mock_user_name'
 MOCK_FILE_PATH = 'mock_file_path'
 MOCK_OUTPUT_PATH = 'mock_output_path'
-MOCK_DECRYPTED_FILE = 'mock_encrypted_file'
-MOCK_ENCRYPTED_FILE = 'mock_encrypted_file.gpg'
-MOCK_COMPRESSED_FILE = 'mock_encrypted_file.gz'
-MOCK_COMPRESSED_ENCRYPTED_FILE = 'mock_encrypted_file.gz.gpg'
+
+EMPTY_ENCRYPT_PATH_ERROR = "An empty file path or output file path was provided."
+EMPTY_DECRYPT_PATH_ERROR = "An empty file path was provided."
+
+GpgIo = namedtuple('GpgIo', ['os', 'popen', 'open'])
+
+FAKE_FILE_HANDLE = mock.MagicMock(spec=file)
 
 
-def get_gnupg_manager():
+@pytest.fixture(scope="module")
+def shared_gnupg_manager():
     """
-    Get an instance of gnupg_manager to perform tests.
+    Build the GnupgManager instance shared by the tests of this module.
 
     :return: gnupg_manager instance.
     """
-    with mock.patch(MOCK_PACKAGE + 'CustomLogger') as mock_logger:
-        with mock.patch(MOCK_PACKAGE + 'GPG') as mock_gpg_handler:
-            with mock.patch(MOCK_PACKAGE + 'Popen') as mock_popen:
-                mock_popen.return_value.wait.return_value = 0
-                gnupg_manager = GnupgManager(MOCK_USER_NAME, MOCK_EMAIL, mock_logger)
-                gnupg_manager.gpg_handler = mock_gpg_handler
+    with mock.patch.multiple(MOCK_MODULE, CustomLogger=mock.DEFAULT, GPG=mock.DEFAULT,
+                             Popen=mock.DEFAULT) as mocks:
+        mocks['Popen'].return_value.wait.return_value = 0
+        gnupg_manager = GnupgManager(MOCK_USER_NAME, MOCK_EMAIL, mocks['CustomLogger'])
 
     return gnupg_manager
 
 
-class GnupgManagerValidateEncryptionKeyTestCase(unittest.TestCase):
-    """Class for testing validate_encryption_key() method from GnupgManager class."""
-
-    def setUp(self):
-        """Setting up the test variables."""
-        self.gnupg_manager = get_gnupg_manager()
-
-    @mock.patch(MOCK_PACKAGE + 'Popen')
-    def test_validate_encryption_key_already_exists(self, mock_popen):
-        """Test to check when the key already exists."""
-        mock_popen.return_value.wait.return_value = 0
-
-        calls = [mock.call("Validating GPG encryption settings."),
-                 mock.call("Backup key already exists.")]
-
-        validation_result = self.gnupg_manager.validate_encryption_key()
-
-        self.assertTrue(validation_result, "Should have returned true.")
-
-        self.gnupg_manager.logger.info.assert_has_calls(calls)
+@pytest.fixture
+def gnupg_manager(shared_gnupg_manager):
+    """
+    Provide the shared GnupgManager instance with clean logger and gpg handler mocks.
 
-    @mock.patch(MOCK_PACKAGE + 'Popen')
-    def test_validate_encryption_key_creation_key_failure_exception(self, mock_popen):
-        """Test to check the log values if the key generation has started."""
-        mock_popen.return_value.wait.return_value = 1
-        self.gnupg_manager.gpg_handler = None
+    Tests change both mocks, e.g. by setting gpg_handler to None, so they are reset every time.
 
-        with self.assertRaises(Exception) as cex:
-            self.gnupg_manager.validate_encryption_key()
+    :param shared_gnupg_manager: module scoped gnupg_manager instance.
 
-        self.assertEqual(cex.exception.message, "GPG program not installed properly in this "
-                                                "system.")
+    :return: gnupg_manager instance.
+    """
+    shared_gnupg_manager.gpg_handler = mock.MagicMock()
+    shared_gnupg_manager.logger.reset_mock()
 
-    @mock.patch(MOCK_PACKAGE + 'Popen')
-    def test_validate_encryption_key_generate_key(self, mock_popen):
-        """Test to check if generation of key is being triggered."""
-        mock_popen.return_value.wait.return_value = 1
+    return shared_gnupg_manager
 
-        logger_calls = [mock.call("Backup key does not exist yet. Creating a new one.")]
 
-        gen_key_call = [mock.call.gen_key_input(key_length=1024, key_type='RSA',
-                                                name_email=MOCK_EMAIL,
-                                                name_real=MOCK_USER_NAME)]
+@pytest.mark.parametrize("ret_code, has_handler, log_message, error_message", [
+    (0, True, "Backup key already exists.", None),
+    (1, False, None, "GPG program not installed properly in this system."),
+    (1, True, "Backup key does not exist yet. Creating a new one.", None),
+])
+@mock.patch(MOCK_PACKAGE + 'Popen')
+def test_validate_encryption_key(mock_popen, gnupg_manager, ret_code, has_handler, log_message,
+                                 error_message):
+    """Test the key validation according to the key lookup result and the gpg handler state."""
+    mock_popen.return_value.wait.return_value = ret_code
+    if not has_handler:
+        gnupg_manager.gpg_handler = None
 
-        validation_result = self.gnupg_manager.validate_encryption_key()
+    if error_message is not None:
+        with pytest.raises(Exception) as cex:
+            gnupg_manager.validate_encryption_key()
 
-        self.assertTrue(validation_result, "Should have returned true.")
+        assert str(cex.value) == error_message
+        return
 
-        self.gnupg_manager.logger.info.assert_has_calls(logger_calls)
+    assert gnupg_manager.validate_encryption_key(), "Should have returned true."
 
-        self.gnupg_manager.gpg_handler.assert_has_calls(gen_key_call)
+    gnupg_manager.logger.info.assert_any_call(log_message)
 
+    if ret_code != 0:
+        gnupg_manager.gpg_handler.gen_key_input.assert_called_once_with(
+            key_length=1024, key_type='RSA', name_email=MOCK_EMAIL, name_real=MOCK_USER_NAME)
 
-class GnupgManagerEncryptFileTestCase(unittest.TestCase):
-    """Class for testing encrypt_file() method from GnupgManager class."""
 
-    def setUp(self):
-        """Setting up the test variables."""
-        self.gnupg_manager = get_gnupg_manager()
+@pytest.mark.parametrize("method_name, args, error_message", [
+    ('encrypt_file', ('', MOCK_OUTPUT_PATH), EMPTY_ENCRYPT_PATH_ERROR),
+    ('encrypt_file', (MOCK_FILE_PATH, ''), EMPTY_ENCRYPT_PATH_ERROR),
+    ('decrypt_file', ('',), EMPTY_DECRYPT_PATH_ERROR),
+])
+def test_empty_path(gnupg_manager, method_name, args, error_message):
+    """Test to check the raise of exception if one of the informed paths is empty."""
+    with pytest.raises(Exception) as cex:
+        getattr(gnupg_manager, method_name)(*args)
 
-    def test_encrypt_file_empty_file_path(self):
-        """Test to check the raise of exception if file_path is empty."""
-        with self.assertRaises(Exception) as cex:
-            self.gnupg_manager.encrypt_file('', MOCK_OUTPUT_PATH)
+    assert str(cex.value) == error_message
 
-        self.assertEqual(cex.exception.message, "An empty file path or output file path was "
-                                                "provided.")
 
-    def test_encrypt_file_empty_output_path(self):
-        """Test to check the raise of exception if output_path is empty."""
-        with self.assertRaises(Exception) as cex:
-            self.gnupg_manager.encrypt_file(MOCK_FILE_PATH, '')
+@pytest.fixture
+def gpg_io():
+    """
+    Patch the os, Popen and open references used by the encryption and decryption methods.
 
-        self.assertEqual(cex.exception.message, "An empty file path or output file path was "
-                                                "provided.")
+    :return: GpgIo tuple with the os, popen and open mocks.
+    """
+    with mock.patch.multiple(MOCK_MODULE, os=mock.DEFAULT, Popen=mock.DEFAULT,
+                             open=mock.DEFAULT) as mocks:
+        FAKE_FILE_HANDLE.reset_mock()
+        mocks['open'].return_value = FAKE_FILE_HANDLE
+        yield GpgIo(os=mocks['os'], popen=mocks['Popen'], open=mocks['open'])
 
-    @mock.patch(MOCK_PACKAGE + 'os')
-    def test_encrypt_file_input_file_does_not_exists(self, mock_os):
-        """Test to check the raise of exception if file_path does not exist."""
-        mock_os.path.exists.return_value = False
 
-        with self.assertRaises(Exception) as cex:
-            self.gnupg_manager.encrypt_file(MOCK_FILE_PATH, MOCK_OUTPUT_PATH)
+def test_encrypt_file_input_file_does_not_exists(gnupg_manager, gpg_io):
+    """Test to check the raise of exception if file_path does not exist."""
+    gpg_io.os.path.exists.return_value = False
 
-        self.assertEqual(cex.exception.message, "Informed file does not exist '{}'.".format(
-            MOCK_FILE_PATH))
+    with pytest.raises(Exception) as cex:
+        gnupg_manager.encrypt_file(MOCK_FILE_PATH, MOCK_OUTPUT_PATH)
 
-    @mock.patch(MOCK_PACKAGE + 'Popen')
-    @mock.patch(MOCK_PACKAGE + 'open')
-    @mock.patch(MOCK_PACKAGE + 'os')
-    def test_encrypt_file_encryption_failure(self, mock_os, mock_open, mock_popen):
-        """Test to check the raise of exception if encryption could not be completed."""
-        mock_os.path.exists.return_value = True
-        mock_os.path.join.return_value = ''
-        mock_os.path.basename.return_value = ''
-        mock_open.return_value = mock.MagicMock(spec=file)
-        mock_popen.return_value.wait.return_value = 1
+    assert str(cex.value) == "Informed file does not exist 'mock_file_path'."
 
-        calls = [mock.call("Encrypting file '{}'".format(MOCK_FILE_PATH))]
 
-        with self.assertRaises(Exception) as cex:
-            self.gnupg_manager.encrypt_file(MOCK_FILE_PATH, MOCK_OUTPUT_PATH)
+@pytest.mark.parametrize("ret_code, error_message", [
+    (1, "Encryption of file /path/to/mock_input could not be completed."),
+    (0, None),
+])
+def test_encrypt_file_result(gnupg_manager, gpg_io, ret_code, error_message):
+    """Test the return value or the raised exception according to the gpg return code."""
+    mock_file_input = '/path/to/mock_input'
+    mock_output_path = '/path/to/output'
+    mock_result_path = '/path/to/output/mock_input'
 
-        self.assertEqual(cex.exception.message, "Encryption of file {} could not be completed.".
-                         format(MOCK_FILE_PATH))
+    gpg_io.os.path.exists.return_value = True
+    gpg_io.os.path.join.return_value = mock_result_path
+    gpg_io.popen.return_value.wait.return_value = ret_code
 
-        self.gnupg_manager.logger.info.assert_has_calls(calls)
+    if error_message is None:
+        encrypt_result = gnupg_manager.encrypt_file(mock_file_input, mock_output_path)
 
-    @mock.patch(MOCK_PACKAGE + 'Popen')
-    @mock.patch(MOCK_PACKAGE + 'open')
-    @mock.patch(MOCK_PACKAGE + 'os')
-    def test_encrypt_file_return_value(self, mock_os, mock_open, mock_popen):
-        """Test to check the return value if encryption was successful."""
-        mock_file_input = '/path/to/mock_input'
-        mock_output_path = '/path/to/output'
-        mock_result_path = '/path/to/output/mock_input'
+        assert encrypt_result == '/path/to/output/mock_input.gpg'
+    else:
+        with pytest.raises(Exception) as cex:
+            gnupg_manager.encrypt_file(mock_file_input, mock_output_path)
 
-        mock_os.path.exists.return_value = True
-        mock_os.path.join.return_value = mock_result_path
+        assert str(cex.value) == error_message
 
-        mock_open.return_value = mock.MagicMock(spec=file)
-        mock_popen.return_value.wait.return_value = 0
+    gnupg_manager.logger.info.assert_any_call("Encrypting file '/path/to/mock_input'")
 
-        calls = [mock.call("Encrypting file '{}'".format(mock_file_input))]
 
-        encrypt_result = self.gnupg_manager.encrypt_file(mock_file_input, mock_output_path)
+@pytest.mark.parametrize("input_file, exists, is_dir, error_message", [
+    ('file.dat', True, False, "Not a valid GPG encrypted file 'file.dat'."),
+    ('file.gpg', False, False, "Informed file does not exist 'file.gpg'."),
+    ('file.gpg', True, True, "Informed path is a directory 'file.gpg'."),
+])
+def test_decrypt_file_invalid_input_path(gnupg_manager, gpg_io, input_file, exists, is_dir,
+                                         error_message):
+    """Test when the provided path is not an existing .gpg file."""
+    gpg_io.os.path.exists.return_value = exists
+    gpg_io.os.path.isdir.return_value = is_dir
 
-        self.assertEqual(encrypt_result, '/path/to/output/mock_input.gpg')
+    with pytest.raises(Exception) as cex:
+        gnupg_manager.decrypt_file(input_file)
 
-        self.gnupg_manager.logger.info.assert_has_calls(calls)
+    assert str(cex.value) == error_message
 
 
-class GnupgManagerDecryptFileTestCase(unittest.TestCase):
-    """Class for testing decrypt_file() method from GnupgManager class."""
+def test_decrypt_file_decryption_failure_exception(gnupg_manager, gpg_io):
+    """Test when an error happens when trying to decrypt the file."""
+    mock_input_file = 'file.gpg'
+    gpg_io.os.path.exists.return_value = True
+    gpg_io.os.path.isdir.return_value = False
+    gpg_io.popen.return_value.wait.return_value = 1
 
-    def setUp(self):
-        """Setting up the test variables."""
-        self.gnupg_manager = get_gnupg_manager()
+    with pytest.raises(Exception) as cex:
+        gnupg_manager.decrypt_file(mock_input_file)
 
-    def test_decrypt_file_empty_file_path(self):
-        """Test when the provided path is empty."""
-        with self.assertRaises(Exception) as cex:
-            self.gnupg_manager.decrypt_file('')
+    assert str(cex.value) == "Decryption of file 'file.gpg' could not be completed."
 
-        self.assertEqual(cex.exception.message, "An empty file path was provided.")
 
-    def test_decrypt_file_invalid_file_extension(self):
-        """Test when the provided path has an extension other than .gpg."""
-        mock_input_file = 'file.dat'
+@pytest.mark.parametrize("remove_flag", [False, True])
+@mock.patch(MOCK_PACKAGE + 'remove_path')
+def test_decrypt_file_decryption_success_case(mock_remove_path, gnupg_manager, gpg_io,
+                                              remove_flag):
+    """Test when the file is decrypted successfully, removing the original file if requested."""
+    mock_input_file = 'file.gpg'
+    gpg_io.os.path.exists.return_value = True
+    gpg_io.os.path.isdir.return_value = False
+    gpg_io.popen.return_value.wait.return_value = 0
+    mock_remove_path.return_value = True
 
-        with self.assertRaises(Exception) as cex:
-            self.gnupg_manager.decrypt_file(mock_input_file)
-
-        self.assertEqual(cex.exception.message, "Not a valid GPG encrypted file '{}'.".format(
-            mock_input_file))
-
-    @mock.patch(MOCK_PACKAGE + 'os')
-    def test_decrypt_file_path_does_not_exist(self, mock_os):
-        """Test when the provided path has does not exist."""
-        mock_input_file = 'file.gpg'
-        mock_os.path.exists.return_value = False
-
-        with self.assertRaises(Exception) as cex:
-            self.gnupg_manager.decrypt_file(mock_input_file)
-
-        self.assertEqual(cex.exception.message, "Informed file does not exist '{}'.".format(
-            mock_input_file))
-
-    @mock.patch(MOCK_PACKAGE + 'os')
-    def test_decrypt_file_input_path_is_dir(self, mock_os):
-        """Test when the provided path is not a file."""
-        mock_input_file = 'file.gpg'
-        mock_os.path.exists.return_value = True
-        mock_os.path.isdir.return_value = True
-
-        with self.assertRaises(Exception) as cex:
-            self.gnupg_manager.decrypt_file(mock_input_file)
-
-        self.assertEqual(cex.exception.message, "Informed path is a directory '{}'.".format(
-            mock_input_file))
-
-    @mock.patch(MOCK_PACKAGE + 'open')
-    @mock.patch(MOCK_PACKAGE + 'Popen')
-    @mock.patch(MOCK_PACKAGE + 'os')
-    def test_decrypt_file_decryption_failure_exception(self, mock_os, mock_popen, mock_open):
-        """Test when an error happens when trying to decrypt the file."""
-        mock_input_file = 'file.gpg'
-        mock_os.path.exists.return_value = True
-        mock_os.path.isdir.return_value = False
-        mock_popen.return_value.wait.return_value = 1
-        mock_open.return_value = mock.MagicMock(spec=file)
-
-        with self.assertRaises(Exception) as cex:
-            self.gnupg_manager.decrypt_file(mock_input_file)
-
-        self.assertEqual(cex.exception.message, "Decryption of file '{}' could not be "
-                                                "completed.".format(mock_input_file))
+    decrypt_file_result = gnupg_manager.decrypt_file(mock_input_file, remove_flag)
+    assert decrypt_file_result == 'file'
 
-    @mock.patch(MOCK_PACKAGE + 'open')
-    @mock.patch(MOCK_PACKAGE + 'Popen')
-    @mock.patch(MOCK_PACKAGE + 'os')
-    def test_decrypt_file_decryption_success_case(self, mock_os, mock_popen, mock_open):
-        """Test when the file is decrypted successfully."""
-        mock_input_file = 'file.gpg'
-        mock_os.path.exists.return_value = True
-        mock_os.path.isdir.return_value = False
-        mock_popen.return_value.wait.return_value = 0
-        mock_open.return_value = mock.MagicMock(spec=file)
-
-        decrypt_file_result = self.gnupg_manager.decrypt_file(mock_input_file)
-        self.assertEqual(decrypt_file_result, 'file')
-
-    @mock.patch(MOCK_PACKAGE + 'remove_path')
-    @mock.patch(MOCK_PACKAGE + 'open')
-    @mock.patch(MOCK_PACKAGE + 'Popen')
-    @mock.patch(MOCK_PACKAGE + 'os')
-    def test_decrypt_file_decryption_success_case_remove_flag(
-            self, mock_os, mock_popen, mock_open, mock_remove_path):
-        """Test when the file is decrypted successfully and the original file is removed."""
-        mock_input_file = 'file.gpg'
-        mock_os.path.exists.return_value = True
-        mock_os.path.isdir.return_value = False
-        mock_popen.return_value.wait.return_value = 0
-        mock_open.return_value = mock.MagicMock(spec=file)
-        mock_remove_path.return_value = True
-
-        decrypt_file_result = self.gnupg_manager.decrypt_file(mock_input_file, True)
-        self.assertEqual(decrypt_file_result, 'file')
-
-        self.gnupg_manager.logger.info.assert_called_with("Removing file '{}'.".format(
-            mock_input_file))
+    if remove_flag:
+        gnupg_manager.logger.info.assert_called_with("Removing file '{}'.".format(mock_input_file))
+        mock_remove_path.assert_called_once_with(mock_input_file)
+    else:
+        mock_remove_path.assert_not_called()
@@ -16,271 +16,199 @@
 This module is for unit testing NotificationHandler class from backup_settings.py script
 """
 
-import unittest
-import logging
-import mock
+try:
+    from unittest import mock
+except ImportError:
+    import mock
 
-from network_backup_offsite import __version__
+import pytest
+
+from network_backup_offsite import __version__, notification_handler
 from network_backup_offsite.exceptions import NotificationHandlerException
 from network_backup_offsite.notification_handler import NotificationHandler
 from requests import RequestException
 
-MOCK_LOGGER = 'network_backup_offsite.notification_handler.CustomLogger'
-MOCK_REQUEST_POST = 'network_backup_offsite.notification_handler.requests.post'
-MOCK_GET_CLI_ARGUMENTS = 'network_backup_offsite.notification_handler.NotificationHandler.' \
-                         '_get_cli_arguments_into_email_body'
+EMAIL_TO = 'mock@email'
+EMAIL_URL = 'http://mock'
+FROM_NAME = 'mock'
+SUBJECT = 'mock_subject'
+MESSAGE = 'mock_message'
 
-CLI_ARGUMENTS = "network_bkp_offsite ran with the following arguments:<br>{}<br>" \
-    .format(['--script_option', '1', '--customer_name', 'CUSTOMER_0'])
+CLI_ARGUMENTS = "network_bkp_offsite ran with the following arguments:<br>" \
+                "['--script_option', '1', '--customer_name', 'CUSTOMER_0']<br>"
 
-OUTPUT_LINE = "===================================================================================="
+VERSION_TAIL = "<br><br>ntwk_bkp_offsite Version: " + __version__
 
-logging.disable(logging.CRITICAL)
+EXPECTED_ERROR_WITH_LIST = CLI_ARGUMENTS + \
+                           "The following errors happened during this operation:<br>" \
+                           "error 1<br>" \
+                           "error 2<br>" \
+                           "error 3<br>" \
+                           "System stopped with error code: 1." + VERSION_TAIL
 
+EXPECTED_SUCCESS_WITH_LIST = CLI_ARGUMENTS + \
+                             "The following operations were successfully finished:<br>" \
+                             "Upload finished.<br>" \
+                             "Elapsed time: 2<br>" + VERSION_TAIL
 
-class NotificationHandlerSendEmailTestCase(unittest.TestCase):
-    """Class for testing send_mail function from backup.notification_handler.py script."""
+EXPECTED_ERROR_WITHOUT_LIST = CLI_ARGUMENTS + "System stopped with error code: 1." + VERSION_TAIL
 
-    @classmethod
-    def setUp(cls):
-        """
-        Setup for the tests
-        """
-        cls.email_to = 'mock@email'
-        cls.email_url = 'http://mock'
-        cls.from_name = 'mock'
-        cls.email_from = cls.from_name + '@ericsson.com'
-        cls.subject = 'mock_subject'
-        cls.message = 'mock_message'
+EXPECTED_EMPTY_BODY = CLI_ARGUMENTS + VERSION_TAIL
 
-        with mock.patch(MOCK_LOGGER) as logger:
-            cls.handler = NotificationHandler(cls.email_to, cls.email_url, logger)
 
-    @mock.patch(MOCK_REQUEST_POST)
-    def test_send_email_sending(self, mock_post):
-        """Test to check the log to notify about the attempt to send the email is generated."""
-        mock_post.return_value.status_code = 200
+def get_notification_handler(email_domain=None):
+    """
+    Get an instance of NotificationHandler to perform tests.
 
-        result = self.handler.send_mail(self.from_name, self.subject, self.message)
+    :param email_domain: domain used by the sender of the e-mails.
 
-        self.handler.logger.log_info.assert_called_with("Sending e-mail from mock@ericsson.com to "
-                                                        "mock@email with subject 'mock_subject'.")
-        self.handler.logger.info.assert_called_with("E-mail sent successfully to: 'mock@email'.")
-        self.assertTrue(result)
+    :return: notification handler instance.
+    """
+    with mock.patch.object(notification_handler, 'CustomLogger', autospec=True):
+        return NotificationHandler(EMAIL_TO, EMAIL_URL, mock.MagicMock(), email_domain)
 
-    def test_send_email_empty_deployment_name(self):
-        """Test to check if deployment name is not provided."""
-        with self.assertRaises(Exception) as cex:
-            self.handler.send_mail("", self.subject, self.message)
 
-        self.assertEqual(cex.exception.message, "An empty sender was informed.")
+@pytest.fixture(scope="module")
+def shared_handler():
+    """
+    Build the NotificationHandler instance shared by the tests of this module.
 
-    @mock.patch(MOCK_REQUEST_POST)
-    def test_send_email_bad_response(self, mock_post):
-        """Test to check the return value if the email was not sent due to bad response."""
-        mock_post.return_value.raise_for_status.side_effect = RequestException
+    :return: notification handler instance.
+    """
+    return get_notification_handler()
 
-        with self.assertRaises(NotificationHandlerException) as cex:
-            self.handler.send_mail(self.from_name, self.subject, self.message)
 
-        self.assertRegexpMatches(cex.exception.message, "Failed to send e-mail to")
+@pytest.fixture
+def handler(shared_handler):
+    """
+    Provide the shared NotificationHandler instance with a clean logger mock.
 
-    @mock.patch(MOCK_REQUEST_POST)
-    def test_send_email_sending_with_other_domain(self, mock_post):
-        """Asserts if the domain is changed from default."""
-        with mock.patch(MOCK_LOGGER) as logger:
-            self.handler = NotificationHandler(self.email_to, self.email_url, logger, "mock_domain")
+    :param shared_handler: module scoped notification handler instance.
 
-        mock_post.return_value.status_code = 200
+    :return: notification handler instance.
+    """
+    shared_handler.logger.reset_mock()
 
-        result = self.handler.send_mail(self.from_name, self.subject, self.message)
+    return shared_handler
 
-        self.handler.logger.log_info.assert_called_with("Sending e-mail from mock@mock_domain to "
-                                                        "mock@email with subject 'mock_subject'.")
-        self.handler.logger.info.assert_called_with("E-mail sent successfully to: 'mock@email'.")
-        self.assertTrue(result)
 
+@pytest.fixture(scope="module", autouse=True)
+def mock_cli_args():
+    """
+    Patch the CLI arguments line of the e-mail body for all the tests of this module.
 
-class NotificationHandlerGetLinesFromListTestCase(unittest.TestCase):
-    """Class for unit testing the _get_lines_from_list private method."""
+    :return: _get_cli_arguments_into_email_body mock.
+    """
+    with mock.patch.object(NotificationHandler, '_get_cli_arguments_into_email_body') as cli_args:
+        cli_args.return_value = CLI_ARGUMENTS
+        yield cli_args
 
-    @classmethod
-    def setUp(cls):
-        """Setup for the tests."""
-        cls.email_to = "test@email.com"
-        cls.email_url = "http://fake_url"
 
-        with mock.patch(MOCK_LOGGER) as logger:
-            cls.handler = NotificationHandler(cls.email_to, cls.email_url, logger)
+class FakeResponse(object):
+    """Stand-in for the requests.Response object returned by requests.post."""
 
-    def test_get_lines_from_list_one_level(self):
-        """Asserts if a simple list returns as a text."""
-        error_list = ["error 1", "error 2", "error 3"]
+    def __init__(self):
+        """Initialize a successful response."""
+        self.status_code = 200
+        self.error = None
 
-        expected_message = "error 1<br>" \
-                           "error 2<br>" \
-                           "error 3<br>"
+    def raise_for_status(self):
+        """Raise the configured error, if any."""
+        if self.error is not None:
+            raise self.error
 
-        result_message = self.handler._get_lines_from_list(error_list)
 
-        self.assertEqual(expected_message, result_message)
+@pytest.fixture
+def response(monkeypatch):
+    """
+    Replace the requests.post function used to send the e-mails by a fake one.
 
-    def test_get_lines_from_list_two_levels(self):
-        """Asserts if a list inside another list is added to the text."""
-        error_list_level_two = ["error 1", "error 2", "error 3"]
-        error_list_level_one = ["Exception 1", error_list_level_two, "Exception n"]
+    :param monkeypatch: pytest monkeypatch fixture.
 
-        expected_message = "Exception 1<br>" \
-                           "error 1<br>" \
-                           "error 2<br>" \
-                           "error 3<br>" \
-                           "Exception n<br>"
+    :return: response returned by the fake requests.post.
+    """
+    fake_response = FakeResponse()
+    monkeypatch.setattr(notification_handler.requests, 'post',
+                        lambda *args, **kwargs: fake_response)
 
-        result_message = self.handler._get_lines_from_list(error_list_level_one)
+    return fake_response
 
-        self.assertEqual(expected_message, result_message)
 
-    def test_get_lines_from_list_three_levels(self):
-        """Asserts if a list inside another list is added to the text."""
-        error_list_level_three = ["Error a", "Error b"]
-        error_list_level_two = ["error 1", "error 2", "error 3", error_list_level_three]
-        error_list_level_one = ["Exception 1", error_list_level_two, "Exception n"]
+@pytest.mark.parametrize("email_domain, sending_log", [
+    (None, "Sending e-mail from mock@ericsson.com to mock@email with subject 'mock_subject'."),
+    ("mock_domain",
+     "Sending e-mail from mock@mock_domain to mock@email with subject 'mock_subject'."),
+])
+@pytest.mark.usefixtures("response")
+def test_send_email_sending(email_domain, sending_log):
+    """
+    Test to check the log to notify about the attempt to send the email is generated.
+    :param email_domain: informed e-mail domain, the default one is used when None.
+    :param sending_log: expected log about the attempt to send the e-mail.
+    """
+    handler = get_notification_handler(email_domain)
 
-        expected_message = "Exception 1<br>" \
-                           "error 1<br>" \
-                           "error 2<br>" \
-                           "error 3<br>" \
-                           "Error a<br>" \
-                           "Error b<br>" \
-                           "Exception n<br>"
+    result = handler.send_mail(FROM_NAME, SUBJECT, MESSAGE)
 
-        result_message = self.handler._get_lines_from_list(error_list_level_one)
+    handler.logger.log_info.assert_called_with(sending_log)
+    handler.logger.info.assert_called_with("E-mail sent successfully to: 'mock@email'.")
+    assert result
 
-        self.assertEqual(expected_message, result_message)
 
-    def test_get_lines_from_list_no_list(self):
-        """Asserts that an empty text is returned when there is no elements within the list."""
-        error_list = []
+def test_send_email_empty_deployment_name(handler):
+    """Test to check if deployment name is not provided."""
+    with pytest.raises(Exception) as cex:
+        handler.send_mail("", SUBJECT, MESSAGE)
 
-        expected_message = ""
+    assert cex.value.message == "An empty sender was informed."
 
-        result_message = self.handler._get_lines_from_list(error_list)
 
-        self.assertEqual(expected_message, result_message)
+def test_send_email_bad_response(handler, response):
+    """Test to check the return value if the email was not sent due to bad response."""
+    response.error = RequestException()
 
-    def test_get_lines_from_list_no_list_as_none(self):
-        """Asserts that an empty text is returned when a None object is informed as argument."""
-        error_list = None
+    with pytest.raises(NotificationHandlerException, match="Failed to send e-mail to"):
+        handler.send_mail(FROM_NAME, SUBJECT, MESSAGE)
 
-        expected_message = ""
 
-        result_message = self.handler._get_lines_from_list(error_list)
-
-        self.assertEqual(expected_message, result_message)
-
-
-class NotificationHandlerPrepareEmailBodyTestCase(unittest.TestCase):
-    """Class for unit testing the prepare_email_body method."""
-
-    @classmethod
-    def setUp(cls):
-        """Setup for the tests."""
-        cls.email_to = "test@email.com"
-        cls.email_url = "http://fake_url"
-
-        with mock.patch(MOCK_LOGGER) as logger:
-            cls.handler = NotificationHandler(cls.email_to, cls.email_url, logger)
-
-    @mock.patch(MOCK_GET_CLI_ARGUMENTS)
-    def test_prepare_email_body_error_email(self, mock_cli_args):
-        """
-        Asserts if the formatted e-mail has the list errors and the message with code error.
-        :param mock_cli_args: mocking the message with the CLI arguments.
-        """
-        mock_cli_args.return_value = CLI_ARGUMENTS
-        error_list = ["error 1", "error 2", "error 3"]
-
-        expected_message = "network_bkp_offsite ran with the following arguments:<br>" \
-                           "['--script_option', '1', '--customer_name', 'CUSTOMER_0']<br>" \
-                           "The following errors happened during this operation:<br>" \
-                           "error 1<br>" \
-                           "error 2<br>" \
-                           "error 3<br>" \
-                           "System stopped with error code: 1." \
-                           "<br><br>ntwk_bkp_offsite Version: " + __version__
-
-        result = self.handler._prepare_email_body(NotificationHandler.ERROR, error_list, 1)
-
-        self.assertEqual(expected_message, result)
-
-    @mock.patch(MOCK_GET_CLI_ARGUMENTS)
-    def test_prepare_email_body_success_email(self, mock_cli_args):
-        """
-        Asserts if the formatted e-mail has the list errors and the message with code error.
-        :param mock_cli_args: mocking the message with the CLI arguments.
-        """
-        mock_cli_args.return_value = CLI_ARGUMENTS
-        message_list = ["Upload finished.", "Elapsed time: 2"]
-
-        expected_message = "network_bkp_offsite ran with the following arguments:<br>" \
-                           "['--script_option', '1', '--customer_name', 'CUSTOMER_0']<br>" \
-                           "The following operations were successfully finished:<br>" \
-                           "Upload finished.<br>" \
-                           "Elapsed time: 2<br>" \
-                           "<br><br>ntwk_bkp_offsite Version: " + __version__
-
-        result = self.handler._prepare_email_body(NotificationHandler.SUCCESS, message_list)
-
-        self.assertEqual(expected_message, result)
-
-    @mock.patch(MOCK_GET_CLI_ARGUMENTS)
-    def test_prepare_email_body_error_list_none(self, mock_cli_args):
-        """
-        Asserts if the formatted e-mail has no list errors and the message with code error.
-        :param mock_cli_args: mocking the message with the CLI arguments.
-        """
-        mock_cli_args.return_value = CLI_ARGUMENTS
-        error_list = None
-        expected_message = "network_bkp_offsite ran with the following arguments:<br>" \
-                           "['--script_option', '1', '--customer_name', 'CUSTOMER_0']<br>" \
-                           "System stopped with error code: 1." \
-                           "<br><br>ntwk_bkp_offsite Version: " + __version__
-
-        result = self.handler._prepare_email_body(NotificationHandler.ERROR, error_list, 1)
-
-        self.assertEqual(expected_message, result)
-
-    @mock.patch(MOCK_GET_CLI_ARGUMENTS)
-    def test_prepare_email_body_error_list_none_error_code_none(self, mock_cli_args):
-        """
-        Asserts if the formatted e-mail has no list errors and no message with code error.
-        :param mock_cli_args: mocking the message with the CLI arguments.
-        """
-        mock_cli_args.return_value = CLI_ARGUMENTS
-        error_list = None
-        expected_message = "network_bkp_offsite ran with the following arguments:<br>" \
-                           "['--script_option', '1', '--customer_name', 'CUSTOMER_0']<br>" \
-                           "<br><br>ntwk_bkp_offsite Version: " + __version__
-
-        result = self.handler._prepare_email_body(NotificationHandler.ERROR, error_list)
-
-        self.assertEqual(expected_message, result)
-
-    @mock.patch(MOCK_GET_CLI_ARGUMENTS)
-    def test_prepare_email_body_message_list_none(self, mock_cli_args):
-        """
-        Asserts if the formatted e-mail has no list message and no code error, even though it is
-        informed
-
-        :param mock_cli_args: mocking the message with the CLI arguments
-        """
-        mock_cli_args.return_value = CLI_ARGUMENTS
-        message_list = None
-        expected_message = "network_bkp_offsite ran with the following arguments:<br>" \
-                           "['--script_option', '1', '--customer_name', 'CUSTOMER_0']<br>" \
-                           "<br><br>ntwk_bkp_offsite Version: " + __version__
-
-        result = self.handler._prepare_email_body(NotificationHandler.SUCCESS,
-                                                  message_list, 1)
-
-        self.assertEqual(expected_message, result)
+@pytest.mark.parametrize("email_text_list, expected_message", [
+    (["error 1", "error 2", "error 3"],
+     "error 1<br>error 2<br>error 3<br>"),
+    (["Exception 1", ["error 1", "error 2", "error 3"], "Exception n"],
+     "Exception 1<br>error 1<br>error 2<br>error 3<br>Exception n<br>"),
+    (["Exception 1", ["error 1", "error 2", "error 3", ["Error a", "Error b"]], "Exception n"],
+     "Exception 1<br>error 1<br>error 2<br>error 3<br>Error a<br>Error b<br>Exception n<br>"),
+    ([], ""),
+    (None, ""),
+])
+def test_get_lines_from_list(handler, email_text_list, expected_message):
+    """
+    Asserts if the messages of the list, and of any nested list, are joined as a text.
+    :param email_text_list: list of messages.
+    :param expected_message: expected text.
+    """
+    assert expected_message == handler._get_lines_from_list(email_text_list)
+
+
+@pytest.mark.parametrize("type_email, message_list, error_code, expected_message", [
+    (NotificationHandler.ERROR, ["error 1", "error 2", "error 3"], 1, EXPECTED_ERROR_WITH_LIST),
+    (NotificationHandler.SUCCESS, ["Upload finished.", "Elapsed time: 2"], None,
+     EXPECTED_SUCCESS_WITH_LIST),
+    (NotificationHandler.ERROR, None, 1, EXPECTED_ERROR_WITHOUT_LIST),
+    (NotificationHandler.ERROR, None, None, EXPECTED_EMPTY_BODY),
+    (NotificationHandler.SUCCESS, None, 1, EXPECTED_EMPTY_BODY),
+])
+def test_prepare_email_body(handler, type_email, message_list, error_code, expected_message):
+    """
+    Asserts if the formatted e-mail has the message list and the error code, when they apply.
+
+    The error code is only added to error e-mails.
+
+    :param type_email: type of the e-mail.
+    :param message_list: informed message list.
+    :param error_code: informed error code.
+    :param expected_message: expected e-mail body.
+    """
+    result = handler._prepare_email_body(type_email, message_list, error_code)
+
+    assert expected_message == result
@@ -17,6 +17,9 @@
 
 """Module for testing network_backup_offsite/offsite_handler.py script."""
 
+import os
+import shutil
+import tempfile
 import unittest
 
 from network_backup_offsite.onsite_handler import OnsiteHandler
@@ -56,6 +59,16 @@ def create_onsite_object():
     return onsite_handler
 
 
+def create_dir_entry(name, mtime=0, is_dir=True):
+    """Function to create a mocked directory entry as returned by scandir."""
+    dir_entry = mock.MagicMock()
+    dir_entry.name = name
+    dir_entry.path = name
+    dir_entry.is_dir.return_value = is_dir
+    dir_entry.stat.return_value.st_mtime = mtime
+    return dir_entry
+
+
 class OnsiteHandlerGetOnsiteBackupsListTestCase(unittest.TestCase):
 
     @classmethod
@@ -66,25 +79,27 @@ class OnsiteHandlerGetOnsiteBackupsListTestCase(unittest.TestCase):
     @mock.patch(MOCK_PACKAGE + 'os')
     def test_get_onsite_backups_list_path_not_exist(self, mock_os):
         self.onsite_handler.onsite_deployment_config = EnmConfig(MOCK_DEPLOYMENT_NAME,
-                                                                 MOCK_BKP_DESTINATION)
+                                                                 MOCK_BKP_DESTINATION,
+                                                                 MOCK_ONSITE_RETENTION_VALUE)
 
-        calls = [mock.call("Invalid backup source path 'mock_bkp_dest'.")]
+        calls = [mock.call("Invalid backup source path '%s'.", MOCK_BKP_DESTINATION)]
 
         mock_os.path.exists.return_value = False
         self.assertIsNone(self.onsite_handler.get_onsite_backups_list())
         self.onsite_handler.logger.error.assert_has_calls(calls)
 
-    @mock.patch('__builtin__.next')
+    @mock.patch(MOCK_PACKAGE + 'scandir')
     @mock.patch(MOCK_PACKAGE + 'os')
-    def test_get_onsite_backups_list_no_bkp_dir_exception(self, mock_os, mock_next):
+    def test_get_onsite_backups_list_no_bkp_dir_exception(self, mock_os, mock_scandir):
         self.onsite_handler.onsite_deployment_config = EnmConfig(MOCK_DEPLOYMENT_NAME,
-                                                                 MOCK_BKP_DESTINATION)
+                                                                 MOCK_BKP_DESTINATION,
+                                                                 MOCK_ONSITE_RETENTION_VALUE)
 
         calls = [mock.call("No backup directories were found for the provided path: "
                            "'mock_bkp_dest'.")]
 
         mock_os.path.exists.return_value = True
-        mock_next.return_value = "", "", ""
+        mock_scandir.return_value = [create_dir_entry(MOCK_BKP_TAG_ENCRYPTED, is_dir=False)]
 
         with self.assertRaises(Exception) as cex:
             self.onsite_handler.get_onsite_backups_list()
@@ -94,24 +109,64 @@ class OnsiteHandlerGetOnsiteBackupsListTestCase(unittest.TestCase):
 
         self.onsite_handler.logger.error.assert_has_calls(calls)
 
-    @mock.patch('__builtin__.next')
+    @mock.patch(MOCK_PACKAGE + 'has_min_number_of_entries')
+    @mock.patch(MOCK_PACKAGE + 'scandir')
     @mock.patch(MOCK_PACKAGE + 'os')
-    def test_get_onsite_backups_list_success(self, mock_os, mock_next):
+    def test_get_onsite_backups_list_success(self, mock_os, mock_scandir, mock_has_min_entries):
         self.onsite_handler.onsite_deployment_config = EnmConfig(MOCK_DEPLOYMENT_NAME,
-                                                                 MOCK_BKP_DESTINATION)
+                                                                 MOCK_BKP_DESTINATION,
+                                                                 MOCK_ONSITE_RETENTION_VALUE)
 
-        calls = [mock.call("Getting the list of valid backups from 'mock_bkp_dest'."),
-                 mock.call("Added the backup 'mock_bkp_path' to list of valid backups.")]
+        calls = [mock.call("Getting the list of valid backups from '%s'.", MOCK_BKP_DESTINATION),
+                 mock.call("Added the backup '%s' to list of valid backups.", MOCK_BKP_PATH)]
 
         mock_os.path.exists.return_value = True
-        mock_next.return_value = MOCK_BKP_PATH, [MOCK_BKP_PATH],\
-                                 MOCK_BKP_TAG
-        mock_os.path.join.return_value = MOCK_BKP_PATH
+        mock_scandir.return_value = [create_dir_entry(MOCK_BKP_PATH)]
+        mock_has_min_entries.return_value = True
 
         self.assertEqual(self.onsite_handler.get_onsite_backups_list(), [MOCK_BKP_PATH])
 
         self.onsite_handler.logger.info.assert_has_calls(calls)
 
+    @mock.patch(MOCK_PACKAGE + 'has_min_number_of_entries')
+    @mock.patch(MOCK_PACKAGE + 'scandir')
+    @mock.patch(MOCK_PACKAGE + 'os')
+    def test_get_onsite_backups_list_sorted_oldest_first(self, mock_os, mock_scandir,
+                                                         mock_has_min_entries):
+        self.onsite_handler.onsite_deployment_config = EnmConfig(MOCK_DEPLOYMENT_NAME,
+                                                                 MOCK_BKP_DESTINATION,
+                                                                 MOCK_ONSITE_RETENTION_VALUE)
+
+        mock_os.path.exists.return_value = True
+        mock_scandir.return_value = [create_dir_entry('bkp_new', 30),
+                                     create_dir_entry('bkp_old', 10),
+                                     create_dir_entry('bkp_mid', 20)]
+        mock_has_min_entries.return_value = True
+
+        self.assertEqual(self.onsite_handler.get_onsite_backups_list(),
+                         ['bkp_old', 'bkp_mid', 'bkp_new'])
+
+    @mock.patch(MOCK_PACKAGE + 'has_min_number_of_entries')
+    @mock.patch(MOCK_PACKAGE + 'scandir')
+    @mock.patch(MOCK_PACKAGE + 'os')
+    def test_get_onsite_backups_list_skip_incomplete_backup(self, mock_os, mock_scandir,
+                                                            mock_has_min_entries):
+        self.onsite_handler.onsite_deployment_config = EnmConfig(MOCK_DEPLOYMENT_NAME,
+                                                                 MOCK_BKP_DESTINATION,
+                                                                 MOCK_ONSITE_RETENTION_VALUE)
+
+        calls = [mock.call("Skipped the backup '%s', it has less than %s files.",
+                           'bkp_incomplete', 3)]
+
+        mock_os.path.exists.return_value = True
+        mock_scandir.return_value = [create_dir_entry('bkp_incomplete'),
+                                     create_dir_entry(MOCK_BKP_PATH)]
+        mock_has_min_entries.side_effect = [False, True]
+
+        self.assertEqual(self.onsite_handler.get_onsite_backups_list(), [MOCK_BKP_PATH])
+
+        self.onsite_handler.logger.warning.assert_has_calls(calls)
+
 
 class OnsiteHandlerProcessBackupListTestCase(unittest.TestCase):
 
@@ -119,6 +174,7 @@ class OnsiteHandlerProcessBackupListTestCase(unittest.TestCase):
     def setUp(cls):
         """Set up the test constants."""
         cls.onsite_handler = create_onsite_object()
+        cls.onsite_handler.bkp_temp_folder = MOCK_BKP_PATH
 
     @mock.patch(MOCK_PACKAGE + 'OnsiteHandler.get_onsite_backups_list')
     def test_process_backup_list_no_onsite_bkps(self, mock_get_onsite_bkp):
@@ -129,6 +185,8 @@ class OnsiteHandlerProcessBackupListTestCase(unittest.TestCase):
 
         self.assertEqual(cex.exception.message, "No valid network device backups found.")
 
+    @mock.patch(MOCK_PACKAGE + 'stop_ssh_master_connection', mock.MagicMock())
+    @mock.patch(MOCK_PACKAGE + 'start_ssh_master_connection', mock.MagicMock())
     @mock.patch(MOCK_PACKAGE + 'OnsiteHandler.create_onsite_offsite_backup_paths')
     @mock.patch(MOCK_PACKAGE + 'OnsiteHandler.backup_already_on_offsite')
     @mock.patch(MOCK_PACKAGE + 'OnsiteHandler.prepare_offsite_onsite_main_paths')
@@ -146,24 +204,65 @@ class OnsiteHandlerProcessBackupListTestCase(unittest.TestCase):
 
         self.assertEqual(cex.exception.message, ["Backup exception"])
 
+    @mock.patch(MOCK_PACKAGE + 'stop_ssh_master_connection', mock.MagicMock())
+    @mock.patch(MOCK_PACKAGE + 'start_ssh_master_connection', mock.MagicMock())
+    @mock.patch(MOCK_PACKAGE + 'remove_path', mock.MagicMock())
+    @mock.patch(MOCK_PACKAGE + 'OnsiteHandler.stage_backup_for_retry')
+    @mock.patch(MOCK_PACKAGE + 'OnsiteHandler.add_to_uploaded_backups_manifest')
     @mock.patch(MOCK_PACKAGE + 'OnsiteHandler.delete_tmp_bkp_folder')
     @mock.patch(MOCK_PACKAGE + 'OnsiteHandler.transfer_backup_to_offsite')
     @mock.patch(MOCK_PACKAGE + 'OnsiteHandler.process_backup')
+    @mock.patch(MOCK_PACKAGE + 'OnsiteHandler.archive_backup_list')
+    @mock.patch(MOCK_PACKAGE + 'OnsiteHandler.create_onsite_offsite_backup_paths')
+    @mock.patch(MOCK_PACKAGE + 'OnsiteHandler.backup_already_on_offsite')
+    @mock.patch(MOCK_PACKAGE + 'OnsiteHandler.prepare_offsite_onsite_main_paths')
+    @mock.patch(MOCK_PACKAGE + 'OnsiteHandler.get_onsite_backups_list')
+    def test_process_backup_list_one_backup_exception(self, mock_get_onsite_bkp,
+                                                      mock_prepare_paths, mock_already_on_offsite,
+                                                      mock_create_paths, mock_archive_bkp_list,
+                                                      mock_process_bkp, mock_transfer_bkp,
+                                                      mock_delete_folder, mock_add_to_manifest,
+                                                      mock_stage_bkp):
+        mock_get_onsite_bkp.return_value = ['bkp_1', 'bkp_2']
+        mock_already_on_offsite.return_value = False
+        mock_archive_bkp_list.return_value = {}
+        mock_process_bkp.side_effect = [Exception("Backup exception"), MOCK_BKP_TAG_ENCRYPTED]
+        mock_transfer_bkp.return_value = True
+
+        with self.assertRaises(Exception) as cex:
+            self.onsite_handler.process_backup_list()
+
+        self.assertEqual(cex.exception.message, ["Backup exception"])
+        mock_add_to_manifest.assert_called_once_with('bkp_2')
+
+    @mock.patch(MOCK_PACKAGE + 'stop_ssh_master_connection', mock.MagicMock())
+    @mock.patch(MOCK_PACKAGE + 'start_ssh_master_connection', mock.MagicMock())
+    @mock.patch(MOCK_PACKAGE + 'remove_path', mock.MagicMock())
+    @mock.patch(MOCK_PACKAGE + 'OnsiteHandler.stage_backup_for_retry')
+    @mock.patch(MOCK_PACKAGE + 'OnsiteHandler.add_to_uploaded_backups_manifest')
+    @mock.patch(MOCK_PACKAGE + 'OnsiteHandler.delete_tmp_bkp_folder')
+    @mock.patch(MOCK_PACKAGE + 'OnsiteHandler.transfer_backup_to_offsite')
+    @mock.patch(MOCK_PACKAGE + 'OnsiteHandler.process_backup')
+    @mock.patch(MOCK_PACKAGE + 'OnsiteHandler.archive_backup_list')
     @mock.patch(MOCK_PACKAGE + 'OnsiteHandler.create_onsite_offsite_backup_paths')
     @mock.patch(MOCK_PACKAGE + 'OnsiteHandler.backup_already_on_offsite')
     @mock.patch(MOCK_PACKAGE + 'OnsiteHandler.prepare_offsite_onsite_main_paths')
     @mock.patch(MOCK_PACKAGE + 'OnsiteHandler.get_onsite_backups_list')
     def test_process_backup_list_backup_success(self, mock_get_onsite_bkp,
                                                 mock_prepare_paths, mock_already_on_offsite,
-                                                mock_create_paths, mock_process_bkp,
-                                                mock_transfer_bkp, mock_delete_folder):
+                                                mock_create_paths, mock_archive_bkp_list,
+                                                mock_process_bkp, mock_transfer_bkp,
+                                                mock_delete_folder, mock_add_to_manifest,
+                                                mock_stage_bkp):
         mock_get_onsite_bkp.return_value = [MOCK_BKP_PATH]
         mock_prepare_paths.return_value = True
         mock_already_on_offsite.return_value = False
         mock_create_paths.return_value = True
+        mock_archive_bkp_list.return_value = {MOCK_BKP_PATH: MOCK_BKP_TAG_COMPRESSED}
         mock_process_bkp.return_value = MOCK_BKP_TAG_ENCRYPTED
         mock_transfer_bkp.return_value = True
         mock_delete_folder.return_value = None
+        mock_stage_bkp.return_value = MOCK_BKP_TAG_ENCRYPTED
 
         calls = [mock.call("Doing backup of: ['mock_bkp_path']")]
 
@@ -171,24 +270,174 @@ class OnsiteHandlerProcessBackupListTestCase(unittest.TestCase):
         self.assertTrue(result)
         self.assertEqual(result_list, [MOCK_BKP_PATH])
         self.onsite_handler.logger.log_info.assert_has_calls(calls)
+        mock_process_bkp.assert_called_once_with(MOCK_BKP_PATH, self.onsite_handler.bkp_temp_folder,
+                                                 MOCK_BKP_TAG_COMPRESSED)
+        mock_add_to_manifest.assert_called_once_with(MOCK_BKP_PATH)
+        mock_transfer_bkp.assert_called_once_with(MOCK_BKP_PATH, MOCK_BKP_TAG_ENCRYPTED,
+                                                  self.onsite_handler.remote_root_container_path)
 
 
-class OnsiteHandlerPrepareOffsiteOnsiteMainPathsTestCase(unittest.TestCase):
+    @mock.patch(MOCK_PACKAGE + 'stop_ssh_master_connection', mock.MagicMock())
+    @mock.patch(MOCK_PACKAGE + 'start_ssh_master_connection', mock.MagicMock())
+    @mock.patch(MOCK_PACKAGE + 'OnsiteHandler.delete_tmp_bkp_folder', mock.MagicMock())
+    @mock.patch(MOCK_PACKAGE + 'OnsiteHandler.create_onsite_offsite_backup_paths', mock.MagicMock())
+    @mock.patch(MOCK_PACKAGE + 'OnsiteHandler.process_backup')
+    @mock.patch(MOCK_PACKAGE + 'OnsiteHandler.backup_already_on_offsite')
+    @mock.patch(MOCK_PACKAGE + 'OnsiteHandler.transfer_retry_backups')
+    @mock.patch(MOCK_PACKAGE + 'OnsiteHandler.prepare_offsite_onsite_main_paths')
+    @mock.patch(MOCK_PACKAGE + 'OnsiteHandler.get_onsite_backups_list')
+    def test_process_backup_list_failed_retry_not_processed(self, mock_get_onsite_bkp,
+                                                            mock_prepare_paths, mock_transfer_retry,
+                                                            mock_already_on_offsite,
+                                                            mock_process_bkp):
+        retry_error = "Backup 'mock_bkp_tag' left by a previous run could not be transferred to " \
+                      "offsite."
+
+        def transfer_retry_backups(_, backup_error_list):
+            backup_error_list.append(retry_error)
+            return [], [MOCK_BKP_TAG]
+
+        mock_get_onsite_bkp.return_value = [MOCK_BKP_TAG]
+        mock_transfer_retry.side_effect = transfer_retry_backups
+        mock_already_on_offsite.return_value = False
+
+        with self.assertRaises(Exception) as cex:
+            self.onsite_handler.process_backup_list()
+
+        self.assertEqual(cex.exception.message, [retry_error])
+        mock_already_on_offsite.assert_not_called()
+        mock_process_bkp.assert_not_called()
+
+
+class OnsiteHandlerRetryBackupsTestCase(unittest.TestCase):
 
     @classmethod
     def setUp(cls):
         """Set up the test constants."""
         cls.onsite_handler = create_onsite_object()
+        cls.test_dir = tempfile.mkdtemp()
+        cls.onsite_handler.bkp_temp_folder = os.path.join(cls.test_dir, MOCK_BKP_PATH)
+        cls.onsite_handler.onsite_deployment_config = EnmConfig(MOCK_DEPLOYMENT_NAME,
+                                                                MOCK_BKP_DESTINATION,
+                                                                MOCK_ONSITE_RETENTION_VALUE)
+
+    def tearDown(self):
+        """Remove the test directory."""
+        shutil.rmtree(self.test_dir)
+
+    def stage_mock_backup(self):
+        """Create an encrypted backup in the test directory and move it to the retry folder."""
+        encrypted_backup_path = os.path.join(self.test_dir, MOCK_BKP_TAG_ENCRYPTED)
+        open(encrypted_backup_path, 'w').close()
+
+        return self.onsite_handler.stage_backup_for_retry(encrypted_backup_path)
+
+    def test_get_retry_folder_path_per_deployment(self):
+        self.assertEqual(self.onsite_handler.get_retry_folder_path(),
+                         os.path.join(self.test_dir, MOCK_BKP_PATH) + '_' + MOCK_DEPLOYMENT_NAME +
+                         '_retry')
+
+    def test_transfer_retry_backups_no_retry_folder(self):
+        backup_error_list = []
+
+        self.assertEqual(self.onsite_handler.transfer_retry_backups([MOCK_BKP_TAG],
+                                                                    backup_error_list), ([], []))
+        self.assertEqual(backup_error_list, [])
+
+    @mock.patch(MOCK_PACKAGE + 'OnsiteHandler.add_to_uploaded_backups_manifest')
+    @mock.patch(MOCK_PACKAGE + 'OnsiteHandler.transfer_backup_to_offsite')
+    def test_transfer_retry_backups_failed_transfer_kept(self, mock_transfer_bkp,
+                                                         mock_add_to_manifest):
+        staged_backup_path = self.stage_mock_backup()
+
+        self.assertFalse(os.path.exists(os.path.join(self.test_dir, MOCK_BKP_TAG_ENCRYPTED)))
+        self.assertTrue(os.path.exists(staged_backup_path))
+
+        backup_error_list = []
+
+        mock_transfer_bkp.return_value = False
+        self.assertEqual(self.onsite_handler.transfer_retry_backups([MOCK_BKP_TAG],
+                                                                    backup_error_list),
+                         ([], [MOCK_BKP_TAG]))
+        self.assertTrue(os.path.exists(staged_backup_path))
+        self.assertEqual(backup_error_list, ["Backup 'mock_bkp_tag' left by a previous run could "
+                                             "not be transferred to offsite."])
+
+        mock_transfer_bkp.return_value = True
+        self.assertEqual(self.onsite_handler.transfer_retry_backups([MOCK_BKP_TAG],
+                                                                    backup_error_list),
+                         ([MOCK_BKP_TAG], []))
+        self.assertFalse(os.path.exists(staged_backup_path))
+        mock_add_to_manifest.assert_called_once_with(MOCK_BKP_TAG)
+
+    @mock.patch(MOCK_PACKAGE + 'OnsiteHandler.transfer_backup_to_offsite')
+    def test_transfer_retry_backups_not_onsite_removed(self, mock_transfer_bkp):
+        staged_backup_path = self.stage_mock_backup()
+
+        backup_error_list = []
+
+        self.assertEqual(self.onsite_handler.transfer_retry_backups(['other_bkp_tag'],
+                                                                    backup_error_list), ([], []))
+        self.assertFalse(os.path.exists(staged_backup_path))
+        self.assertEqual(backup_error_list, [])
+        mock_transfer_bkp.assert_not_called()
+
+
+class OnsiteHandlerUploadedBackupsManifestTestCase(unittest.TestCase):
+
+    @classmethod
+    def setUp(cls):
+        """Set up the test constants."""
+        cls.onsite_handler = create_onsite_object()
+        cls.test_dir = tempfile.mkdtemp()
+        cls.onsite_handler.bkp_temp_folder = os.path.join(cls.test_dir, MOCK_BKP_PATH)
+
+    def tearDown(self):
+        """Remove the test directory."""
+        shutil.rmtree(self.test_dir)
+
+    def test_load_uploaded_backups_manifest_no_manifest(self):
+        self.assertEqual(self.onsite_handler.load_uploaded_backups_manifest(), set())
+
+    def test_load_uploaded_backups_manifest_invalid_manifest(self):
+        with open(self.onsite_handler.get_uploaded_backups_manifest_path(), 'w') as manifest_file:
+            manifest_file.write("not json")
+
+        self.assertEqual(self.onsite_handler.load_uploaded_backups_manifest(), set())
+
+    def test_uploaded_backups_manifest_add_and_remove(self):
+        self.assertTrue(self.onsite_handler.add_to_uploaded_backups_manifest('bkp_1'))
+        self.assertTrue(self.onsite_handler.add_to_uploaded_backups_manifest('bkp_2'))
+
+        self.assertEqual(self.onsite_handler.load_uploaded_backups_manifest(), {'bkp_1', 'bkp_2'})
+
+        self.assertTrue(self.onsite_handler.remove_from_uploaded_backups_manifest(['bkp_1']))
+
+        self.assertEqual(self.onsite_handler.load_uploaded_backups_manifest(), {'bkp_2'})
 
-    @mock.patch(MOCK_PACKAGE + 'create_remote_dir')
     @mock.patch(MOCK_PACKAGE + 'check_remote_path_exists')
-    def test_prepare_offsite_onsite_main_paths_create_dir_exception(self, mock_check_remote,
-                                                                    mock_create_dir):
-        mock_check_remote.return_value = False
-        mock_create_dir.return_value = False
+    def test_backup_already_on_offsite_in_manifest(self, mock_check_remote):
+        self.onsite_handler.uploaded_backups_set = {MOCK_BKP_TAG}
+
+        self.assertTrue(self.onsite_handler.backup_already_on_offsite(MOCK_BKP_TAG, MOCK_BKP_PATH,
+                                                                      MOCK_HOST))
+        self.assertFalse(mock_check_remote.called)
+
+
+class OnsiteHandlerPrepareOffsiteOnsiteMainPathsTestCase(unittest.TestCase):
+
+    @classmethod
+    def setUp(cls):
+        """Set up the test constants."""
+        cls.onsite_handler = create_onsite_object()
+
+    @mock.patch(MOCK_PACKAGE + 'create_and_list_remote_dir')
+    def test_prepare_offsite_onsite_main_paths_create_dir_exception(self, mock_create_dir):
+        mock_create_dir.return_value = False, None
 
         self.onsite_handler.onsite_deployment_config = EnmConfig(MOCK_DEPLOYMENT_NAME,
-                                                                 MOCK_BKP_DESTINATION)
+                                                                 MOCK_BKP_DESTINATION,
+                                                                 MOCK_ONSITE_RETENTION_VALUE)
         self.onsite_handler.remote_root_path = MOCK_BKP_DESTINATION
 
         with self.assertRaises(Exception) as cex:
@@ -198,10 +447,10 @@ class OnsiteHandlerPrepareOffsiteOnsiteMainPathsTestCase(unittest.TestCase):
                                                 "be created for customer mock_deployment.")
 
     @mock.patch(MOCK_PACKAGE + 'create_path')
-    @mock.patch(MOCK_PACKAGE + 'check_remote_path_exists')
-    def test_prepare_offsite_onsite_main_paths_create_path_exception(self, mock_check_remote,
+    @mock.patch(MOCK_PACKAGE + 'create_and_list_remote_dir')
+    def test_prepare_offsite_onsite_main_paths_create_path_exception(self, mock_create_dir,
                                                                      mock_create_path):
-        mock_check_remote.return_value = True
+        mock_create_dir.return_value = True, []
         mock_create_path.return_value = False
 
         self.onsite_handler.offsite_config.temp_path = MOCK_BKP_PATH
@@ -213,11 +462,11 @@ class OnsiteHandlerPrepareOffsiteOnsiteMainPathsTestCase(unittest.TestCase):
                                                 "not be created.")
 
     @mock.patch(MOCK_PACKAGE + 'create_path')
-    @mock.patch(MOCK_PACKAGE + 'check_remote_path_exists')
+    @mock.patch(MOCK_PACKAGE + 'create_and_list_remote_dir')
     def test_prepare_offsite_onsite_main_paths_create_customer_path_exception(self,
-                                                                              mock_check_remote,
+                                                                              mock_create_dir,
                                                                               mock_create_path):
-        mock_check_remote.return_value = True
+        mock_create_dir.return_value = True, []
         mock_create_path.side_effect = [True, False]
         self.onsite_handler.bkp_temp_folder = MOCK_BKP_PATH
 
@@ -228,13 +477,14 @@ class OnsiteHandlerPrepareOffsiteOnsiteMainPathsTestCase(unittest.TestCase):
                                                 "could not be created")
 
     @mock.patch(MOCK_PACKAGE + 'create_path')
-    @mock.patch(MOCK_PACKAGE + 'check_remote_path_exists')
-    def test_prepare_offsite_onsite_main_paths_success(self, mock_check_remote, mock_create_path):
-        mock_check_remote.return_value = True
+    @mock.patch(MOCK_PACKAGE + 'create_and_list_remote_dir')
+    def test_prepare_offsite_onsite_main_paths_success(self, mock_create_dir, mock_create_path):
+        mock_create_dir.return_value = True, [MOCK_BKP_TAG_ENCRYPTED]
         mock_create_path.return_value = True
         self.onsite_handler.bkp_temp_folder = MOCK_BKP_PATH
 
         self.assertTrue(self.onsite_handler.prepare_offsite_onsite_main_paths())
+        self.assertEqual(self.onsite_handler.offsite_backups_set, {MOCK_BKP_TAG_ENCRYPTED})
 
 
 class OnsiteHandlerBackupAlreadyOnOffsiteTestCase(unittest.TestCase):
@@ -258,8 +508,8 @@ class OnsiteHandlerBackupAlreadyOnOffsiteTestCase(unittest.TestCase):
         mock_os.path.join.return_value = MOCK_BKP_PATH
         mock_check_remote.return_value = True
 
-        calls = [mock.call("Offsite has a backup with the same name. The backup mock_bkp_tag will "
-                           "not be uploaded.")]
+        calls = [mock.call("Offsite has a backup with the same name. The backup %s will "
+                           "not be uploaded.", MOCK_BKP_TAG)]
 
         self.assertTrue(self.onsite_handler.backup_already_on_offsite(MOCK_BKP_TAG, MOCK_BKP_PATH,
                                                                       MOCK_HOST))
@@ -274,6 +524,17 @@ class OnsiteHandlerBackupAlreadyOnOffsiteTestCase(unittest.TestCase):
         self.assertFalse(self.onsite_handler.backup_already_on_offsite(MOCK_BKP_TAG, MOCK_BKP_PATH,
                                                                       MOCK_HOST))
 
+    @mock.patch(MOCK_PACKAGE + 'check_remote_path_exists')
+    def test_backup_already_on_offsite_cached_listing(self, mock_check_remote):
+        self.onsite_handler.remote_root_path = MOCK_BKP_PATH
+        self.onsite_handler.offsite_backups_set = {MOCK_BKP_TAG_ENCRYPTED}
+
+        self.assertTrue(self.onsite_handler.backup_already_on_offsite(MOCK_BKP_TAG, MOCK_BKP_PATH,
+                                                                      MOCK_HOST))
+        self.assertFalse(self.onsite_handler.backup_already_on_offsite(MOCK_BKP_PATH,
+                                                                       MOCK_BKP_PATH, MOCK_HOST))
+        self.assertFalse(mock_check_remote.called)
+
 
 class OnsiteHandlerCreateOnsiteOffsiteBackupPathTestCase(unittest.TestCase):
 
@@ -332,9 +593,8 @@ class OnsiteHandlerProcessBackupTestCase(unittest.TestCase):
     @mock.patch(MOCK_PACKAGE + 'compress_file')
     def test_process_backup_processing_exception(self, mock_compress_file):
         mock_compress_file.side_effect = Exception("Processing exception")
-        with mock.patch(MOCK_PACKAGE + 'mp'):
-            with self.assertRaises(Exception):
-                self.onsite_handler.process_backup(MOCK_BKP_PATH, MOCK_BKP_DESTINATION)
+        with self.assertRaises(Exception):
+            self.onsite_handler.process_backup(MOCK_BKP_PATH, MOCK_BKP_DESTINATION)
 
     @mock.patch('network_backup_offsite.gnupg_manager.GnupgManager.encrypt_file')
     @mock.patch(MOCK_PACKAGE + 'os')
@@ -346,19 +606,44 @@ class OnsiteHandlerProcessBackupTestCase(unittest.TestCase):
         mock_gnupg_manager.encrypt_file.return_value = MOCK_BKP_TAG_ENCRYPTED
         self.onsite_handler.gpg_manager = mock_gnupg_manager
 
-        calls = [mock.call("Archiving backup directory 'mock_bkp_path'."),
-                 mock.call("The backup 'mock_bkp_tag.tar' archived successfully."),
-                 mock.call("Encrypting the backup 'mock_bkp_tag.tar'."),
-                 mock.call("Backup 'mock_bkp_tag.tar.gpg' encrypted successfully.")]
+        calls = [mock.call("Archiving backup directory '%s'.", MOCK_BKP_PATH),
+                 mock.call("The backup '%s' archived successfully.", MOCK_BKP_TAG_COMPRESSED),
+                 mock.call("Encrypting the backup '%s'.", MOCK_BKP_TAG_COMPRESSED),
+                 mock.call("Backup '%s' encrypted successfully.", MOCK_BKP_TAG_ENCRYPTED)]
 
-        with mock.patch(MOCK_PACKAGE + 'mp'):
-            self.assertEqual(self.onsite_handler.process_backup(MOCK_BKP_PATH,
-                                                                MOCK_BKP_DESTINATION),
-                             MOCK_BKP_TAG_ENCRYPTED)
+        self.assertEqual(self.onsite_handler.process_backup(MOCK_BKP_PATH, MOCK_BKP_DESTINATION),
+                         MOCK_BKP_TAG_ENCRYPTED)
 
         self.onsite_handler.logger.info.assert_has_calls(calls)
 
 
+class OnsiteHandlerArchiveBackupListTestCase(unittest.TestCase):
+
+    @classmethod
+    def setUp(cls):
+        """Set up the test constants."""
+        cls.onsite_handler = create_onsite_object()
+        cls.onsite_handler.onsite_deployment_config = EnmConfig(MOCK_DEPLOYMENT_NAME,
+                                                                MOCK_BKP_DESTINATION,
+                                                                MOCK_ONSITE_RETENTION_VALUE)
+
+    @mock.patch(MOCK_PACKAGE + 'compress_file')
+    def test_archive_backup_list_exception(self, mock_compress_file):
+        mock_compress_file.side_effect = [Exception("Archiving exception"), 'bkp_2.tar']
+
+        self.assertEqual(self.onsite_handler.archive_backup_list(['bkp_1', 'bkp_2'], MOCK_BKP_PATH),
+                         {'bkp_2': 'bkp_2.tar'})
+
+        self.assertTrue(self.onsite_handler.logger.error.called)
+
+    @mock.patch(MOCK_PACKAGE + 'compress_file')
+    def test_archive_backup_list_success(self, mock_compress_file):
+        mock_compress_file.side_effect = lambda source_path, output_path, mode: source_path + '.tar'
+
+        self.assertEqual(self.onsite_handler.archive_backup_list(['bkp_1', 'bkp_2'], MOCK_BKP_PATH),
+                         {'bkp_1': 'mock_bkp_dest/bkp_1.tar', 'bkp_2': 'mock_bkp_dest/bkp_2.tar'})
+
+
 class OnsiteHandlerTransferBackupToOffsiteTestCase(unittest.TestCase):
 
     @classmethod
@@ -371,8 +656,8 @@ class OnsiteHandlerTransferBackupToOffsiteTestCase(unittest.TestCase):
         self.onsite_handler.offsite_config.host = MOCK_HOST
         mock_rsync_manager.transfer_file.side_effect = Exception("Transfer exception")
 
-        calls = [mock.call("Error while transferring backup mock_bkp_tag to offsite, "
-                           "Cause: Transfer exception")]
+        calls = [mock.call("Error while transferring backup %s to offsite, Cause: %s",
+                           MOCK_BKP_TAG, "Transfer exception")]
 
         self.assertFalse(self.onsite_handler.transfer_backup_to_offsite(MOCK_BKP_TAG,
                                                                         MOCK_BKP_PATH,
@@ -384,8 +669,10 @@ class OnsiteHandlerTransferBackupToOffsiteTestCase(unittest.TestCase):
         self.onsite_handler.offsite_config.host = MOCK_HOST
         mock_rsync_manager.transfer_file.return_value = ""
 
-        calls = [mock.call("Transferring backup 'mock_bkp_path' to 'root@127.0.0.1:mock_bkp_dest'"),
-                 mock.call("The backup 'mock_bkp_path' was successfully transferred to offsite.")]
+        calls = [mock.call("Transferring backup '%s' to '%s'", MOCK_BKP_PATH,
+                           MOCK_BKP_DESTINATION),
+                 mock.call("The backup '%s' was successfully transferred to offsite.",
+                           MOCK_BKP_PATH)]
 
         self.assertTrue(self.onsite_handler.transfer_backup_to_offsite(MOCK_BKP_TAG,
                                                                        MOCK_BKP_PATH,
@@ -393,6 +680,43 @@ class OnsiteHandlerTransferBackupToOffsiteTestCase(unittest.TestCase):
         self.onsite_handler.logger.info.assert_has_calls(calls)
 
 
+class OnsiteHandlerProcessAndTransferStreamTestCase(unittest.TestCase):
+
+    @classmethod
+    def setUp(cls):
+        """Set up the test constants."""
+        cls.onsite_handler = create_onsite_object()
+        cls.onsite_handler.onsite_deployment_config = EnmConfig(MOCK_DEPLOYMENT_NAME,
+                                                                MOCK_BKP_DESTINATION,
+                                                                MOCK_ONSITE_RETENTION_VALUE)
+
+    @mock.patch(MOCK_PACKAGE + 'AzCopyManager')
+    @mock.patch(MOCK_PACKAGE + 'Popen')
+    def test_process_and_transfer_stream_tar_exception(self, mock_popen, mock_azcopy_manager):
+        mock_popen.return_value.wait.side_effect = [0, 2]
+
+        with self.assertRaises(Exception) as cex:
+            self.onsite_handler.process_and_transfer_stream(MOCK_BKP_TAG, MOCK_BKP_PATH)
+
+        self.assertEqual(cex.exception.message, "Tar command returned error code 2 while "
+                                                "streaming backup 'mock_bkp_dest/mock_bkp_tag'.")
+        self.assertTrue(mock_azcopy_manager.transfer_stream.called)
+
+    @mock.patch(MOCK_PACKAGE + 'AzCopyManager')
+    @mock.patch(MOCK_PACKAGE + 'Popen')
+    def test_process_and_transfer_stream_success(self, mock_popen, mock_azcopy_manager):
+        mock_popen.return_value.wait.return_value = 0
+
+        self.assertTrue(self.onsite_handler.process_and_transfer_stream(MOCK_BKP_TAG,
+                                                                        MOCK_BKP_PATH))
+
+        mock_azcopy_manager.transfer_stream.assert_called_once_with(
+            mock_popen.return_value.stdout, MOCK_BKP_PATH, MOCK_BKP_TAG_ENCRYPTED,
+            self.onsite_handler.offsite_config.azcopy_block_size_mb,
+            self.onsite_handler.offsite_config.azcopy_cap_mbps,
+            self.onsite_handler.offsite_config.azcopy_concurrency)
+
+
 class OnsiteHandlerDeleteTmpBkpFolderTestCase(unittest.TestCase):
 
     @classmethod
@@ -434,21 +758,24 @@ class OnsiteHandlerPerformOnsiteRetentionTestCase(unittest.TestCase):
     def test_perform_onsite_retention_no_remove_list(self, mock_get_cleanup_list):
         mock_get_cleanup_list.return_value = []
 
-        result, message, result_list = self.onsite_handler.perform_onsite_retention(0)
+        result, message, result_list = self.onsite_handler.perform_onsite_retention(
+            0, MOCK_BKP_DESTINATION)
 
         self.assertTrue(result)
         self.assertEqual(message, "Onsite clean up finished successfully with no backups removed.")
         self.assertEqual(result_list, [])
 
-    @mock.patch(MOCK_PACKAGE + 'get_values_from_dict')
+    @mock.patch(MOCK_PACKAGE + 'remove_path')
     @mock.patch(MOCK_PACKAGE + 'OnsiteHandler.get_onsite_backup_dirs_list_to_cleanup')
     def test_perform_onsite_retention_cleanup_exception(self, mock_get_cleanup_list,
-                                                     mock_get_values):
+                                                        mock_remove_path):
         mock_get_cleanup_list.return_value = [MOCK_BKP_PATH]
-        mock_get_values.side_effect = Exception("Retention exception")
-        self.onsite_handler.onsite_deployment_config = EnmConfig(MOCK_BKP_TAG, MOCK_BKP_PATH)
+        mock_remove_path.side_effect = Exception("Retention exception")
+        self.onsite_handler.onsite_deployment_config = EnmConfig(MOCK_BKP_TAG, MOCK_BKP_PATH,
+                                                                 MOCK_ONSITE_RETENTION_VALUE)
 
-        result, message, result_list = self.onsite_handler.perform_onsite_retention(0)
+        result, message, result_list = self.onsite_handler.perform_onsite_retention(
+            0, MOCK_BKP_DESTINATION)
 
         self.assertFalse(result)
         self.assertEqual(message, "Retention exception")
@@ -456,41 +783,40 @@ class OnsiteHandlerPerformOnsiteRetentionTestCase(unittest.TestCase):
 
     @mock.patch(MOCK_PACKAGE + 'remove_path')
     @mock.patch(MOCK_PACKAGE + 'os')
-    @mock.patch(MOCK_PACKAGE + 'get_values_from_dict')
     @mock.patch(MOCK_PACKAGE + 'OnsiteHandler.get_onsite_backup_dirs_list_to_cleanup')
-    def test_perform_onsite_retention_directory_not_removed(self, mock_get_cleanup_list,
-                                                            mock_get_values, mock_os,
+    def test_perform_onsite_retention_directory_not_removed(self, mock_get_cleanup_list, mock_os,
                                                             mock_remove_path):
         mock_get_cleanup_list.return_value = [MOCK_BKP_PATH]
-        mock_get_values.return_value = [EnmConfig(MOCK_BKP_TAG, MOCK_BKP_PATH)]
         mock_os.path.join.return_value = MOCK_BKP_PATH
         mock_remove_path.return_value = False
 
-        result, message, result_list = self.onsite_handler.perform_onsite_retention(0)
+        result, message, result_list = self.onsite_handler.perform_onsite_retention(
+            0, MOCK_BKP_DESTINATION)
 
         self.assertFalse(result)
         self.assertEqual(message, "Following backups were not removed: ['mock_bkp_path']")
         self.assertEqual(result_list, [])
 
+    @mock.patch(MOCK_PACKAGE + 'OnsiteHandler.remove_from_uploaded_backups_manifest')
     @mock.patch(MOCK_PACKAGE + 'remove_path')
     @mock.patch(MOCK_PACKAGE + 'os')
-    @mock.patch(MOCK_PACKAGE + 'get_values_from_dict')
     @mock.patch(MOCK_PACKAGE + 'OnsiteHandler.get_onsite_backup_dirs_list_to_cleanup')
-    def test_perform_onsite_retention_success(self, mock_get_cleanup_list,mock_get_values,
-                                              mock_os, mock_remove_path):
+    def test_perform_onsite_retention_success(self, mock_get_cleanup_list, mock_os,
+                                              mock_remove_path, mock_remove_from_manifest):
         mock_get_cleanup_list.return_value = [MOCK_BKP_PATH]
-        mock_get_values.return_value = [EnmConfig(MOCK_BKP_TAG, MOCK_BKP_PATH)]
         mock_os.path.join.return_value = MOCK_BKP_PATH
         mock_remove_path.return_value = True
 
         calls = [mock.call("Performing clean up on onsite.")]
 
-        result, message, result_list = self.onsite_handler.perform_onsite_retention(0)
+        result, message, result_list = self.onsite_handler.perform_onsite_retention(
+            0, MOCK_BKP_DESTINATION)
 
         self.assertTrue(result)
         self.assertEqual(message, "Onsite backups clean up finished successfully, removed "
                                   "backups: ")
         self.assertEqual(result_list, [MOCK_BKP_PATH])
+        mock_remove_from_manifest.assert_called_once_with([MOCK_BKP_PATH])
 
         self.onsite_handler.logger.log_info.assert_has_calls(calls)
 
@@ -502,32 +828,32 @@ class OnsiteHandlerGetOnsiteBackupDirsListToCleanupTestCase(unittest.TestCase):
         """Set up the test constants."""
         cls.onsite_handler = create_onsite_object()
 
-    @mock.patch(MOCK_PACKAGE + 'os')
-    @mock.patch('__builtin__.next')
-    @mock.patch(MOCK_PACKAGE + 'get_values_from_dict')
-    def test_get_onsite_backup_dirs_list_to_cleanup_warning(self, mock_get_values, mock_next,
-                                                            mock_os):
-        mock_get_values.return_value = [EnmConfig(MOCK_BKP_TAG, MOCK_BKP_PATH)]
-        mock_next.return_value = MOCK_BKP_DESTINATION, [MOCK_BKP_TAG_ENCRYPTED], MOCK_BKP_TAG
-        mock_os.path.join.return_value = MOCK_BKP_PATH
+    @mock.patch(MOCK_PACKAGE + 'scandir')
+    def test_get_onsite_backup_dirs_list_to_cleanup_warning(self, mock_scandir):
+        mock_scandir.return_value = [create_dir_entry(MOCK_BKP_TAG_ENCRYPTED)]
 
-        calls = [mock.call("1 backup(s) found onsite. Retention is 2. Nothing to do.")]
+        calls = [mock.call("%s Nothing to do.", "1 backup(s) found onsite. Retention is 2.")]
 
-        self.assertEqual(self.onsite_handler.get_onsite_backup_dirs_list_to_cleanup(2), [])
+        self.assertEqual(self.onsite_handler.get_onsite_backup_dirs_list_to_cleanup(
+            2, MOCK_BKP_PATH), [])
 
         self.onsite_handler.logger.warning.assert_has_calls(calls)
 
-    @mock.patch(MOCK_PACKAGE + 'os')
-    @mock.patch('__builtin__.next')
-    @mock.patch(MOCK_PACKAGE + 'get_values_from_dict')
-    def test_get_onsite_backup_dirs_list_to_cleanup_success(self, mock_get_values, mock_next,
-                                                            mock_os):
-        mock_get_values.return_value = [EnmConfig(MOCK_BKP_TAG, MOCK_BKP_PATH,
-                                                  MOCK_ONSITE_RETENTION_VALUE)]
-        mock_next.return_value = MOCK_BKP_DESTINATION, [MOCK_BKP_TAG_ENCRYPTED], MOCK_BKP_TAG
-        mock_os.path.join.return_value = MOCK_BKP_PATH
+    @mock.patch(MOCK_PACKAGE + 'scandir')
+    def test_get_onsite_backup_dirs_list_to_cleanup_remove_oldest(self, mock_scandir):
+        mock_scandir.return_value = [create_dir_entry('bkp_old', 10),
+                                     create_dir_entry('bkp_new', 40),
+                                     create_dir_entry('bkp_older', 5),
+                                     create_dir_entry('bkp_mid', 20)]
+
+        self.assertEqual(self.onsite_handler.get_onsite_backup_dirs_list_to_cleanup(
+            2, MOCK_BKP_PATH), ['bkp_older', 'bkp_old'])
+
+    @mock.patch(MOCK_PACKAGE + 'scandir')
+    def test_get_onsite_backup_dirs_list_to_cleanup_success(self, mock_scandir):
+        mock_scandir.return_value = [create_dir_entry(MOCK_BKP_TAG_ENCRYPTED)]
 
-        calls = [mock.call("Checking the path 'mock_bkp_path' to prepare onsite cleanup.")]
+        calls = [mock.call("Checking the path '%s' to prepare onsite cleanup.", MOCK_BKP_PATH)]
 
         self.assertEqual([], self.onsite_handler.get_onsite_backup_dirs_list_to_cleanup(
             MOCK_ONSITE_RETENTION_VALUE, MOCK_BKP_PATH))
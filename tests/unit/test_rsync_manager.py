@@ -12,23 +12,33 @@
 # pylint: disable=C0103,E0401
 
 """This is unit test module for the backup.rsync_manager script."""
+import os
+import shutil
+from StringIO import StringIO
+import tempfile
 import unittest
 
-from network_backup_offsite.rsync_manager import RsyncManager, RsyncOutput
+try:
+    import subprocess32 as subprocess
+except ImportError:
+    import subprocess
+
+from network_backup_offsite.rsync_manager import RSYNC_SSH_CMD, RSYNC_SSH_OWN_CONNECTION_CMD, \
+    RsyncManager, RsyncOutput
 
 import mock
 
 MOCK_PACKAGE = 'network_backup_offsite.rsync_manager'
 
 MOCK_NUMBER_FILES = MOCK_PACKAGE + '.RsyncManager.get_number_of_files_to_send'
-MOCK_PARSE_OUTPUT = MOCK_PACKAGE + '.RsyncManager.parse_output'
+MOCK_RUN_RSYNC = MOCK_PACKAGE + '.RsyncManager.run_rsync'
 MOCK_SEND = MOCK_PACKAGE + '.RsyncManager.send'
 MOCK_RECEIVE = MOCK_PACKAGE + '.RsyncManager.receive'
 
 MOCK_PATH = MOCK_PACKAGE + '.os.path'
-MOCK_LIST_DIR = MOCK_PACKAGE + '.os.listdir'
-MOCK_SUBPROCESS_CHECK_OUTPUT = MOCK_PACKAGE + '.subprocess.check_output'
-MOCK_CHECK_REMOTE_PATH_EXISTS = MOCK_PACKAGE + '.check_remote_path_exists'
+MOCK_SLEEP = MOCK_PACKAGE + '.time.sleep'
+MOCK_SCANDIR = MOCK_PACKAGE + '.scandir'
+MOCK_SUBPROCESS_POPEN = MOCK_PACKAGE + '.subprocess.Popen'
 
 FAKE_TRIES = 1
 FAKE_PATH = 'fake/path'
@@ -37,6 +47,25 @@ FAKE_SOURCE = 'fake_source_path'
 FAKE_TARGET = 'fake_target_path'
 FAKE_FULL_HOST_SOURCE_PATH = "{}:{}".format(FAKE_HOST, FAKE_SOURCE)
 
+
+def create_dir_entry(is_dir=False):
+    """Function to create a mocked directory entry as returned by scandir."""
+    dir_entry = mock.MagicMock()
+    dir_entry.is_dir.return_value = is_dir
+
+    return dir_entry
+
+
+def create_rsync_process(output, returncode=0, error_output=''):
+    """Function to create a mocked rsync process as returned by subprocess.Popen."""
+    rsync_process = mock.MagicMock()
+    rsync_process.stdout = StringIO(output)
+    rsync_process.stderr = StringIO(error_output)
+    rsync_process.wait.return_value = returncode
+    rsync_process.returncode = returncode
+
+    return rsync_process
+
 RSYNC_OUTPUT = "Number of files: 2 (reg: 1, dir: 1)\n" \
                "Number of created files: 1\n" \
                "Number of deleted files: 2\n" \
@@ -72,24 +101,26 @@ class RsyncManagerGetNumberOfFilesToSendTestCase(unittest.TestCase):
         """Set up the test constants."""
         self.rsync = RsyncManager(FAKE_SOURCE, FAKE_TARGET, FAKE_TRIES)
 
-    @mock.patch(MOCK_LIST_DIR)
+    @mock.patch(MOCK_SCANDIR)
     @mock.patch(MOCK_PATH + '.isdir')
     @mock.patch(MOCK_PATH + '.exists')
     def test_get_number_of_files_to_send_source_path_is_folder(self, mock_path_exists,
-                                                               mock_path_isdir, mock_list_dir):
+                                                               mock_path_isdir, mock_scandir):
         """
-        Test when the source path is a folder with 3 files.
+        Test when the source path is a folder with 3 files and a sub folder.
         :param mock_path_exists: mocking the os.path.exists method.
         :param mock_path_isdir: mocking the os.path.isdir method.
-        :param mock_list_dir: mocking the os.listdir method.
+        :param mock_scandir: mocking the scandir method.
         """
         mock_path_exists.return_value = True
-        mock_path_isdir.side_effect = [True, False, False, False]
-        mock_list_dir.return_value = ['file0', 'file1', 'file2']
+        mock_path_isdir.return_value = True
+        mock_scandir.return_value = [create_dir_entry(), create_dir_entry(is_dir=True),
+                                     create_dir_entry(), create_dir_entry()]
 
         n_files = self.rsync.get_number_of_files_to_send()
 
         self.assertEquals(n_files, 3, "Should have returned 3 files.")
+        mock_scandir.return_value[1].is_dir.assert_called_once_with(follow_symlinks=False)
 
     @mock.patch(MOCK_PATH + '.isdir')
     @mock.patch(MOCK_PATH + '.exists')
@@ -138,18 +169,18 @@ class RsyncManagerGetNumberOfFilesToSendNoFilesExceptionTestCase(unittest.TestCa
                                  'remote location.'
 
     @mock.patch(MOCK_PATH)
-    @mock.patch(MOCK_LIST_DIR)
-    def test_get_number_of_files_to_send_no_files(self, mock_listdir, mock_path):
+    @mock.patch(MOCK_SCANDIR)
+    def test_get_number_of_files_to_send_no_files(self, mock_scandir, mock_path):
         """
         Asserts if an Exception with the expected message is raised when there is no file within
         the folder.
-        :param mock_listdir: mocking the os.listdir method.
+        :param mock_scandir: mocking the scandir method.
         :param mock_path: mocking the os.path to make the fake path valid.
         """
         mock_path.exists.return_value = True
         mock_path.isdir.return_value = True
 
-        mock_listdir.return_value = []
+        mock_scandir.return_value = []
 
         with self.assertRaises(Exception) as cex:
             self.rsync.get_number_of_files_to_send()
@@ -157,75 +188,72 @@ class RsyncManagerGetNumberOfFilesToSendNoFilesExceptionTestCase(unittest.TestCa
         self.assertEqual(cex.exception.message, self.exception_message)
 
 
-class RsyncManagerParseNumberOfFileKeyValueTestCase(unittest.TestCase):
-    """
-    These are scenarios when a line from the output result is read and parsed correctly,
-    returning a tuple with the key and its value.
-    """
+class RsyncManagerGetFilePartitionsTestCase(unittest.TestCase):
+    """These are scenarios when the source files are split into partitions."""
 
     def setUp(self):
         """Set up the test constants."""
-        self.total_files_tuple = 'total_files', '2'
-        self.created_tuple = 'created', '1'
-        self.deleted_tuple = 'deleted', '2'
-        self.transferred_tuple = 'transferred', '1'
-
-    def test_parse_number_of_file_key_value_total_files(self):
-        """Asserts if the 'total files line' output is read and parsed."""
-        line_output = RSYNC_OUTPUT.lower().split('\n')[0]
-        result = RsyncManager.parse_number_of_file_key_value(line_output)
-        self.assertEqual(result, self.total_files_tuple)
-
-    def test_parse_number_of_file_key_value_created(self):
-        """Asserts if the 'created line' output is read and parsed."""
-        line_output = RSYNC_OUTPUT.lower().split('\n')[1]
-        result = RsyncManager.parse_number_of_file_key_value(line_output)
-        self.assertEqual(result, self.created_tuple)
-
-    def test_parse_number_of_file_key_value_deleted(self):
-        """Asserts if the 'deleted line' output is read and parsed."""
-        line_output = RSYNC_OUTPUT.lower().split('\n')[2]
-        result = RsyncManager.parse_number_of_file_key_value(line_output)
-        self.assertEqual(result, self.deleted_tuple)
-
-    def test_parse_number_of_file_key_value_transferred(self):
-        """Asserts if the 'transferred line' output is read and parsed."""
-        line_output = RSYNC_OUTPUT.lower().split('\n')[3]
-        result = RsyncManager.parse_number_of_file_key_value(line_output)
-        self.assertEqual(result, self.transferred_tuple)
-
-
-class RsyncManagerParseNumberOfFileKeyValueExceptionTestCase(unittest.TestCase):
-    """
-    These are scenarios when an invalid line (doesn't have the 'number of' or a valid value) from
-    output is not parsed and exceptions are raised.
-    """
+        self.test_dir = tempfile.mkdtemp()
+        self.source_path = os.path.join(self.test_dir, FAKE_SOURCE)
 
-    def test_parse_number_of_file_key_value_no_number(self):
-        """
-        Asserts if an Exception with the correct message is raised when the line doesn't have
-        the 'number of' string on it.
-        """
-        line_output = RSYNC_OUTPUT.lower().split('\n')[4]
-        exception_message = "Line '" + line_output + "' does not contain a number of measurement."
+        os.makedirs(os.path.join(self.source_path, 'sub_dir'))
+        for file_name in ['file0', 'file1', os.path.join('sub_dir', 'file2')]:
+            with open(os.path.join(self.source_path, file_name), 'w') as source_file:
+                source_file.write('1234')
 
-        with self.assertRaises(Exception) as cex:
-            RsyncManager.parse_number_of_file_key_value(line_output)
+        self.rsync = RsyncManager(self.source_path, FAKE_TARGET, FAKE_TRIES)
 
-        self.assertEqual(cex.exception.message, exception_message)
+    def tearDown(self):
+        """Remove the test directory."""
+        shutil.rmtree(self.test_dir)
 
-    def test_parse_number_of_file_key_value_no_value(self):
-        """
-        Asserts if the correct exception with the correct message is raised when the line does
-        have the 'number of' string on it, but doesn't a valid value following it.
-        """
-        line_output = "Number of regular files transferred"
-        exception_message = "Could not parse rsync output line: " + line_output.lower() + "."
+    def test_get_file_partitions_source_path_is_file(self):
+        """Asserts if no partition is returned when the source path is not a folder."""
+        self.rsync.source_path = os.path.join(self.source_path, 'file0')
 
-        with self.assertRaises(Exception) as cex:
-            RsyncManager.parse_number_of_file_key_value(line_output.lower())
+        self.assertEqual(self.rsync.get_file_partitions(), [])
+
+    def test_get_file_partitions_smaller_than_chunk(self):
+        """Asserts if no partition is returned when the files are smaller than the chunk."""
+        self.assertEqual(self.rsync.get_file_partitions(), [])
 
-        self.assertEqual(cex.exception.message, exception_message)
+    def test_get_file_partitions_by_chunk_bytes(self):
+        """Asserts if the files are split when they add up to more than the chunk size."""
+        file_partitions = self.rsync.get_file_partitions(chunk_bytes=8)
+
+        self.assertEqual([len(file_partition) for file_partition in file_partitions], [2, 1])
+
+    def test_get_file_partitions_links_and_empty_dirs(self):
+        """Asserts if dangling links and empty folders are listed without following links."""
+        os.symlink(os.path.join(self.test_dir, 'missing'),
+                   os.path.join(self.source_path, 'dangling_link'))
+        os.mkdir(os.path.join(self.source_path, 'empty_dir'))
+
+        file_partitions = self.rsync.get_file_partitions(chunk_bytes=8)
+
+        partition_entries = sum(file_partitions, [])
+        self.assertIn(os.path.join(FAKE_SOURCE, 'dangling_link'), partition_entries)
+        self.assertIn(os.path.join(FAKE_SOURCE, 'empty_dir'), partition_entries)
+
+    def test_is_source_larger_than(self):
+        """Asserts if the size of the source files is compared with the informed size."""
+        self.assertTrue(self.rsync.is_source_larger_than(11))
+        self.assertFalse(self.rsync.is_source_larger_than(12))
+
+
+class RsyncOutputMergeTestCase(unittest.TestCase):
+    """This is a scenario when the outputs of concurrent rsync commands are merged."""
+
+    def test_merge(self):
+        """Asserts if counters and rates are added up and the speedup is averaged."""
+        rsync_output = RsyncManager.parse_output(RSYNC_OUTPUT)
+
+        result = RsyncOutput.merge([rsync_output, rsync_output])
+
+        self.assertEqual(result.n_files, '4')
+        self.assertEqual(result.n_transferred_files, '2')
+        self.assertEqual(result.rate, '149.34')
+        self.assertEqual(result.speedup, '0.00')
 
 
 class RsyncManagerParseOutputValidateDictionaryTestCase(unittest.TestCase):
@@ -310,6 +338,102 @@ class RsyncManagerParseOutputEmptyExceptionTestCase(unittest.TestCase):
         self.assertEqual(cex.exception.message, self.exception_message)
 
 
+class RsyncManagerGetRsyncArgsTestCase(unittest.TestCase):
+    """These are scenarios when the rsync arguments are built."""
+
+    def test_get_rsync_args_ssh(self):
+        """Asserts if the ssh arguments are used by default."""
+        self.assertEqual(RsyncManager(FAKE_SOURCE, FAKE_TARGET).get_rsync_args(),
+                         ['-a', '-h', '-e', RSYNC_SSH_CMD, '--stats', '--info=stats2,name0'])
+
+    def test_get_rsync_args_ssh_own_connection(self):
+        """Asserts if ssh does not share the master connection when it is not allowed to."""
+        rsync_args = RsyncManager(FAKE_SOURCE, FAKE_TARGET).get_rsync_args(shared_connection=False)
+
+        self.assertEqual(rsync_args[:4], ['-a', '-h', '-e', RSYNC_SSH_OWN_CONNECTION_CMD])
+        self.assertIn('ControlPath=none', RSYNC_SSH_OWN_CONNECTION_CMD)
+
+    @mock.patch(MOCK_RUN_RSYNC)
+    def test_send_partition_own_connection(self, mock_run_rsync):
+        """Asserts if each partition is sent through its own ssh connection."""
+        RsyncManager(FAKE_SOURCE, FAKE_TARGET).send_partition([FAKE_SOURCE])
+
+        self.assertIn(RSYNC_SSH_OWN_CONNECTION_CMD, mock_run_rsync.call_args[0][0])
+        self.assertNotIn(RSYNC_SSH_CMD, mock_run_rsync.call_args[0][0])
+
+    def test_get_rsync_args_daemon_whole_file(self):
+        """Asserts if the whole file argument is added to the daemon arguments."""
+        rsync = RsyncManager(FAKE_SOURCE, FAKE_TARGET, rsync_ssh=False, whole_file=True)
+
+        self.assertEqual(rsync.get_rsync_args(), ['-a', '-h', '--stats', '--info=stats2,name0',
+                                                  '-W'])
+
+    def test_get_rsync_args_checksum(self):
+        """Asserts if files are compared by checksum only when checksum is set."""
+        rsync = RsyncManager(FAKE_SOURCE, FAKE_TARGET, rsync_ssh=False)
+        self.assertNotIn('-c', rsync.get_rsync_args())
+
+        rsync.checksum = True
+        self.assertIn('-c', rsync.get_rsync_args())
+
+    def test_get_rsync_args_compression(self):
+        """Asserts if the compression algorithm is passed to rsync."""
+        rsync = RsyncManager(FAKE_SOURCE, FAKE_TARGET, compression='zstd')
+
+        self.assertEqual(rsync.get_rsync_args(), ['-a', '-h', '-e', RSYNC_SSH_CMD,
+                                                  '--stats', '--info=stats2,name0',
+                                                  '--compress', '--compress-choice=zstd'])
+
+
+class RsyncManagerGetRsyncCommandTestCase(unittest.TestCase):
+    """These are scenarios when the rsync command is built for sending and receiving."""
+
+    def setUp(self):
+        """Set up the test constants."""
+        self.rsync = RsyncManager(FAKE_SOURCE, FAKE_FULL_HOST_SOURCE_PATH, rsync_ssh=False)
+
+    def test_get_rsync_command_send_daemon(self):
+        """Asserts if the destination points to the rsync daemon when sending."""
+        rsync_command = self.rsync.get_rsync_command([FAKE_SOURCE], FAKE_FULL_HOST_SOURCE_PATH)
+
+        self.assertEqual(rsync_command[-2:],
+                         [FAKE_SOURCE, 'rsync://fake_host@fake_ip/rsyncdfake_source_path'])
+        self.assertIn('--inplace', rsync_command)
+
+    def test_get_rsync_command_receive_daemon(self):
+        """Asserts if the source points to the rsync daemon when receiving."""
+        rsync_command = self.rsync.get_rsync_command([FAKE_FULL_HOST_SOURCE_PATH], FAKE_TARGET,
+                                                     send=False)
+
+        self.assertEqual(rsync_command[-2:], ['rsync://fake_host@fake_ip/rsyncdfake_source_path',
+                                              FAKE_TARGET])
+        self.assertNotIn('--inplace', rsync_command)
+
+
+class RsyncManagerRunRsyncTestCase(unittest.TestCase):
+    """These are scenarios when the output of a rsync process is parsed while it runs."""
+
+    @mock.patch(MOCK_SUBPROCESS_POPEN)
+    def test_run_rsync(self, mock_popen):
+        """Asserts if the rsync output is parsed line by line."""
+        mock_popen.return_value = create_rsync_process(RSYNC_OUTPUT)
+
+        result = RsyncManager.run_rsync(['rsync', FAKE_SOURCE, FAKE_TARGET])
+
+        self.assertEqual(str(result), str(RsyncManager.parse_output(RSYNC_OUTPUT)))
+
+    @mock.patch(MOCK_SUBPROCESS_POPEN)
+    def test_run_rsync_error_code(self, mock_popen):
+        """Asserts if CalledProcessError is raised with the error output of rsync."""
+        mock_popen.return_value = create_rsync_process('', 23, 'rsync error')
+
+        with self.assertRaises(subprocess.CalledProcessError) as cex:
+            RsyncManager.run_rsync(['rsync', FAKE_SOURCE, FAKE_TARGET])
+
+        self.assertEqual(cex.exception.returncode, 23)
+        self.assertEqual(cex.exception.output, 'rsync error')
+
+
 class RsyncManagerReceiveTestCase(unittest.TestCase):
     """This is a scenario when a rsync process receives files successfully from remote to local."""
 
@@ -325,18 +449,14 @@ class RsyncManagerReceiveTestCase(unittest.TestCase):
                             'speedup': '0.00'}
         self.rsync_output = RsyncOutput(self.summary_dic)
 
-    @mock.patch(MOCK_CHECK_REMOTE_PATH_EXISTS)
-    @mock.patch(MOCK_SUBPROCESS_CHECK_OUTPUT)
-    def test_receive(self, mock_check_output, mock_check_remote_path_exists):
+    @mock.patch(MOCK_SUBPROCESS_POPEN)
+    def test_receive(self, mock_popen):
         """
         Asserts if the receive process was successful and returned the rsync output correctly.
 
-        :param mock_check_output: mocking a valid result from subprocess.check_output.
-        :param mock_check_remote_path_exists: mocking a valid result from
-        utils.mock_check_remote_path_exists.
+        :param mock_popen: mocking a valid rsync process from subprocess.Popen.
         """
-        mock_check_remote_path_exists.return_value = True
-        mock_check_output.return_value = RSYNC_OUTPUT
+        mock_popen.return_value = create_rsync_process(RSYNC_OUTPUT)
 
         result = self.rsync.receive()
         self.assertEqual(str(result), str(self.rsync_output))
@@ -353,17 +473,11 @@ class RsyncManagerReceiveCalledProcessErrorTestCase(unittest.TestCase):
         self.rsync = RsyncManager(FAKE_FULL_HOST_SOURCE_PATH, FAKE_TARGET, FAKE_TRIES)
         self.exception_message = "Error code"
 
-    @mock.patch(MOCK_CHECK_REMOTE_PATH_EXISTS)
-    def test_receive(self, mock_check_remote_path_exists):
+    def test_receive(self):
         """
         Asserts if the exception with the correct message is raised when the
         CalledProcessError exception is caught.
-
-        :param mock_check_remote_path_exists: mocking a valid result from
-        utils.mock_check_remote_path_exists.
         """
-        mock_check_remote_path_exists.return_value = True
-
         with self.assertRaises(Exception) as cex:
             self.rsync.receive()
 
@@ -389,30 +503,30 @@ class RsyncManagerReceiveExceptionTestCase(unittest.TestCase):
         self.assertRegexpMatches(cex.exception.message, "Invalid source path '{}'.".format(
             FAKE_SOURCE))
 
-    @mock.patch(MOCK_CHECK_REMOTE_PATH_EXISTS)
-    def test_receive_remote_path_does_not_exist(self, mock_check_remote_path_exists):
+    @mock.patch(MOCK_SUBPROCESS_POPEN)
+    def test_receive_remote_path_does_not_exist(self, mock_popen):
         """
         Test when the remote path does not exist.
 
-        :param mock_check_remote_path_exists: mocking a valid output for the
-        utils.check_remote_path_exists method.
+        :param mock_popen: mocking a rsync process that reports the missing remote file.
         """
         self.rsync.source_path = "fake:remote_path"
-        mock_check_remote_path_exists.return_value = False
+        mock_popen.return_value = create_rsync_process(
+            '', 23, 'rsync: link_stat "remote_path" failed: No such file or directory (2)')
 
         with self.assertRaises(Exception) as cex:
             self.rsync.receive()
 
         self.assertRegexpMatches(cex.exception.message, "Remote file 'remote_path' does not exist.")
 
-    @mock.patch(MOCK_SUBPROCESS_CHECK_OUTPUT)
-    def test_receive(self, mock_check_output):
+    @mock.patch(MOCK_SUBPROCESS_POPEN)
+    def test_receive(self, mock_popen):
         """
         Asserts if the Exception raised has the custom message.
 
-        :param mock_check_output: mocking a valid output for the subprocess.check_output method.
+        :param mock_popen: mocking an error for the subprocess.Popen method.
         """
-        mock_check_output.side_effect = Exception
+        mock_popen.side_effect = Exception
 
         with self.assertRaises(Exception) as cex:
             self.rsync.receive()
@@ -435,21 +549,58 @@ class RsyncManagerSendTestCase(unittest.TestCase):
                             'speedup': '0.00'}
         self.rsync_output = RsyncOutput(self.summary_dic)
 
-    @mock.patch(MOCK_SUBPROCESS_CHECK_OUTPUT)
+    @mock.patch(MOCK_SUBPROCESS_POPEN)
     @mock.patch(MOCK_NUMBER_FILES)
-    def test_send(self, mock_number_files, mock_check_output):
+    def test_send(self, mock_number_files, mock_popen):
         """
         Asserts if the rsync_output is returned correctly.
 
         :param mock_number_files: mocking the number of files that should be transferred.
-        :param mock_check_output: mocking a valid subprocess.check_output return.
+        :param mock_popen: mocking a valid rsync process from subprocess.Popen.
         """
-        mock_check_output.return_value = RSYNC_OUTPUT
+        mock_popen.return_value = create_rsync_process(RSYNC_OUTPUT)
         mock_number_files.return_value = 1
 
         result = self.rsync.send()
         self.assertEqual(str(result), str(self.rsync_output))
 
+    @mock.patch(MOCK_SUBPROCESS_POPEN)
+    @mock.patch(MOCK_NUMBER_FILES)
+    def test_send_already_synchronized(self, mock_number_files, mock_popen):
+        """
+        Asserts if the rsync_output is returned when rsync had fewer files to transfer.
+
+        :param mock_number_files: mocking the number of files that should be transferred.
+        :param mock_popen: mocking a valid rsync process from subprocess.Popen.
+        """
+        mock_popen.return_value = create_rsync_process(RSYNC_OUTPUT)
+        mock_number_files.return_value = 7
+
+        result = self.rsync.send()
+        self.assertEqual(str(result), str(self.rsync_output))
+        self.assertEqual(mock_popen.call_count, 1)
+
+    @mock.patch(MOCK_SUBPROCESS_POPEN)
+    @mock.patch(MOCK_NUMBER_FILES)
+    def test_send_inplace(self, mock_number_files, mock_popen):
+        """
+        Asserts if the remote files are updated in place only when inplace is set.
+
+        :param mock_number_files: mocking the number of files that should be transferred.
+        :param mock_popen: mocking a valid rsync process from subprocess.Popen.
+        """
+        mock_popen.return_value = create_rsync_process(RSYNC_OUTPUT)
+        mock_number_files.return_value = 1
+
+        self.rsync.send()
+        self.assertIn('--inplace', mock_popen.call_args[0][0])
+
+        mock_popen.return_value = create_rsync_process(RSYNC_OUTPUT)
+        self.rsync.inplace = False
+
+        self.rsync.send()
+        self.assertNotIn('--inplace', mock_popen.call_args[0][0])
+
 
 class RsyncManagerSendNotRsyncOutputExceptionTestCase(unittest.TestCase):
     """
@@ -464,19 +615,16 @@ class RsyncManagerSendNotRsyncOutputExceptionTestCase(unittest.TestCase):
         self.exception_message = "Error while sending file '{}'. Can't parse the output from " \
                                  "rsync command.".format(FAKE_SOURCE)
 
-    @mock.patch(MOCK_PARSE_OUTPUT)
     @mock.patch(MOCK_NUMBER_FILES)
-    @mock.patch(MOCK_SUBPROCESS_CHECK_OUTPUT)
-    def test_send(self, mock_check_output, mock_number_files, mock_parse_output):
+    @mock.patch(MOCK_RUN_RSYNC)
+    def test_send(self, mock_run_rsync, mock_number_files):
         """
         Asserts if the Exception is raised with the correct message.
 
-        :param mock_check_output: mocking an empty subprocess.check_output return value.
+        :param mock_run_rsync: mocking a None run_rsync return value.
         :param mock_number_files: mocking the number of files that should be transferred.
-        :param mock_parse_output: mocking a None parse_output return value.
         """
-        mock_check_output.return_value = ""
-        mock_parse_output.return_value = None
+        mock_run_rsync.return_value = None
         mock_number_files.return_value = '1'
 
         with self.assertRaises(Exception) as cex:
@@ -485,38 +633,82 @@ class RsyncManagerSendNotRsyncOutputExceptionTestCase(unittest.TestCase):
         self.assertEqual(cex.exception.message, self.exception_message)
 
 
-class RsyncManagerSendRetryExceptionTestCase(unittest.TestCase):
+class RsyncManagerSendTransientErrorTestCase(unittest.TestCase):
+    """These are scenarios when rsync fails while sending files."""
+
+    def setUp(self):
+        """Set up the test constants."""
+        self.rsync = RsyncManager(FAKE_SOURCE, FAKE_TARGET)
+
+    @mock.patch(MOCK_SLEEP)
+    @mock.patch(MOCK_NUMBER_FILES)
+    @mock.patch(MOCK_SUBPROCESS_POPEN)
+    def test_send_transient_error_retried(self, mock_popen, mock_number_files, mock_sleep):
+        """
+        Asserts if a transient rsync error is retried after waiting.
+
+        :param mock_popen: mocking a rsync process that times out and then succeeds.
+        :param mock_number_files: mocking the number of files that should be transferred.
+        :param mock_sleep: mocking the time.sleep method.
+        """
+        mock_popen.side_effect = [create_rsync_process('', 30), create_rsync_process(RSYNC_OUTPUT)]
+        mock_number_files.return_value = 1
+
+        result = self.rsync.send()
+
+        self.assertEqual(result.n_transferred_files, '1')
+        self.assertEqual(mock_popen.call_count, 2)
+        self.assertEqual(mock_sleep.call_count, 1)
+
+    @mock.patch(MOCK_SLEEP)
+    @mock.patch(MOCK_NUMBER_FILES)
+    @mock.patch(MOCK_SUBPROCESS_POPEN)
+    def test_send_permanent_error_not_retried(self, mock_popen, mock_number_files, mock_sleep):
+        """
+        Asserts if a permanent rsync error is raised without retrying.
+
+        :param mock_popen: mocking a rsync process that fails with a permanent error.
+        :param mock_number_files: mocking the number of files that should be transferred.
+        :param mock_sleep: mocking the time.sleep method.
+        """
+        mock_popen.return_value = create_rsync_process('', 23)
+        mock_number_files.return_value = 1
+
+        with self.assertRaises(Exception) as cex:
+            self.rsync.send()
+
+        self.assertEqual(cex.exception.message,
+                         "Error while sending file '{}'. Error code 23.".format(FAKE_SOURCE))
+        self.assertEqual(mock_popen.call_count, 1)
+        self.assertFalse(mock_sleep.called)
+
+
+class RsyncManagerSendNestedFilesTestCase(unittest.TestCase):
     """
-    This is a scenario when the maximum number of tries has been reached and not all the files
-    have been transferred, so an Exception is raised.
+    This is a scenario when rsync exits successfully reporting more transferred files than the
+    top level of the source has, as it counts the files of nested folders too.
     """
 
     def setUp(self):
         """Set up the test constants."""
-        self.number_files_to_transfer = 7
         self.rsync = RsyncManager(FAKE_SOURCE, FAKE_TARGET, FAKE_TRIES)
-        self.exception_message = "Error while sending file '{}'. " \
-                                 "Can't transfer file(s) to remote server:\n" \
-                                 "Number of tries: {}\n" \
-                                 "Number of files to be transferred: {}\n" \
-                                 "Number of transferred files: {}\n" \
-            .format(FAKE_SOURCE, FAKE_TRIES, self.number_files_to_transfer, 1)
 
     @mock.patch(MOCK_NUMBER_FILES)
-    @mock.patch(MOCK_SUBPROCESS_CHECK_OUTPUT)
-    def test_send(self, mock_check_output, mock_number_files):
+    @mock.patch(MOCK_SUBPROCESS_POPEN)
+    def test_send(self, mock_popen, mock_number_files):
         """
-        Asserts if Exception with the correct message is raised when the maximum tries are reached.
-        :param mock_check_output: mocking a valid subprocess.check_output return value.
+        Asserts if the rsync output is returned without retrying, even with thousand separators.
+        :param mock_popen: mocking a valid rsync process from subprocess.Popen.
         :param mock_number_files: mocking the number of files that should be transferred.
         """
-        mock_check_output.return_value = RSYNC_OUTPUT
-        mock_number_files.return_value = self.number_files_to_transfer
+        mock_popen.return_value = create_rsync_process(
+            RSYNC_OUTPUT.replace("transferred: 1", "transferred: 2,300"))
+        mock_number_files.return_value = 7
 
-        with self.assertRaises(Exception) as cex:
-            self.rsync.send()
+        result = self.rsync.send()
 
-        self.assertEqual(cex.exception.message, self.exception_message)
+        self.assertEqual(result.n_transferred_files, '2,300')
+        self.assertEqual(mock_popen.call_count, 1)
 
 
 class RsyncManagerTransferFileTestCases(unittest.TestCase):
@@ -542,8 +734,17 @@ class RsyncManagerTransferFileTestCases(unittest.TestCase):
 
         self.assertEqual(cex.exception.message, empty_input_exception_message)
 
-    def test_transfer_file_receive_mode_invalid_source(self):
-        """Test transfer in receive mode with invalid source."""
+    @mock.patch(MOCK_SUBPROCESS_POPEN)
+    def test_transfer_file_receive_mode_invalid_source(self, mock_popen):
+        """
+        Test transfer in receive mode with invalid source.
+
+        :param mock_popen: mocking a rsync process that reports the missing remote file.
+        """
+        mock_popen.return_value = create_rsync_process(
+            '', 23, 'rsync: link_stat "{}" failed: No such file or directory (2)'.format(
+                FAKE_SOURCE))
+
         with self.assertRaises(Exception) as cex:
             RsyncManager.transfer_file(FAKE_FULL_HOST_SOURCE_PATH, FAKE_TARGET)
 
@@ -576,6 +777,22 @@ class RsyncManagerTransferFileTestCases(unittest.TestCase):
 
         self.assertTrue(isinstance(send_result, RsyncOutput))
 
+    @mock.patch(MOCK_RECEIVE)
+    @mock.patch(MOCK_SEND)
+    def test_transfer_file_local_path_with_at_sign(self, mock_send, mock_receive):
+        """
+        Test transfer file in send mode when a local source path contains an at sign.
+
+        :param mock_send: mock of RsyncManager send function.
+        :param mock_receive: mock of RsyncManager receive function.
+        """
+        mock_send.return_value = self.rsync_output
+
+        RsyncManager.transfer_file('/var/cache/pkg@2.tar', FAKE_FULL_HOST_SOURCE_PATH)
+
+        self.assertTrue(mock_send.called)
+        self.assertFalse(mock_receive.called)
+
     @mock.patch(MOCK_RECEIVE)
     def test_transfer_file_valid_receive(self, mock_receive):
         """
@@ -588,3 +805,28 @@ class RsyncManagerTransferFileTestCases(unittest.TestCase):
         receive_result = RsyncManager.transfer_file(FAKE_FULL_HOST_SOURCE_PATH, FAKE_TARGET)
 
         self.assertTrue(isinstance(receive_result, RsyncOutput))
+
+    def test_transfer_files_empty_source(self):
+        """Test transfer of several files with an empty list of sources."""
+        with self.assertRaises(Exception) as cex:
+            RsyncManager.transfer_files([], FAKE_TARGET)
+
+        self.assertEqual(cex.exception.message, "Empty input was provided.")
+
+    @mock.patch(MOCK_PATH + '.exists')
+    @mock.patch(MOCK_SUBPROCESS_POPEN)
+    def test_transfer_files_single_rsync(self, mock_popen, mock_path_exists):
+        """
+        Test transfer of several files with a single rsync command.
+
+        :param mock_popen: mocking a valid rsync process from subprocess.Popen.
+        :param mock_path_exists: mocking the os.path.exists method.
+        """
+        mock_popen.return_value = create_rsync_process(RSYNC_OUTPUT)
+        mock_path_exists.return_value = True
+
+        result = RsyncManager.transfer_files([FAKE_SOURCE, FAKE_PATH], FAKE_TARGET)
+
+        self.assertEqual(str(result), str(self.rsync_output))
+        self.assertEqual(mock_popen.call_count, 1)
+        self.assertEqual(mock_popen.call_args[0][0][-3:], [FAKE_SOURCE, FAKE_PATH, FAKE_TARGET])
@@ -15,15 +15,20 @@
 This module is for unit tests from the utils.py script
 """
 
+import errno
 import sys
 import unittest
 import os
 import shutil
+import socket
+import stat
+import tarfile
 import time
 from subprocess import PIPE, Popen
 import binascii
 import mock
 from network_backup_offsite import utils as utils
+from network_backup_offsite.exceptions import ExceptionCodes, UtilsException
 
 
 SCRIPT_PATH = os.path.dirname(__file__)
@@ -60,41 +65,48 @@ class UtilsCreatePathTestCase(unittest.TestCase):
         with self.assertRaises(TypeError):
             utils.create_path(TMP_DIR, TMP_DIR)
 
-    @classmethod
-    @mock.patch.object(os.path, 'exists')
-    def test_create_path_already_exists(cls, mock_exists):
+    @mock.patch('os.makedirs', autospec=True)
+    def test_create_path_already_exists(self, mock_make_dirs):
         """
-        Test if existence of path is being checked.
-        :param mock_exists: mocking os.path.exists method.
+        Test an already existing path is accepted without being checked beforehand.
+        :param mock_make_dirs: mocking os.makedirs method.
         """
-        utils.create_path(TMP_DIR)
-        mock_exists.assert_called_once_with(TMP_DIR)
+        mock_make_dirs.side_effect = OSError(errno.EEXIST, "File exists")
+        self.assertTrue(utils.create_path(TMP_DIR))
+
+    @mock.patch('os.makedirs', autospec=True)
+    def test_create_path_permission_denied(self, mock_make_dirs):
+        """
+        Test a path that cannot be created is reported.
+        :param mock_make_dirs: mocking os.makedirs method.
+        """
+        mock_make_dirs.side_effect = OSError(errno.EACCES, "Permission denied")
+        self.assertFalse(utils.create_path(TMP_DIR))
 
 
 class UtilsRemovePathTestCase(unittest.TestCase):
     """Test cases for remove_path method in utils.py."""
 
-    @mock.patch.object(os.path, 'exists')
-    def test_remove_path_non_existent_path(self, mock_exists):
+    @mock.patch.object(os, 'lstat')
+    def test_remove_path_non_existent_path(self, mock_lstat):
         """
         Test remove path when it does not exist.
-        :param mock_exists: mocking os.path.exists method.
+        :param mock_lstat: mocking os.lstat method.
         """
-        mock_exists.return_value = False
+        mock_lstat.side_effect = OSError(errno.ENOENT, "No such file or directory")
         self.assertTrue(utils.remove_path(TMP_DIR))
 
-    @classmethod
-    @mock.patch.object(os.path, 'isdir')
-    @mock.patch.object(os.path, 'exists')
-    def test_remove_path_existent_path(cls, mock_exists, mock_isdir):
+    @mock.patch.object(utils, 'remove_tree')
+    @mock.patch.object(os, 'lstat')
+    def test_remove_path_existent_path(self, mock_lstat, mock_remove_tree):
         """
         Test remove existing path when it is an existing directory.
-        :param mock_exists: mocking os.path.exists method.
-        :param mock_isdir: mocking os.path.isdir method.
+        :param mock_lstat: mocking os.lstat method.
+        :param mock_remove_tree: mocking utils.remove_tree method.
         """
-        mock_exists.return_value = True
-        utils.remove_path(TMP_DIR)
-        mock_isdir.assert_called_once_with(TMP_DIR)
+        mock_lstat.return_value.st_mode = stat.S_IFDIR
+        self.assertTrue(utils.remove_path(TMP_DIR))
+        mock_remove_tree.assert_called_once_with(TMP_DIR)
 
     def test_remove_path_with_no_arguments(self):
         """Test remove path when no argument is provided."""
@@ -111,6 +123,46 @@ class UtilsRemovePathTestCase(unittest.TestCase):
         with self.assertRaises(TypeError):
             utils.remove_path(1)
 
+    def test_remove_path_nested_directories(self):
+        """Test a directory tree is removed without following symbolic links."""
+        linked_dir = TMP_DIR + "_linked"
+        nested_dir = os.path.join(TMP_DIR, "level_1", "level_2")
+        utils.create_path(nested_dir)
+        utils.create_path(linked_dir)
+        open(os.path.join(nested_dir, FILE_NAME), 'w').close()
+        open(os.path.join(linked_dir, FILE_NAME), 'w').close()
+        os.symlink(linked_dir, os.path.join(TMP_DIR, "link"))
+
+        try:
+            self.assertTrue(utils.remove_path(TMP_DIR))
+            self.assertFalse(os.path.exists(TMP_DIR))
+            self.assertTrue(os.path.exists(os.path.join(linked_dir, FILE_NAME)))
+        finally:
+            utils.remove_path(TMP_DIR)
+            utils.remove_path(linked_dir)
+
+
+class UtilsHasMinNumberOfEntriesTestCase(unittest.TestCase):
+    """Test Cases for has_min_number_of_entries method in utils.py."""
+
+    def setUp(self):
+        """Create a directory with two files."""
+        utils.create_path(TMP_DIR)
+        for file_name in ["file_1", "file_2"]:
+            open(os.path.join(TMP_DIR, file_name), 'w').close()
+
+    def tearDown(self):
+        """Remove the test directory."""
+        utils.remove_path(TMP_DIR)
+
+    def test_has_min_number_of_entries_enough_entries(self):
+        """Test that a directory with as many entries as the minimum is accepted."""
+        self.assertTrue(utils.has_min_number_of_entries(TMP_DIR, 2))
+
+    def test_has_min_number_of_entries_not_enough_entries(self):
+        """Test that a directory with fewer entries than the minimum is rejected."""
+        self.assertFalse(utils.has_min_number_of_entries(TMP_DIR, 3))
+
 
 class UtilsRunRemoteCommandTestCase(unittest.TestCase):
     """Test Cases for popen_communicate method in utils.py."""
@@ -137,10 +189,137 @@ class UtilsRunRemoteCommandTestCase(unittest.TestCase):
         stdout, _ = utils.popen_communicate(VALID_HOST, INVALID_COMMAND)
         self.assertEquals(stdout, "")
 
+    @mock.patch.object(utils, 'Popen')
+    def test_run_remote_command_shares_ssh_connection(self, mock_popen):
+        """
+        Test the ssh command reuses the master connection of the host, without starting one.
+        :param mock_popen: mocking utils.Popen class.
+        """
+        mock_popen.return_value.communicate.return_value = "Hello World!\n", ""
+
+        utils.popen_communicate(VALID_HOST, VALID_COMMAND)
+
+        ssh_command = mock_popen.call_args[0][0]
+        self.assertIn(utils.SSH_CONTROL_MASTER_NO, ssh_command)
+        self.assertIn(utils.SSH_CONTROL_PATH, ssh_command)
+        self.assertNotIn(utils.SSH_CONTROL_PERSIST, ssh_command)
+        self.assertTrue(utils.SSH_CONTROL_PATH.startswith("ControlPath=~/.ssh/"))
+
+
+class UtilsStartSshMasterConnectionTestCase(unittest.TestCase):
+    """Test Cases for start_ssh_master_connection method in utils.py."""
+
+    @mock.patch.object(utils, 'is_ssh_master_running')
+    @mock.patch.object(utils, 'Popen')
+    def test_start_ssh_master_connection_already_running(self, mock_popen, mock_is_running):
+        """
+        Test no new master is started when one is already running for the host.
+        :param mock_popen: mocking utils.Popen class.
+        :param mock_is_running: mocking utils.is_ssh_master_running method.
+        """
+        mock_is_running.return_value = True
+
+        self.assertTrue(utils.start_ssh_master_connection(VALID_HOST))
+        mock_popen.assert_not_called()
+
+    @mock.patch.object(utils, 'get_ssh_connect_timeout', mock.MagicMock(return_value=5))
+    @mock.patch.object(utils, 'is_ssh_master_running')
+    @mock.patch.object(utils, 'Popen')
+    def test_start_ssh_master_connection_not_running(self, mock_popen, mock_is_running):
+        """
+        Test a master is started in background when there is none running for the host.
+        :param mock_popen: mocking utils.Popen class.
+        :param mock_is_running: mocking utils.is_ssh_master_running method.
+        """
+        mock_is_running.return_value = False
+        mock_popen.return_value.wait.return_value = 0
+
+        self.assertTrue(utils.start_ssh_master_connection(VALID_HOST))
+
+        ssh_command = mock_popen.call_args[0][0]
+        self.assertIn('ControlMaster=yes', ssh_command)
+        self.assertIn('-N', ssh_command)
+        self.assertIn('-f', ssh_command)
+
+
+class UtilsRunRemoteBatchTestCase(unittest.TestCase):
+    """Test Cases for run_remote_batch method in utils.py."""
+
+    @mock.patch.object(utils, 'popen_communicate')
+    def test_run_remote_batch_single_call(self, mock_popen):
+        """
+        Test the commands are sent in one ssh call and the outputs follow the order of the commands.
+        :param mock_popen: mocking utils.popen_communicate method.
+        """
+        mock_popen.return_value = "a\n{0}\n{0}\nc\n{0}\n".format(utils.REMOTE_BATCH_SEPARATOR), ""
+
+        outputs, stderr = utils.run_remote_batch(VALID_HOST, ["ls a", "ls b", "ls c"])
+
+        self.assertEqual(["a\n", "", "c\n"], outputs)
+        self.assertEqual("", stderr)
+        mock_popen.assert_called_once_with(
+            VALID_HOST, "ls a\necho {0}\nls b\necho {0}\nls c\necho {0}\n".format(
+                utils.REMOTE_BATCH_SEPARATOR), utils.TIMEOUT)
+
+    @mock.patch.object(utils, 'popen_communicate')
+    def test_run_remote_batch_incomplete_output(self, mock_popen):
+        """
+        Test the commands without output are given an empty one, e.g. after a timeout.
+        :param mock_popen: mocking utils.popen_communicate method.
+        """
+        mock_popen.return_value = "a\n{}\n".format(utils.REMOTE_BATCH_SEPARATOR), "timeout"
+
+        self.assertEqual((["a\n", ""], "timeout"),
+                         utils.run_remote_batch(VALID_HOST, ["ls a", "ls b"]))
+
+    @mock.patch.object(utils, 'popen_communicate')
+    def test_run_remote_batch_empty_list(self, mock_popen):
+        """
+        Test no ssh call is made when there is no command to run.
+        :param mock_popen: mocking utils.popen_communicate method.
+        """
+        self.assertEqual(([], ""), utils.run_remote_batch(VALID_HOST, []))
+        mock_popen.assert_not_called()
+
+
+class UtilsCreateAndListRemoteDirTestCase(unittest.TestCase):
+    """Test Cases for create_and_list_remote_dir method in utils.py."""
+
+    @mock.patch.object(utils, 'run_remote_batch')
+    def test_create_and_list_remote_dir_success(self, mock_run_batch):
+        """
+        Test the directory is reported as available with its content.
+        :param mock_run_batch: mocking utils.run_remote_batch method.
+        """
+        mock_run_batch.return_value = ["DIR_IS_AVAILABLE\n", "bkp_1\nbkp_2\n"], ""
+
+        self.assertEqual((True, ["bkp_1", "bkp_2"]),
+                         utils.create_and_list_remote_dir(VALID_HOST, "/remote/path"))
+        self.assertEqual(1, mock_run_batch.call_count)
+
+    @mock.patch.object(utils, 'run_remote_batch')
+    def test_create_and_list_remote_dir_not_created(self, mock_run_batch):
+        """
+        Test nothing is listed when the directory could not be created.
+        :param mock_run_batch: mocking utils.run_remote_batch method.
+        """
+        mock_run_batch.return_value = ["", ""], "mkdir: cannot create directory"
+
+        self.assertEqual((False, None),
+                         utils.create_and_list_remote_dir(VALID_HOST, "/remote/path"))
+
 
 class UtilsCheckRemotePathExistsTestCase(unittest.TestCase):
     """Test Cases for check_remote_path method in utils.py."""
 
+    def setUp(self):
+        """Start every test without cached remote paths."""
+        utils._REMOTE_PATH_CACHE.clear()
+
+    def tearDown(self):
+        """Do not leak cached remote paths to other tests."""
+        utils._REMOTE_PATH_CACHE.clear()
+
     @classmethod
     @mock.patch.object(utils, 'popen_communicate')
     def test_check_remote_path_attempt_run_remote_command(cls, mock_popen):
@@ -179,6 +358,60 @@ class UtilsCheckRemotePathExistsTestCase(unittest.TestCase):
         mock_timeout.return_value = 20
         self.assertFalse(utils.check_remote_path_exists(INVALID_HOST, SCRIPT_PATH))
 
+    @mock.patch.object(utils, 'popen_communicate')
+    def test_check_remote_path_quotes_path(self, mock_popen):
+        """
+        Test the checked path is quoted in the remote command.
+        :param mock_popen: mocking utils.popen_communicate method.
+        """
+        mock_popen.return_value = "DIR_IS_AVAILABLE\n", ""
+
+        self.assertTrue(utils.check_remote_path_exists(VALID_HOST, "/bkps/a dir;rm -rf x"))
+        mock_popen.assert_called_once_with(
+            VALID_HOST, "if [ -d '/bkps/a dir;rm -rf x' ] || [ -f '/bkps/a dir;rm -rf x' ]; "
+                        "then echo DIR_IS_AVAILABLE; fi\n", utils.TIMEOUT)
+
+    @mock.patch.object(utils, 'popen_communicate')
+    def test_check_remote_path_reuses_cached_result(self, mock_popen):
+        """
+        Test a path checked recently is not checked again on the remote server.
+        :param mock_popen: mocking utils.popen_communicate method.
+        """
+        mock_popen.return_value = "DIR_IS_AVAILABLE", ""
+
+        self.assertTrue(utils.check_remote_path_exists(VALID_HOST, SCRIPT_PATH))
+        self.assertTrue(utils.check_remote_path_exists(VALID_HOST, SCRIPT_PATH))
+
+        mock_popen.assert_called_once()
+
+    @mock.patch.object(utils, 'popen_communicate')
+    def test_check_remote_path_does_not_cache_errors(self, mock_popen):
+        """
+        Test a check that failed on the remote server is done again on the next call.
+        :param mock_popen: mocking utils.popen_communicate method.
+        """
+        mock_popen.return_value = "", "Connection closed"
+
+        self.assertFalse(utils.check_remote_path_exists(VALID_HOST, SCRIPT_PATH))
+        self.assertFalse(utils.check_remote_path_exists(VALID_HOST, SCRIPT_PATH))
+
+        self.assertEqual(2, mock_popen.call_count)
+
+    @mock.patch.object(utils, 'popen_communicate')
+    def test_check_remote_path_cache_invalidated_on_remove(self, mock_popen):
+        """
+        Test removing a remote directory drops the cached checks of its content.
+        :param mock_popen: mocking utils.popen_communicate method.
+        """
+        mock_popen.return_value = "DIR_IS_AVAILABLE", ""
+        self.assertTrue(utils.check_remote_path_exists(VALID_HOST, SCRIPT_PATH + "/file"))
+
+        mock_popen.return_value = "", ""
+        utils.invalidate_remote_path_cache(VALID_HOST, [SCRIPT_PATH])
+
+        self.assertFalse(utils.check_remote_path_exists(VALID_HOST, SCRIPT_PATH + "/file"))
+        self.assertEqual(2, mock_popen.call_count)
+
 
 class UtilsCreateRemoteDirTestCase(unittest.TestCase):
     """Test Cases for create_remote_dir method in utils.py."""
@@ -198,6 +431,19 @@ class UtilsCreateRemoteDirTestCase(unittest.TestCase):
         mock_popen.test_assert_called_once()
         assert stdout
 
+    @mock.patch.object(utils, 'popen_communicate')
+    def test_create_remote_dir_single_command(self, mock_popen):
+        """
+        Test the directory is created and checked by a single quoted remote command.
+        :param mock_popen: mocking utils.popen_communicate method.
+        """
+        mock_popen.return_value = "", ""
+
+        self.assertFalse(utils.create_remote_dir(VALID_HOST, "/bkps/new dir"))
+        mock_popen.assert_called_once_with(
+            VALID_HOST, "mkdir -p '/bkps/new dir' && [ -d '/bkps/new dir' ] && "
+                        "echo DIR_IS_AVAILABLE\n", utils.TIMEOUT)
+
 
 class UtilsRemoveRemoteDirTestCase(unittest.TestCase):
     """Test Cases for remove_dir_list method in utils.py."""
@@ -272,6 +518,55 @@ class UtilsRemoveRemoteDirTestCase(unittest.TestCase):
         self.assertIn("Unable to perform the remove command on offsite due to: ssh: Could not "
                       "resolve hostname", e.exception.message)
 
+    @mock.patch.object(utils, 'validate_removed_dir_list')
+    @mock.patch.object(utils, 'popen_communicate')
+    def test_remove_remote_dir_single_rm_command(self, mock_popen, mock_validate):
+        """
+        Test all the directories are removed by one quoted rm command.
+        :param mock_popen: mocking utils.popen_communicate method.
+        :param mock_validate: mocking utils.validate_removed_dir_list method.
+        """
+        mock_popen.return_value = "", ""
+
+        utils.remove_remote_dir(VALID_HOST, ["/bkps/dir_1 ", "/bkps/dir 2"])
+
+        mock_popen.assert_called_once_with(VALID_HOST, "rm -rf -- /bkps/dir_1 '/bkps/dir 2'\n",
+                                           utils.TIMEOUT)
+        mock_validate.assert_called_once_with(VALID_HOST, ["/bkps/dir_1 ", "/bkps/dir 2"])
+
+
+class UtilsValidateRemovedDirListTestCase(unittest.TestCase):
+    """Test Cases for validate_removed_dir_list method in utils.py."""
+
+    @mock.patch.object(utils, 'popen_communicate')
+    def test_validate_removed_dir_list_single_ssh_call(self, mock_popen):
+        """
+        Test all directories are validated with a single remote command.
+        :param mock_popen: mocking utils.popen_communicate method.
+        """
+        mock_popen.return_value = "MISSING\nEXISTS\nMISSING\n", ""
+
+        not_removed_list, validated_removed_list = utils.validate_removed_dir_list(
+            VALID_HOST, ['dir_0', 'dir_1', 'dir_2'])
+
+        self.assertEqual(mock_popen.call_count, 1)
+        self.assertEqual(not_removed_list, ['dir_1'])
+        self.assertEqual(validated_removed_list, ['dir_0', 'dir_2'])
+
+    @mock.patch.object(utils, 'popen_communicate')
+    def test_validate_removed_dir_list_ssh_error(self, mock_popen):
+        """
+        Test no directory is validated when the remote command fails.
+        :param mock_popen: mocking utils.popen_communicate method.
+        """
+        mock_popen.return_value = "", "Connection refused"
+
+        not_removed_list, validated_removed_list = utils.validate_removed_dir_list(
+            VALID_HOST, ['dir_0', 'dir_1'])
+
+        self.assertEqual(not_removed_list, ['dir_0', 'dir_1'])
+        self.assertEqual(validated_removed_list, [])
+
 
 class UtilsIsValidIpTestCase(unittest.TestCase):
     """Test Cases for is_valid_ip method in utils.py."""
@@ -296,6 +591,104 @@ class UtilsValidateHostIsAccessibleTestCase(unittest.TestCase):
         """Test invalid host is not accessible."""
         self.assertFalse(utils.is_host_accessible(INVALID_HOST))
 
+    @mock.patch.dict(utils._ACCESSIBLE_HOSTS_CACHE, clear=True)
+    @mock.patch.object(utils.socket, 'socket')
+    def test_validate_host_is_accessible_probes_ssh_port_once(self, mock_socket):
+        """
+        Test the ssh port is probed and an accessible host is not probed again within the ttl.
+        :param mock_socket: mocking utils.socket.socket class.
+        """
+        self.assertTrue(utils.is_host_accessible(VALID_HOST))
+        self.assertTrue(utils.is_host_accessible(VALID_HOST))
+
+        mock_socket.return_value.connect.assert_called_once_with((VALID_HOST, utils.SSH_PORT))
+        mock_socket.return_value.close.assert_called_once_with()
+
+    @mock.patch.dict(utils._ACCESSIBLE_HOSTS_CACHE, clear=True)
+    @mock.patch.object(utils.socket, 'socket')
+    def test_validate_host_is_accessible_connection_refused(self, mock_socket):
+        """
+        Test a host refusing the connection is not accessible and is not cached.
+        :param mock_socket: mocking utils.socket.socket class.
+        """
+        mock_socket.return_value.connect.side_effect = utils.socket.error("Connection refused")
+
+        self.assertFalse(utils.is_host_accessible(VALID_HOST))
+        self.assertNotIn(VALID_HOST, utils._ACCESSIBLE_HOSTS_CACHE)
+
+
+class UtilsGetElemDictTestCase(unittest.TestCase):
+    """Test Cases for get_elem_dict method in utils.py."""
+
+    def test_get_elem_dict_existing_key(self):
+        """Test the value of an existing key is returned."""
+        self.assertEqual("value", utils.get_elem_dict({"key": "value"}, "key"))
+
+    def test_get_elem_dict_missing_key_or_not_dict(self):
+        """Test None is returned for a missing key or when no dictionary is provided."""
+        self.assertIsNone(utils.get_elem_dict({"key": "value"}, "other_key"))
+        self.assertIsNone(utils.get_elem_dict(["key"], "key"))
+
+
+class UtilsGetSshConnectTimeoutTestCase(unittest.TestCase):
+    """Test Cases for get_ssh_connect_timeout method in utils.py."""
+
+    @mock.patch.dict(utils._HOST_RTT_CACHE, clear=True)
+    @mock.patch.object(utils, 'measure_host_rtt')
+    def test_get_ssh_connect_timeout_scales_with_rtt(self, mock_measure):
+        """
+        Test the timeout follows the round trip time, within its bounds.
+        :param mock_measure: mocking utils.measure_host_rtt method.
+        """
+        mock_measure.return_value = 0.001
+        self.assertEqual(utils.SSH_MIN_CONNECT_TIMEOUT,
+                         utils.get_ssh_connect_timeout("user@" + VALID_HOST))
+        mock_measure.assert_called_once_with(VALID_HOST)
+
+        mock_measure.return_value = 0.5
+        self.assertEqual(25, utils.get_ssh_connect_timeout(VALID_HOST))
+
+        mock_measure.return_value = 10
+        self.assertEqual(utils.TIMEOUT, utils.get_ssh_connect_timeout(VALID_HOST))
+
+    @mock.patch.dict(utils._HOST_RTT_CACHE, clear=True)
+    @mock.patch.object(utils, 'measure_host_rtt')
+    def test_get_ssh_connect_timeout_uses_cached_rtt(self, mock_measure):
+        """
+        Test a recently measured round trip time is not measured again.
+        :param mock_measure: mocking utils.measure_host_rtt method.
+        """
+        utils._HOST_RTT_CACHE[VALID_HOST] = 0.2, utils.monotonic()
+
+        self.assertEqual(10, utils.get_ssh_connect_timeout("user@" + VALID_HOST))
+        mock_measure.assert_not_called()
+
+    @mock.patch.dict(utils._HOST_RTT_CACHE, clear=True)
+    @mock.patch.object(utils, 'measure_host_rtt')
+    def test_get_ssh_connect_timeout_unreachable_host(self, mock_measure):
+        """
+        Test the informed timeout is used when the host cannot be probed.
+        :param mock_measure: mocking utils.measure_host_rtt method.
+        """
+        mock_measure.return_value = None
+
+        self.assertEqual(utils.TIMEOUT, utils.get_ssh_connect_timeout(VALID_HOST))
+        self.assertEqual(30, utils.get_ssh_connect_timeout(VALID_HOST, 30))
+
+    @mock.patch.dict(utils._HOST_RTT_CACHE, clear=True)
+    @mock.patch.object(utils.socket, 'socket')
+    def test_get_ssh_connect_timeout_caches_failed_probe(self, mock_socket):
+        """
+        Test a failed probe is cached, so the host is not probed again on the next call.
+        :param mock_socket: mocking utils.socket.socket class.
+        """
+        mock_socket.return_value.connect.side_effect = socket.error
+
+        self.assertEqual(utils.TIMEOUT, utils.get_ssh_connect_timeout(VALID_HOST))
+        self.assertEqual(utils.TIMEOUT, utils.get_ssh_connect_timeout(VALID_HOST))
+
+        self.assertEqual(1, mock_socket.return_value.connect.call_count)
+
 
 class UtilsTimeItTestCase(unittest.TestCase):
     """Test Cases for timeit decorator located in utils.py."""
@@ -319,11 +712,11 @@ class UtilsTimeItTestCase(unittest.TestCase):
         assert self.elapsed_time_array[0] > TIME_SLEEP
         assert self.elapsed_time_array
 
-    @mock.patch.object(time, 'time')
+    @mock.patch.object(utils, 'monotonic')
     def test_timeit_measurement_done_twice(self, mock_time):
         """
         Test if time measurement is done twice in decorated method.
-        :param mock_time: mocking time.time() method.
+        :param mock_time: mocking utils.monotonic() method.
         """
         self.dummy_method(get_elapsed_time=self.elapsed_time_array)
         self.assertEqual(mock_time.call_count, 2)
@@ -347,6 +740,38 @@ class UtilsTimeItTestCase(unittest.TestCase):
             self.assertEqual("Dummy Exception!", exception.exception.message)
 
 
+class UtilsTimerDelayTestCase(unittest.TestCase):
+    """Test Cases for timer_delay decorator located in utils.py."""
+
+    @staticmethod
+    @utils.timer_delay
+    def dummy_method(sleep_time, **kwargs):
+        """Dummy method to use with @utils.timer_delay decorator."""
+        time.sleep(sleep_time)
+        return "done"
+
+    def test_timer_delay_calls_on_timeout_when_delayed(self):
+        """Test the timeout function is called when the decorated method takes too long."""
+        on_timeout = mock.Mock()
+
+        self.dummy_method(0.3, max_delay=0.05, on_timeout=on_timeout, on_timeout_args=["late"])
+
+        on_timeout.assert_called_once_with("late")
+
+    def test_timer_delay_does_not_call_on_timeout_in_time(self):
+        """Test the timeout function is not called when the decorated method ends in time."""
+        on_timeout = mock.Mock()
+
+        self.assertEqual("done", self.dummy_method(0, max_delay=5, on_timeout=on_timeout))
+
+        on_timeout.assert_not_called()
+
+    def test_timer_delay_invalid_max_delay_raises_original_error(self):
+        """Test an invalid max delay raises its own error instead of failing on the timer."""
+        with self.assertRaises(ValueError):
+            self.dummy_method(0, max_delay="not a number", on_timeout=mock.Mock())
+
+
 class UtilsCompressFileTestCase(unittest.TestCase):
     """Test Cases for compress_file method located in utils.py."""
     def setUp(self):
@@ -381,6 +806,19 @@ class UtilsCompressFileTestCase(unittest.TestCase):
         utils.compress_file(self.test_file_path)
         self.assertEqual(mock_gzip_file.call_count, 1)
 
+    @mock.patch.object(utils, 'gzip_file')
+    def test_compress_file_error_reports_cause(self, mock_gzip_file):
+        """
+        Test the error raised by compress_file carries the cause of the failure.
+        :param mock_gzip_file: mocking gzip_file method.
+        """
+        mock_gzip_file.side_effect = Exception("disk full")
+
+        with self.assertRaises(Exception) as raised:
+            utils.compress_file(self.test_file_path)
+
+        self.assertIn("disk full", str(raised.exception))
+
     @mock.patch.object(utils, 'tar_file')
     def test_tar_file_function_is_being_called(self, mock_tar_file):
         """
@@ -414,6 +852,22 @@ class UtilsCompressFileTestCase(unittest.TestCase):
         self.assertEquals(out.strip(), "")
         self.assertEquals(exitcode, 0)
 
+    def test_compress_file_folder_is_streamed_to_tar_gz(self):
+        """Test a folder is compressed into a tar.gz archive with its content."""
+        utils.create_path(TMP_DIR)
+        shutil.copy(self.test_file_path, TMP_DIR)
+
+        try:
+            compressed_dir = utils.compress_file(TMP_DIR)
+
+            self.assertEqual(TMP_DIR + ".tar.gz", compressed_dir)
+            with tarfile.open(compressed_dir, "r:gz") as archive:
+                self.assertIn(os.path.join(os.path.basename(TMP_DIR), FILE_NAME),
+                              archive.getnames())
+        finally:
+            utils.remove_path(TMP_DIR)
+            utils.remove_path(TMP_DIR + ".tar.gz")
+
     def test_compress_file_invalid_source_path_is_provided(self):
         """Test if exception is raised when invalid source path is provided."""
         with self.assertRaises(Exception) as exception:
@@ -422,6 +876,44 @@ class UtilsCompressFileTestCase(unittest.TestCase):
                              exception.exception.message)
 
 
+class UtilsFileFormatTestCase(unittest.TestCase):
+    """Test Cases for is_gzip_file and is_tar_file methods located in utils.py."""
+
+    def setUp(self):
+        """Create a folder with a file, a tar archive of it and a gzip copy of the file."""
+        utils.create_path(TMP_DIR)
+        self.test_file_path = os.path.join(TMP_DIR, FILE_NAME)
+        with open(self.test_file_path, 'wb') as f:
+            f.write(os.urandom(DEFAULT_FILE_SIZE))
+
+        self.tar_file_path = utils.tar_file(self.test_file_path, TMP_DIR)
+        self.gzip_file_path = utils.gzip_file(self.test_file_path, TMP_DIR)
+
+    def tearDown(self):
+        """Remove the test folder."""
+        utils.remove_path(TMP_DIR)
+
+    def test_is_gzip_file(self):
+        """Test only the gzip file is detected as gzip."""
+        self.assertTrue(utils.is_gzip_file(self.gzip_file_path))
+        self.assertFalse(utils.is_gzip_file(self.tar_file_path))
+        self.assertFalse(utils.is_gzip_file(__file__))
+
+    def test_is_tar_file(self):
+        """Test only the tar file is detected as tar."""
+        self.assertTrue(utils.is_tar_file(self.tar_file_path))
+        self.assertFalse(utils.is_tar_file(self.gzip_file_path))
+        self.assertFalse(utils.is_tar_file(__file__))
+
+    def test_is_tar_file_truncated_header(self):
+        """Test a file cut inside the first tar header is not detected as tar."""
+        truncated_file_path = os.path.join(TMP_DIR, "truncated.tar")
+        with open(self.tar_file_path, 'rb') as tar_file, open(truncated_file_path, 'wb') as f:
+            f.write(tar_file.read(300))
+
+        self.assertFalse(utils.is_tar_file(truncated_file_path))
+
+
 class UtilsDecompressFileTestCase(unittest.TestCase):
     """Test Cases for decompress_file method located in utils.py."""
 
@@ -438,6 +930,22 @@ class UtilsDecompressFileTestCase(unittest.TestCase):
         with self.assertRaises(Exception):
             utils.decompress_file(__file__, self.dest_dir)
 
+    @mock.patch.object(utils, 'Popen')
+    def test_gunzip_file_uses_gunzip_command(self, mock_popen):
+        """
+        Test gunzip_file decompresses with the resolved gunzip command, e.g. unpigz, and no shell.
+        :param mock_popen: mocking utils.Popen class.
+        """
+        mock_popen.return_value.wait.return_value = 0
+        utils.create_path(self.dest_dir)
+
+        decompressed_path = utils.gunzip_file("/tmp/volume_file.gz", self.dest_dir)
+
+        self.assertEqual(os.path.join(self.dest_dir, "volume_file"), decompressed_path)
+        self.assertEqual(utils.GUNZIP_CMD.split() + ["-c", "/tmp/volume_file.gz"],
+                         mock_popen.call_args[0][0])
+        self.assertNotIn('shell', mock_popen.call_args[1])
+
 
 class UtilsFilterCliArgs(unittest.TestCase):
     """Test Cases for get_cli_arguments method."""
@@ -463,3 +971,50 @@ class UtilsFilterCliArgs(unittest.TestCase):
             sut_result = utils.get_filtered_cli_arguments()
 
         self.assertEqual(sut_expected_result, sut_result)
+
+    def test_get_cli_arguments_filter_consecutive_elements(self):
+        """Testing whether consecutive elements to be filtered are all removed."""
+
+        test_args = ['/usr/bin/ntwk_bkp', '/home/bur/some_script.py', '--script_option', '1']
+        sut_expected_result = ['--script_option', '1']
+
+        with mock.patch.object(sys, 'argv', test_args):
+            sut_result = utils.get_filtered_cli_arguments()
+
+        self.assertEqual(sut_expected_result, sut_result)
+
+
+class UtilsToSecondsTestCase(unittest.TestCase):
+    """Test Cases for to_seconds method in utils.py."""
+
+    def test_to_seconds_valid_durations(self):
+        """Test durations in seconds, minutes and hours are converted to seconds."""
+        self.assertEqual(20, utils.to_seconds("20s"))
+        self.assertEqual(3 * 3600, utils.to_seconds(" 3h "))
+
+    def test_to_seconds_fractional_durations(self):
+        """Test fractional durations are accepted and truncated to whole seconds."""
+        self.assertEqual(90, utils.to_seconds("1.5m"))
+        self.assertEqual(5400, utils.to_seconds("1.5h"))
+        self.assertEqual(2, utils.to_seconds("2.9s"))
+
+    def test_to_seconds_incomplete_fraction(self):
+        """Test a fractional value without digits after the point is rejected."""
+        with self.assertRaises(UtilsException) as raised:
+            utils.to_seconds("1.h")
+
+        self.assertEqual(ExceptionCodes.InvalidTimeFormat, raised.exception.code)
+
+    def test_to_seconds_invalid_unit(self):
+        """Test a duration with an unknown unit is rejected."""
+        with self.assertRaises(UtilsException) as raised:
+            utils.to_seconds("3x")
+
+        self.assertEqual(ExceptionCodes.InvalidTimeUnit, raised.exception.code)
+
+    def test_to_seconds_invalid_format(self):
+        """Test a duration without a numeric value is rejected."""
+        with self.assertRaises(UtilsException) as raised:
+            utils.to_seconds("fives")
+
+        self.assertEqual(ExceptionCodes.InvalidTimeFormat, raised.exception.code)